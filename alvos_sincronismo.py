@@ -0,0 +1,147 @@
+"""Configuração de vários alvos de verificação (instâncias do ERP e vistas) em TOML.
+
+Cada ``[[alvo]]`` descreve uma instalação do Tecnicon, as credenciais e os
+parâmetros da vista de sincronismo. A seção ``[padrao]`` vale para todos os
+alvos e os valores do ``.env``/argumentos completam o que faltar::
+
+    [padrao]
+    usuario = "MONITORSINCRONISMO"
+    senha_env = "ERP_PASSWORD"
+    max_delay = 300
+
+    [[alvo]]
+    nome = "matriz"
+    url = "http://erpdireto:8080"
+
+    [[alvo]]
+    nome = "empresa-22"
+    url = "http://erp2:8080"
+    max_delay = 600
+    vista = { empresa = "22", vista = "2052", svistaaba = "2902" }
+
+Veja ``alvos.toml.example`` para todos os campos.
+"""
+
+import os
+
+try:
+    import tomllib
+except ModuleNotFoundError:
+    # Python 3.10: o leitor de TOML só existe como pacote externo
+    try:
+        import tomli as tomllib
+    except ModuleNotFoundError:
+        tomllib = None
+
+# Parâmetros da vista aceitos em ``vista = {...}`` (ver VISTA_PADRAO em check_sincronismo)
+CAMPOS_VISTA = ('empresa', 'filial', 'local', 'vista', 'svistaaba', 'smenuv')
+
+CAMPOS_ALVO = ('nome', 'url', 'usuario', 'senha', 'senha_env', 'max_delay', 'vista', 'zabbix_host')
+
+
+class ConfiguracaoError(Exception):
+    """Excecao para arquivo de alvos ausente, ilegivel ou com campos invalidos."""
+    pass
+
+
+def ler_toml(caminho):
+    """Lê o arquivo TOML e retorna o dicionário."""
+    if tomllib is None:
+        raise ConfiguracaoError("Leitura de TOML exige Python 3.11+ ou o pacote 'tomli'")
+    try:
+        with open(caminho, 'rb') as f:
+            return tomllib.load(f)
+    except OSError as e:
+        raise ConfiguracaoError(f"Não foi possível ler o arquivo de alvos {caminho}: {e}")
+    except tomllib.TOMLDecodeError as e:
+        raise ConfiguracaoError(f"Arquivo de alvos {caminho} inválido: {e}")
+
+
+def carregar_alvos(caminho, padroes=None):
+    """Carrega e valida os alvos do arquivo de configuração.
+
+    ``padroes`` traz os valores do ``.env``/argumentos (url, usuario, senha,
+    max_delay, zabbix_host), usados quando nem o alvo nem ``[padrao]`` os
+    definem. Retorna uma lista de dicionários com as chaves nome, url, usuario,
+    senha, max_delay, vista (somente os parâmetros sobrescritos) e zabbix_host.
+    """
+    dados = ler_toml(caminho)
+    secao_padrao = dados.get('padrao', {})
+    alvos_toml = dados.get('alvo', [])
+    if not isinstance(secao_padrao, dict) or not isinstance(alvos_toml, list):
+        raise ConfiguracaoError("Use uma seção [padrao] e tabelas [[alvo]]")
+    if not alvos_toml:
+        raise ConfiguracaoError(f"Nenhum [[alvo]] definido em {caminho}")
+
+    alvos = []
+    nomes = set()
+    for posicao, alvo_toml in enumerate(alvos_toml, start=1):
+        alvo = _montar_alvo(posicao, alvo_toml, secao_padrao, padroes or {})
+        if alvo['nome'] in nomes:
+            raise ConfiguracaoError(f"Nome de alvo repetido: '{alvo['nome']}'")
+        nomes.add(alvo['nome'])
+        alvos.append(alvo)
+    return alvos
+
+
+def _montar_alvo(posicao, alvo_toml, secao_padrao, padroes):
+    desconhecidos = set(alvo_toml) - set(CAMPOS_ALVO)
+    if desconhecidos:
+        raise ConfiguracaoError(f"Alvo {posicao}: campos desconhecidos {sorted(desconhecidos)}")
+
+    def valor(campo):
+        for origem in (alvo_toml, secao_padrao, padroes):
+            if origem.get(campo) not in (None, ''):
+                return origem[campo]
+        return None
+
+    nome = str(alvo_toml.get('nome') or posicao)
+    url = valor('url')
+    usuario = valor('usuario')
+    if not url or not usuario:
+        raise ConfiguracaoError(f"Alvo '{nome}': informe url e usuario")
+
+    # Senha explícita no alvo > variável indicada > senha padrão (ERP_PASSWORD)
+    senha = alvo_toml.get('senha')
+    senha_env = alvo_toml.get('senha_env') or (None if senha else secao_padrao.get('senha_env'))
+    if not senha and senha_env:
+        senha = os.getenv(senha_env)
+        if not senha:
+            raise ConfiguracaoError(f"Alvo '{nome}': variável {senha_env} não definida")
+    senha = senha or secao_padrao.get('senha') or padroes.get('senha')
+    if not senha:
+        raise ConfiguracaoError(f"Alvo '{nome}': senha não informada (senha, senha_env ou ERP_PASSWORD)")
+
+    try:
+        max_delay = int(valor('max_delay'))
+    except (TypeError, ValueError):
+        raise ConfiguracaoError(f"Alvo '{nome}': max_delay ausente ou inválido")
+    if max_delay <= 0:
+        raise ConfiguracaoError(f"Alvo '{nome}': max_delay deve ser positivo")
+
+    vista_padrao, vista_alvo = secao_padrao.get('vista', {}), alvo_toml.get('vista', {})
+    if not isinstance(vista_padrao, dict) or not isinstance(vista_alvo, dict):
+        raise ConfiguracaoError(f"Alvo '{nome}': vista deve ser uma tabela (vista = {{ empresa = \"1\" }})")
+    vista = dict(vista_padrao, **vista_alvo)
+    desconhecidos = set(vista) - set(CAMPOS_VISTA)
+    if desconhecidos:
+        raise ConfiguracaoError(f"Alvo '{nome}': parâmetros de vista desconhecidos {sorted(desconhecidos)}")
+
+    return {
+        'nome': nome,
+        'url': str(url).rstrip('/'),
+        'usuario': str(usuario),
+        'senha': str(senha),
+        'max_delay': max_delay,
+        'vista': {campo: str(v) for campo, v in vista.items()},
+        'zabbix_host': valor('zabbix_host'),
+    }
+
+
+def identidade_alvo(alvo):
+    """Identificador da sessão do alvo (sessão HTTP, token em cache e single-flight).
+
+    Inclui o nome: alvos com o mesmo usuário em empresas diferentes não podem
+    compartilhar a sessão, pois a empresa é escolhida no login.
+    """
+    return f"{alvo['usuario']}#{alvo['nome']}"
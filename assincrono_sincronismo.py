@@ -0,0 +1,283 @@
+"""Motor HTTP assíncrono (asyncio + aiohttp) da verificação de sincronismo.
+
+Implementa as três fases (login, seleção de empresa e busca da vista) sem
+bloquear, ao lado da API síncrona baseada em ``requests``: as requisições são
+montadas pelas mesmas funções, o resultado tem o formato de
+``executar_verificacao`` e as falhas usam as mesmas exceções (``ERPLoginError``,
+``StatusFetchError``, ``SessaoExpiradaError``).
+
+Um único laço de eventos verifica centenas de alvos: cada alvo tem a sua
+``ClientSession`` (cookies próprios) e todas compartilham um conector que limita
+as conexões simultâneas por host do ERP. A análise da grade roda em uma thread
+para não travar o laço.
+
+O aiohttp é opcional (``uv sync --extra async``).
+"""
+
+import time
+import asyncio
+from types import SimpleNamespace
+
+try:
+    import aiohttp
+    from yarl import URL
+except ImportError:
+    aiohttp = None
+
+from check_sincronismo import (
+    requisicao_login, requisicao_empresa, requisicao_vista, codigo_empresa, token_login, token_empresa,
+    classificar_resposta, verificar_classificacao_vista, registrar_contador, parse_status_page,
+    concluir_verificacao, atualizar_cache_token, resultado_inesperado, resultado_circuito_aberto, logger,
+    prazo_atual, verificar_prazo, timeout_fase, mensagem_prazo_esgotado,
+    MedicaoFases, medicao_atual, medir_fase, contabilizar_fase, registrar_fases,
+    ERPLoginError, StatusFetchError, ParsingError, SessaoExpiradaError, PrazoEsgotadoError,
+    RESPOSTA_SELECAO_EMPRESA, RESPOSTA_ERRO, RESPOSTA_SESSAO_EXPIRADA
+)
+from cache_sincronismo import carregar_token
+from alvos_sincronismo import identidade_alvo
+
+# Tempo máximo de cada requisição ao ERP (segundos), como no motor síncrono
+TIMEOUT_HTTP_PADRAO = 30
+
+# Conexões simultâneas por host do ERP e no total
+LIMITE_POR_HOST_PADRAO = 4
+LIMITE_CONEXOES_PADRAO = 100
+
+
+def exigir_aiohttp():
+    """Levanta RuntimeError se o pacote opcional aiohttp não estiver instalado."""
+    if aiohttp is None:
+        raise RuntimeError("O motor assíncrono exige o pacote aiohttp (uv sync --extra async)")
+
+
+class CookiesAiohttp:
+    """Expõe o cookie jar do aiohttp com a interface de ``requests.Session.cookies``.
+
+    Permite reaproveitar ``carregar_token``/``salvar_token`` do cache, que
+    recebem uma sessão e usam ``session.cookies.set(...)`` e a iteração dos cookies.
+    """
+
+    def __init__(self, jar, base_url):
+        self.jar = jar
+        self.url = URL(base_url)
+        self.cookies = self
+
+    def set(self, nome, valor, domain=None, path=None):
+        self.jar.update_cookies({nome: valor}, response_url=self.url)
+
+    def __iter__(self):
+        for morsel in self.jar:
+            yield SimpleNamespace(name=morsel.key, value=morsel.value,
+                                  domain=morsel['domain'] or None, path=morsel['path'] or None)
+
+
+def _descrever(erro):
+    # asyncio.TimeoutError não tem mensagem
+    return str(erro) or type(erro).__name__
+
+
+async def _post(sessao, fase, url, payload, headers, timeout):
+    """POST que retorna (status, texto); erros de rede seguem como aiohttp.ClientError.
+
+    O timeout é limitado ao que resta do prazo da verificação (``fase`` nomeia
+    a etapa no erro de prazo esgotado).
+    """
+    async with sessao.post(url, data=payload, headers=headers,
+                           timeout=aiohttp.ClientTimeout(total=timeout_fase(fase, timeout))) as resposta:
+        corpo = await resposta.read()
+        contabilizar_fase(bytes_recebidos=len(corpo))
+        return resposta.status, await resposta.text(errors='replace')
+
+
+async def selecionar_empresa_async(sessao, base_url, html_content, empresa=None, timeout=TIMEOUT_HTTP_PADRAO):
+    """Versão assíncrona de ``select_empresa``."""
+    with medir_fase('empresa'):
+        codigo = codigo_empresa(html_content, empresa)
+        logger.info(f"Selecionando empresa: {codigo}")
+        url, payload, headers = requisicao_empresa(base_url, codigo)
+        try:
+            status, texto = await _post(sessao, 'empresa', url, payload, headers, timeout)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            verificar_prazo('empresa')
+            raise ERPLoginError(f"Erro ao selecionar empresa: {_descrever(e)}")
+        if status >= 400:
+            raise ERPLoginError(f"Erro ao selecionar empresa: HTTP {status}")
+        return token_empresa(texto, html_content)
+
+
+async def obter_token_async(sessao, base_url, username, password, empresa=None, timeout=TIMEOUT_HTTP_PADRAO):
+    """Versão assíncrona de ``get_auth_token``."""
+    logger.info(f"Tentando login no ERP: {base_url} com usuário: {username}")
+    url, payload, headers = requisicao_login(base_url, username, password)
+    try:
+        status, texto = await _post(sessao, 'login', url, payload, headers, timeout)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        verificar_prazo('login')
+        raise ERPLoginError(f"Erro de conexao ao tentar logar: {_descrever(e)}")
+    if status >= 400:
+        raise ERPLoginError(f"Erro de conexao ao tentar logar: HTTP {status}")
+
+    registrar_contador('login')
+    classificacao = classificar_resposta(status, texto)
+    if classificacao == RESPOSTA_SELECAO_EMPRESA:
+        logger.info("Tela de seleção de empresa detectada, selecionando empresa...")
+        return await selecionar_empresa_async(sessao, base_url, texto, empresa, timeout)
+    if classificacao == RESPOSTA_ERRO:
+        raise ERPLoginError("O ERP retornou uma pagina de erro ao tentar logar.")
+    return token_login(texto)
+
+
+async def _buscar_vista_async(sessao, base_url, auth_token, vista, timeout):
+    registrar_contador('busca_status')
+    url, payload, headers = requisicao_vista(base_url, auth_token, vista)
+    try:
+        status, texto = await _post(sessao, 'busca', url, payload, headers, timeout)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        verificar_prazo('busca')
+        raise StatusFetchError(f"Erro de conexao ao buscar a pagina de status: {_descrever(e)}")
+
+    classificacao = classificar_resposta(status, texto)
+    if classificacao == RESPOSTA_SESSAO_EXPIRADA:
+        raise SessaoExpiradaError(f"HTTP {status} ao buscar a pagina de status", classificacao)
+    if status >= 400:
+        raise StatusFetchError(f"Erro de conexao ao buscar a pagina de status: HTTP {status}")
+    verificar_classificacao_vista(classificacao)
+    return texto
+
+
+async def buscar_vista_async(sessao, base_url, auth_token, relogin=None, vista=None, timeout=TIMEOUT_HTTP_PADRAO):
+    """Versão assíncrona de ``get_sync_status_page``; ``relogin`` é uma corrotina."""
+    try:
+        return await _buscar_vista_async(sessao, base_url, auth_token, vista, timeout)
+    except SessaoExpiradaError as e:
+        if relogin is None:
+            raise
+        logger.info(f"Token recusado pelo ERP ({e.motivo}), refazendo login...")
+        registrar_contador('relogin')
+        registrar_contador(f'relogin_{e.motivo}')
+        return await _buscar_vista_async(sessao, base_url, await relogin(), vista, timeout)
+
+
+def _analisar(medicao, status_html, motor, memo):
+    # Roda na thread de análise: a CPU medida é só a da análise
+    with medicao.medir('analise'):
+        status_data = parse_status_page(status_html, motor, memo)
+        contabilizar_fase(linhas=status_data['total_linhas'])
+    return status_data
+
+
+async def executar_verificacao_async(sessao, base_url, username, password, max_delay, token=None,
+                                     motor=None, memo=None, vista=None, timeout=TIMEOUT_HTTP_PADRAO, prazo=None,
+                                     medir_fases=False):
+    """Versão assíncrona de ``executar_verificacao`` (sem single-flight, fluxo ou depuração).
+
+    ``prazo`` e a medição de fases (``medir_fases``) valem para esta tarefa:
+    cada tarefa do asyncio tem a sua cópia do contexto, então alvos
+    concorrentes não interferem entre si. A CPU das fases de rede é a da
+    thread do laço e inclui a dos demais alvos; a da análise é exata.
+
+    Retorna o mesmo dicionário: 'codigo', 'saida', 'token', 'status_data',
+    'atraso_segundos', 'ultimo_envio' e 'tempos'.
+    """
+    estado = {'token': token}
+    inicio = time.perf_counter()
+    medicao = MedicaoFases()
+
+    async def relogin():
+        with medicao.medir('login'):
+            estado['token'] = await obter_token_async(sessao, base_url, username, password,
+                                                      (vista or {}).get('empresa'), timeout)
+        return estado['token']
+
+    resultado = {'codigo': 1, 'token': None, 'status_data': None, 'atraso_segundos': None,
+                 'ultimo_envio': None}
+    contexto_prazo = prazo_atual.set(prazo)
+    contexto_medicao = medicao_atual.set(medicao if medir_fases else None)
+    try:
+        with medicao.medir('busca'):
+            if estado['token']:
+                # Token reaproveitado: o ERP pode recusá-lo, então permite um novo login
+                status_html = await buscar_vista_async(sessao, base_url, estado['token'], relogin=relogin,
+                                                       vista=vista, timeout=timeout)
+            else:
+                status_html = await buscar_vista_async(sessao, base_url, await relogin(), vista=vista,
+                                                       timeout=timeout)
+
+        verificar_prazo('analise')
+        # A análise usa CPU: em uma thread, para não atrasar os demais alvos
+        status_data = await asyncio.to_thread(_analisar, medicao, status_html, motor, memo)
+
+        concluir_verificacao(resultado, status_data, max_delay)
+        resultado.update(token=estado['token'], erp_indisponivel=False)
+    except PrazoEsgotadoError as e:
+        resultado.update(saida=mensagem_prazo_esgotado(e, medicao.tempos()), prazo_esgotado=e.fase,
+                         erp_indisponivel=True)
+    except (ERPLoginError, StatusFetchError, ParsingError) as e:
+        resultado.update(saida=f"STATUS_PROBLEMA: {e}", erp_indisponivel=not isinstance(e, ParsingError))
+    except Exception as e:
+        resultado['saida'] = f"STATUS_PROBLEMA: Ocorreu um erro inesperado: {e}"
+    finally:
+        prazo_atual.reset(contexto_prazo)
+        medicao_atual.reset(contexto_medicao)
+        resultado['tempos'] = dict(medicao.tempos(), total=time.perf_counter() - inicio)
+    if medir_fases:
+        registrar_fases(resultado, medicao)
+    return resultado
+
+
+async def verificar_alvos_async(alvos, limite_por_host=LIMITE_POR_HOST_PADRAO, limite_conexoes=LIMITE_CONEXOES_PADRAO,
+                                motor=None, memo=None, token_cache_ttl=0, timeout=TIMEOUT_HTTP_PADRAO, prazo=None,
+                                disjuntor=None, medir_fases=False):
+    """Verifica os alvos (de ``alvos_sincronismo.carregar_alvos``) em um único laço de eventos.
+
+    Retorna a lista de pares (alvo, resultado) na ordem recebida, como
+    ``verificar_alvos``. O token de cada alvo é lido e salvo no mesmo cache do
+    motor síncrono quando ``token_cache_ttl`` > 0. ``prazo`` (Prazo) é
+    compartilhado por todos os alvos. ``disjuntor(alvo)`` retorna o Disjuntor
+    do alvo (ou None): com o circuito aberto o alvo nem abre conexão.
+    ``medir_fases`` inclui 'fases' em cada resultado.
+
+    O cache de token e o estado do disjuntor são arquivos protegidos por
+    ``flock``: são lidos e gravados em threads, como a análise, para que uma
+    trava disputada por outro processo não pare o laço de eventos.
+    """
+    exigir_aiohttp()
+    conector = aiohttp.TCPConnector(limit=limite_conexoes, limit_per_host=limite_por_host)
+
+    async def verificar(alvo):
+        identidade = identidade_alvo(alvo)
+        circuito = await asyncio.to_thread(disjuntor, alvo) if disjuntor else None
+        bloqueio = await asyncio.to_thread(circuito.permitir) if circuito else None
+        if bloqueio:
+            logger.warning(f"Alvo {alvo['nome']} não verificado: {bloqueio}")
+            return resultado_circuito_aberto(bloqueio)
+        try:
+            # unsafe: o ERP costuma ser acessado por IP, e cookies de IP são recusados no modo padrão
+            async with aiohttp.ClientSession(connector=conector, connector_owner=False,
+                                             cookie_jar=aiohttp.CookieJar(unsafe=True)) as sessao:
+                cookies = CookiesAiohttp(sessao.cookie_jar, alvo['url'])
+                token_cache = await asyncio.to_thread(carregar_token, cookies, alvo['url'], identidade,
+                                                      token_cache_ttl)
+                resultado = await executar_verificacao_async(
+                    sessao, alvo['url'], alvo['usuario'], alvo['senha'], alvo['max_delay'],
+                    token=token_cache, motor=motor, memo=memo, vista=alvo['vista'], timeout=timeout,
+                    prazo=prazo, medir_fases=medir_fases
+                )
+                await asyncio.to_thread(atualizar_cache_token, cookies, alvo['url'], identidade, token_cache,
+                                        resultado['token'], token_cache_ttl)
+            if circuito:
+                await asyncio.to_thread(circuito.registrar, resultado)
+            return resultado
+        except Exception as e:
+            return resultado_inesperado(alvo, e)
+
+    try:
+        resultados = await asyncio.gather(*(verificar(alvo) for alvo in alvos))
+    finally:
+        await conector.close()
+    return list(zip(alvos, resultados))
+
+
+def executar_alvos_async(alvos, **opcoes):
+    """Executa ``verificar_alvos_async`` em um novo laço de eventos (uso síncrono)."""
+    return asyncio.run(verificar_alvos_async(alvos, **opcoes))
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Benchmark da partida a frio do check_sincronismo.py.
+
+Mede, em processos novos e acima do interpretador vazio, o custo de importar o
+módulo e o de executar o script até o ``main`` terminar sem rede
+(``check_sincronismo.py --help``: ``dotenv``, log e parser de argumentos), e
+compara os dois com os orçamentos documentados no README. Também confere que
+nenhuma dependência pesada é importada junto com o módulo e mostra, só para
+referência, uma verificação completa com token em cache contra o ERP simulado
+(os limites dela ficam com ``bench_ponta_a_ponta.py``).
+
+Uso:
+    uv run benchmarks/bench_inicializacao.py
+    uv run benchmarks/bench_inicializacao.py --repeticoes 30 --orcamento-ms 60 --orcamento-partida-ms 150
+    uv run benchmarks/bench_inicializacao.py --sem-erp
+
+Sai com código 1 se algum orçamento for excedido.
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Orçamento de importação do módulo, acima do interpretador vazio (ms)
+ORCAMENTO_IMPORTACAO_MS = 60
+
+# Orçamento do script até o fim do main sem rede (--help), acima do interpretador vazio (ms)
+ORCAMENTO_PARTIDA_MS = 150
+
+# Dependências que só podem ser carregadas sob demanda
+IMPORTACOES_ADIADAS = ('requests', 'bs4', 'lxml', 'dotenv')
+
+
+def medir(codigo, repeticoes):
+    """Mediana, em segundos, do tempo de parede de ``python -c codigo``."""
+    return medir_comando([sys.executable, '-c', codigo], repeticoes)
+
+
+def medir_comando(comando, repeticoes, ambiente=None):
+    """Mediana, em segundos, do tempo de parede de ``comando`` (saída descartada)."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        subprocess.run(comando, cwd=RAIZ, env=ambiente, check=True, stdout=subprocess.DEVNULL)
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def medir_verificacao(repeticoes):
+    """Mediana, em segundos, de uma verificação com token em cache contra o ERP simulado (10 linhas)."""
+    from erp_simulado import ERPSimulado, ServidorERPSimulado
+    from bench_ponta_a_ponta import Bancada, MODO_TOKEN
+
+    servidor = ServidorERPSimulado(ERPSimulado(linhas=10, empresas=['17'], renovar_pagina=86400)).iniciar()
+    bancada = Bancada(servidor.url, repeticoes, [])
+    try:
+        comando = [sys.executable, 'check_sincronismo.py'] + bancada.argumentos(900)
+        ambiente = bancada.ambiente(MODO_TOKEN)
+        # A primeira execução faz o login e grava o token em cache
+        subprocess.run(comando, cwd=RAIZ, env=ambiente, check=True, stdout=subprocess.DEVNULL)
+        return medir_comando(comando, repeticoes, ambiente)
+    finally:
+        bancada.encerrar()
+        servidor.encerrar()
+
+
+def modulos_carregados():
+    """Dependências pesadas presentes em sys.modules após importar o módulo."""
+    codigo = ("import sys, json, check_sincronismo; "
+              f"print(json.dumps([m for m in {IMPORTACOES_ADIADAS!r} if m in sys.modules]))")
+    saida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, check=True, capture_output=True, text=True)
+    return json.loads(saida.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede a partida a frio do check_sincronismo.py.")
+    parser.add_argument('--repeticoes', type=int, default=15, help="Processos por medição (usa a mediana).")
+    parser.add_argument('--orcamento-ms', type=float, default=ORCAMENTO_IMPORTACAO_MS, help="Orçamento de importação acima do interpretador vazio.")
+    parser.add_argument('--orcamento-partida-ms', type=float, default=ORCAMENTO_PARTIDA_MS, help="Orçamento de check_sincronismo.py --help acima do interpretador vazio.")
+    parser.add_argument('--sem-erp', action='store_true', help="Não mede a verificação completa contra o ERP simulado.")
+    args = parser.parse_args()
+
+    vazio = medir('pass', args.repeticoes)
+    modulo = medir('import check_sincronismo', args.repeticoes)
+    completo = medir('import requests, lxml.html, dotenv, check_sincronismo', args.repeticoes)
+    ajuda = medir_comando([sys.executable, 'check_sincronismo.py', '--help'], args.repeticoes)
+    custo = (modulo - vazio) * 1000
+    custo_partida = (ajuda - vazio) * 1000
+
+    print(f"{'interpretador vazio':<40} {vazio * 1000:>8.1f} ms")
+    print(f"{'import check_sincronismo':<40} {modulo * 1000:>8.1f} ms")
+    print(f"{'  + requests, lxml e dotenv':<40} {completo * 1000:>8.1f} ms")
+    print(f"{'check_sincronismo.py --help':<40} {ajuda * 1000:>8.1f} ms")
+    if not args.sem_erp:
+        verificacao = medir_verificacao(args.repeticoes)
+        print(f"{'verificação com token (ERP simulado)':<40} {verificacao * 1000:>8.1f} ms")
+    print(f"{'custo do módulo (orçamento)':<40} {custo:>8.1f} ms ({args.orcamento_ms:.0f} ms)")
+    print(f"{'custo da partida (orçamento)':<40} {custo_partida:>8.1f} ms ({args.orcamento_partida_ms:.0f} ms)")
+
+    carregados = modulos_carregados()
+    if carregados:
+        print(f"Dependências importadas junto com o módulo: {', '.join(carregados)}")
+    if carregados or custo > args.orcamento_ms or custo_partida > args.orcamento_partida_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Benchmark do custo do log na análise da grade.
+
+Mede ``parse_status_page`` com o log gravado em arquivo em três níveis:
+
+- ``warning``: praticamente sem log (piso da análise);
+- ``resumo``: INFO, o padrão: uma linha de resumo por execução;
+- ``trace``: DEBUG (``--trace``): detalhe de cada linha da grade, o mesmo
+  volume que o log em INFO produzia antes do resumo.
+
+Uso:
+    uv run benchmarks/bench_log_analise.py
+    uv run benchmarks/bench_log_analise.py --linhas 1000 5000 --repeticoes 5 --log-a-cada 10
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from check_sincronismo import parse_status_page, logger
+from grade_sintetica import gerar_pagina
+
+NIVEIS = {'warning': logging.WARNING, 'resumo': logging.INFO, 'trace': logging.DEBUG}
+
+
+def medir(html, nivel, repeticoes):
+    """Retorna a mediana, em segundos, das análises e as linhas gravadas por análise."""
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, 'bench.log')
+        # Mesmo formato e gravação síncrona em arquivo do setup_logging
+        handler = logging.FileHandler(caminho, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        handlers, logger.handlers = logger.handlers, [handler]
+        logger.setLevel(NIVEIS[nivel])
+        try:
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                parse_status_page(html)
+                tempos.append(time.perf_counter() - inicio)
+        finally:
+            logger.handlers = handlers
+            handler.close()
+        with open(caminho, encoding='utf-8') as f:
+            linhas_log = sum(1 for _ in f)
+    return statistics.median(tempos), linhas_log // repeticoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o custo do log por linha na análise da grade de sincronismo.")
+    parser.add_argument('--linhas', type=int, nargs='+', default=[1000, 5000, 20000], help="Tamanhos de grade a medir.")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Repetições por medição (usa a mediana).")
+    parser.add_argument('--log-a-cada', type=int, default=10, help="Uma linha com texto em 'Log Filial p/ Sinc.' a cada N filiais.")
+    args = parser.parse_args()
+
+    # Aquece o motor e o cache de layout de colunas fora da medição
+    parse_status_page(gerar_pagina(10))
+
+    print(f"{'linhas':>8} {'nivel':>8} {'tempo (ms)':>11} {'linhas de log':>14} {'economia':>9}")
+    for linhas in args.linhas:
+        html = gerar_pagina(linhas, linhas_com_log=range(0, linhas, args.log_a_cada))
+        resultados = {nivel: medir(html, nivel, args.repeticoes) for nivel in NIVEIS}
+        tempo_trace = resultados['trace'][0]
+        for nivel, (tempo, linhas_log) in resultados.items():
+            economia = f"{(1 - tempo / tempo_trace) * 100:>8.0f}%" if nivel != 'trace' else f"{'-':>9}"
+            print(f"{linhas:>8} {nivel:>8} {tempo * 1000:>11.1f} {linhas_log:>14} {economia}")
+
+
+if __name__ == "__main__":
+    main()
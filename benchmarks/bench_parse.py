@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Benchmark dos motores de análise da grade: lxml (XPath) x BeautifulSoup.
+
+Uso:
+    uv run benchmarks/bench_parse.py
+    uv run benchmarks/bench_parse.py --linhas 1000 5000 20000 --repeticoes 5
+
+O log do script é elevado para WARNING durante a medição para que o custo de
+escrita em disco não mascare a diferença entre os motores.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from check_sincronismo import parse_status_page, logger, MOTOR_LXML, MOTOR_BS4
+from grade_sintetica import gerar_pagina
+
+
+def medir(html, motor, repeticoes):
+    """Retorna a mediana, em segundos, de ``repeticoes`` análises da página."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        parse_status_page(html, motor)
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara os motores de análise da grade de sincronismo.")
+    parser.add_argument('--linhas', type=int, nargs='+', default=[100, 1000, 5000, 20000], help="Tamanhos de grade a medir.")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Repetições por medição (usa a mediana).")
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+
+    print(f"{'linhas':>8} {'bytes':>11} {'bs4 (ms)':>10} {'lxml (ms)':>10} {'ganho':>7}")
+    for linhas in args.linhas:
+        html = gerar_pagina(linhas, linhas_com_log=range(0, linhas, 50))
+        # Os dois motores precisam concordar antes de comparar tempos
+        assert parse_status_page(html, MOTOR_LXML) == parse_status_page(html, MOTOR_BS4)
+        tempo_bs4 = medir(html, MOTOR_BS4, args.repeticoes)
+        tempo_lxml = medir(html, MOTOR_LXML, args.repeticoes)
+        print(f"{linhas:>8} {len(html):>11} {tempo_bs4 * 1000:>10.1f} {tempo_lxml * 1000:>10.1f} {tempo_bs4 / tempo_lxml:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
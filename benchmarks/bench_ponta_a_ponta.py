@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""Benchmark de ponta a ponta da verificação contra o ERP simulado.
+
+Executa a verificação completa (login, seleção de empresa, busca da vista,
+análise e decisão) em processos novos, como o Zabbix, contra
+``erp_simulado.py`` com grades de vários tamanhos e em três modos:
+
+- ``frio``: execução avulsa sem cache de token (login a cada coleta);
+- ``token``: execução avulsa reaproveitando o token do cache;
+- ``daemon``: ``cliente_sincronismo.py`` consultando o daemon residente.
+
+Para cada modo e tamanho reporta os percentis p50/p95/p99 do tempo de parede,
+a média de CPU (usuário + sistema) e o pico de memória (RSS) do processo
+medido e, no modo daemon, a CPU por verificação e o pico de RSS do daemon. O
+resultado vai para um JSON e, com ``--baseline``, é comparado com uma linha de
+base (``--baseline`` sem arquivo usa a de referência versionada em
+``benchmarks/baseline.json``): sai com código 1 se p50, p95, CPU ou RSS
+piorarem além da tolerância. Uma base gravada com outro Python ou em outra
+plataforma é comparada mesmo assim, com aviso.
+
+A memorização da análise fica desligada (``--parse-cache-size 0``) para que
+cada coleta analise a grade. Só funciona em Linux (usa ``os.wait4`` e ``/proc``).
+
+Uso:
+    uv run benchmarks/bench_ponta_a_ponta.py
+    uv run benchmarks/bench_ponta_a_ponta.py --linhas 10 1000 --repeticoes 30 --modos frio token
+    uv run benchmarks/bench_ponta_a_ponta.py --baseline --tolerancia 0.15
+    uv run benchmarks/bench_ponta_a_ponta.py --baseline --atualizar-baseline
+    uv run benchmarks/bench_ponta_a_ponta.py --baseline benchmarks/resultados/base.json --atualizar-baseline
+    uv run benchmarks/bench_ponta_a_ponta.py --baseline benchmarks/resultados/base.json
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import signal
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from erp_simulado import ERPSimulado, ServidorERPSimulado
+
+MODO_FRIO = 'frio'
+MODO_TOKEN = 'token'
+MODO_DAEMON = 'daemon'
+MODOS = (MODO_FRIO, MODO_TOKEN, MODO_DAEMON)
+
+LINHAS_PADRAO = [10, 1000, 10000, 50000]
+SAIDA_PADRAO = os.path.join(RAIZ, 'benchmarks', 'resultados', 'ponta_a_ponta.json')
+
+# Linha de base de referência, versionada (resultados/ fica fora do git), usada
+# por ``--baseline`` sem arquivo
+BASELINE_PADRAO = os.path.join(RAIZ, 'benchmarks', 'baseline.json')
+
+# Piora aceita em relação à linha de base (fração) e métricas comparadas
+TOLERANCIA_PADRAO = 0.20
+METRICAS_COMPARADAS = ('p50_ms', 'p95_ms', 'cpu_ms', 'rss_pico_kb')
+
+# Espera máxima pelo socket do daemon (segundos)
+ESPERA_DAEMON = 30
+
+
+def percentil(valores, p):
+    """Percentil ``p`` (0 a 100) com interpolação linear entre as amostras."""
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+
+def executar(comando, ambiente):
+    """Executa ``comando`` e retorna parede (s), CPU (s), pico de RSS (KB) e a saída."""
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(comando, cwd=RAIZ, env=ambiente, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    saida = processo.stdout.read()
+    processo.stdout.close()
+    # wait4 devolve o uso de recursos só deste processo (RUSAGE_CHILDREN acumularia todos)
+    _, status, uso = os.wait4(processo.pid, 0)
+    parede = time.perf_counter() - inicio
+    processo.returncode = os.waitstatus_to_exitcode(status)
+    return {'parede': parede, 'cpu': uso.ru_utime + uso.ru_stime, 'rss_kb': uso.ru_maxrss,
+            'saida': saida.decode('utf-8', errors='replace').strip()}
+
+
+def uso_processo(pid):
+    """CPU acumulada (s) e pico de RSS (KB) de um processo em execução, via /proc."""
+    with open(f"/proc/{pid}/stat") as f:
+        campos = f.read().rsplit(')', 1)[1].split()
+    cpu = (int(campos[11]) + int(campos[12])) / os.sysconf('SC_CLK_TCK')
+    with open(f"/proc/{pid}/status") as f:
+        rss = next(int(linha.split()[1]) for linha in f if linha.startswith('VmHWM:'))
+    return cpu, rss
+
+
+def resumir(modo, linhas, amostras):
+    """Percentis, CPU média e pico de RSS das amostras de um modo/tamanho."""
+    tempos = [amostra['parede'] * 1000 for amostra in amostras]
+    return {
+        'modo': modo,
+        'linhas': linhas,
+        'amostras': len(amostras),
+        'falhas': sum(1 for amostra in amostras if not amostra['saida'].startswith('STATUS_OK')),
+        'p50_ms': round(percentil(tempos, 50), 2),
+        'p95_ms': round(percentil(tempos, 95), 2),
+        'p99_ms': round(percentil(tempos, 99), 2),
+        'max_ms': round(max(tempos), 2),
+        'cpu_ms': round(sum(amostra['cpu'] for amostra in amostras) / len(amostras) * 1000, 2),
+        'rss_pico_kb': max(amostra['rss_kb'] for amostra in amostras),
+    }
+
+
+class Bancada:
+    """Executa as medições de um tamanho de grade contra um ERP simulado."""
+
+    def __init__(self, url, repeticoes, extra):
+        self.url = url
+        self.repeticoes = repeticoes
+        self.extra = extra
+        self.diretorio = tempfile.mkdtemp(prefix='bench_sincronismo_')
+
+    def ambiente(self, modo):
+        cache = os.path.join(self.diretorio, modo)
+        os.makedirs(cache, exist_ok=True)
+        return dict(os.environ, ERP_PASSWORD='senha', SINCRONISMO_CACHE_DIR=cache,
+                    SINCRONISMO_SOCKET=os.path.join(self.diretorio, 'daemon.sock'))
+
+    def argumentos(self, token_cache_ttl):
+        # max-delay alto: a grade não é regenerada durante a medição
+        return ['--url', self.url, '--username', 'MONITOR', '--max-delay', '86400',
+                '--token-cache-ttl', str(token_cache_ttl), '--parse-cache-size', '0',
+                '--circuit-threshold', '0'] + self.extra
+
+    def medir(self, comando, ambiente):
+        # A primeira execução aquece o bytecode, o cache de token e a sessão do daemon
+        executar(comando, ambiente)
+        return [executar(comando, ambiente) for _ in range(self.repeticoes)]
+
+    def avulso(self, modo):
+        ttl = 0 if modo == MODO_FRIO else 900
+        comando = [sys.executable, 'check_sincronismo.py'] + self.argumentos(ttl)
+        return self.medir(comando, self.ambiente(modo)), {}
+
+    def daemon(self):
+        ambiente = self.ambiente(MODO_DAEMON)
+        socket_daemon = ambiente['SINCRONISMO_SOCKET']
+        daemon = subprocess.Popen([sys.executable, 'daemon_sincronismo.py', '--socket', socket_daemon],
+                                  cwd=RAIZ, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            limite = time.monotonic() + ESPERA_DAEMON
+            while not os.path.exists(socket_daemon):
+                if daemon.poll() is not None or time.monotonic() > limite:
+                    raise RuntimeError("O daemon não abriu o socket")
+                time.sleep(0.05)
+            comando = [sys.executable, 'cliente_sincronismo.py'] + self.argumentos(900)
+            executar(comando, ambiente)
+            cpu_inicio, _ = uso_processo(daemon.pid)
+            amostras = [executar(comando, ambiente) for _ in range(self.repeticoes)]
+            cpu_fim, rss_pico = uso_processo(daemon.pid)
+        finally:
+            daemon.send_signal(signal.SIGTERM)
+            daemon.wait(timeout=10)
+        return amostras, {'daemon_cpu_ms': round((cpu_fim - cpu_inicio) / len(amostras) * 1000, 2),
+                          'daemon_rss_pico_kb': rss_pico}
+
+    def encerrar(self):
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+
+def comparar(resultados, base, tolerancia):
+    """Lista as métricas que pioraram mais que ``tolerancia`` em relação à base."""
+    referencia = {(item['modo'], item['linhas']): item for item in base.get('resultados', [])}
+    regressoes = []
+    for item in resultados:
+        anterior = referencia.get((item['modo'], item['linhas']))
+        if not anterior:
+            continue
+        for metrica in METRICAS_COMPARADAS:
+            if anterior.get(metrica) and item[metrica] > anterior[metrica] * (1 + tolerancia):
+                regressoes.append(f"{item['modo']}/{item['linhas']} linhas: {metrica} "
+                                  f"{anterior[metrica]:g} -> {item[metrica]:g} "
+                                  f"(+{(item[metrica] / anterior[metrica] - 1) * 100:.0f}%)")
+    return regressoes
+
+
+def diferencas_ambiente(documento, base):
+    """Descreve o que difere entre o ambiente da medição e o da linha de base."""
+    return [f"{chave} {base.get(chave)} na base, {documento[chave]} agora"
+            for chave in ('python', 'plataforma') if base.get(chave) != documento[chave]]
+
+
+def imprimir(resultados):
+    print(f"{'modo':<7} {'linhas':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'CPU ms':>8} {'RSS MB':>7} {'falhas':>6}")
+    for item in resultados:
+        print(f"{item['modo']:<7} {item['linhas']:>7} {item['p50_ms']:>9.1f} {item['p95_ms']:>9.1f} "
+              f"{item['p99_ms']:>9.1f} {item['cpu_ms']:>8.1f} {item['rss_pico_kb'] / 1024:>7.1f} {item['falhas']:>6}")
+        if 'daemon_cpu_ms' in item:
+            print(f"{'':<7} {'':>7} daemon: {item['daemon_cpu_ms']:.1f} ms de CPU por verificação, "
+                  f"pico de {item['daemon_rss_pico_kb'] / 1024:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ponta a ponta contra o ERP simulado.")
+    parser.add_argument('--linhas', type=int, nargs='+', default=LINHAS_PADRAO, help="Tamanhos de grade a medir.")
+    parser.add_argument('--modos', nargs='+', choices=MODOS, default=list(MODOS), help="Modos de execução a medir.")
+    parser.add_argument('--repeticoes', type=int, default=10, help="Verificações medidas por modo e tamanho.")
+    parser.add_argument('--latencia', type=float, default=0.0, help="Latência do ERP simulado em cada resposta (s).")
+    parser.add_argument('--extra', default='', help="Argumentos adicionais da verificação (ex.: \"--stream\").")
+    parser.add_argument('--saida', default=SAIDA_PADRAO, help="Arquivo JSON com os resultados.")
+    parser.add_argument('--baseline', nargs='?', const=BASELINE_PADRAO, default=None,
+                        help="JSON de uma execução anterior para comparar; sem arquivo, a referência versionada "
+                             "(sem a opção não há comparação).")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO, help="Piora aceita em relação à base (0.2 = 20%%).")
+    parser.add_argument('--atualizar-baseline', action='store_true', help="Grava o resultado como nova linha de base em --baseline.")
+    args = parser.parse_args()
+    if args.repeticoes < 2:
+        parser.error("--repeticoes deve ser pelo menos 2")
+    if args.atualizar_baseline and not args.baseline:
+        parser.error("--atualizar-baseline exige --baseline")
+
+    resultados = []
+    for linhas in args.linhas:
+        erp = ERPSimulado(linhas=linhas, empresas=['17'], latencia=args.latencia, renovar_pagina=86400)
+        servidor = ServidorERPSimulado(erp).iniciar()
+        bancada = Bancada(servidor.url, args.repeticoes, shlex.split(args.extra))
+        try:
+            for modo in args.modos:
+                print(f"Medindo {modo} com {linhas} linhas...", file=sys.stderr)
+                amostras, adicionais = bancada.daemon() if modo == MODO_DAEMON else bancada.avulso(modo)
+                resultados.append(dict(resumir(modo, linhas, amostras), **adicionais))
+        finally:
+            bancada.encerrar()
+            servidor.encerrar()
+
+    documento = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'parametros': {'repeticoes': args.repeticoes, 'latencia': args.latencia, 'extra': args.extra},
+        'resultados': resultados,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump(documento, f, indent=2)
+    imprimir(resultados)
+    print(f"Resultados gravados em {args.saida}")
+
+    if not args.baseline:
+        return
+    if args.atualizar_baseline:
+        shutil.copyfile(args.saida, args.baseline)
+        print(f"Linha de base atualizada: {args.baseline}")
+        return
+    with open(args.baseline, encoding='utf-8') as f:
+        base = json.load(f)
+    diferencas = diferencas_ambiente(documento, base)
+    if diferencas:
+        # Números de outro Python ou outra máquina só apontam regressões grandes
+        print(f"Aviso: a linha de base {args.baseline} foi gravada em outro ambiente ({'; '.join(diferencas)})")
+    regressoes = comparar(resultados, base, args.tolerancia)
+    if regressoes:
+        print(f"Regressões acima de {args.tolerancia * 100:.0f}% em relação a {args.baseline}:")
+        for regressao in regressoes:
+            print(f"  {regressao}")
+        sys.exit(1)
+    print(f"Sem regressões acima de {args.tolerancia * 100:.0f}% em relação a {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Benchmark do custo da previsão por verificação com meses de histórico.
+
+Preenche um histórico com N dias de observações (uma por minuto) e de envios
+das filiais e mede ``HistoricoSincronismo.registrar`` com e sem a atualização
+das tendências (``--forecast``). A previsão lê e grava só o estado da janela
+móvel de cada série: o tempo não deve crescer com os dias de histórico.
+
+Uso:
+    uv run benchmarks/bench_previsao.py
+    uv run benchmarks/bench_previsao.py --dias 1 90 365 --filiais 50 --repeticoes 200
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from historico_sincronismo import HistoricoSincronismo
+from previsao_sincronismo import prever_resultado, MEIA_VIDA_PADRAO
+
+ALVO = 'MONITOR@http://erp'
+
+
+def resultado_sintetico(momento, filiais):
+    """Resultado analisado com ``filiais`` filiais, todas com envio há até 5 minutos."""
+    envio = datetime.fromtimestamp(momento // 300 * 300).isoformat()
+    registros = [{'codigo': str(codigo), 'filial': f'FILIAL {codigo}', 'ultimo_envio': envio,
+                  'ultimo_recebimento': None, 'log': ''} for codigo in range(filiais)]
+    return {'codigo': 0, 'saida': 'STATUS_OK', 'atraso_segundos': momento % 300, 'ultimo_envio': envio,
+            'tempos': {'busca': 0.1, 'total': 0.2},
+            'status_data': {'total_linhas': filiais, 'logs_filial': [], 'filiais': registros}}
+
+
+def preencher(historico, dias, filiais, agora):
+    """Grava ``dias`` de observações por minuto direto no banco (sem o custo do registrar)."""
+    inicio = agora - dias * 86400
+    momentos = range(int(inicio), int(agora), 60)
+    with historico._transacao():
+        historico.conexao.executemany(
+            "INSERT INTO observacoes (momento, alvo, codigo, atraso_segundos, ultimo_envio, total_linhas)"
+            " VALUES (?, ?, 0, ?, ?, ?)",
+            ((momento, ALVO, momento % 300, momento // 300 * 300, filiais) for momento in momentos)
+        )
+        historico.conexao.executemany(
+            "INSERT INTO envios_filiais (alvo, codigo, momento, ultimo_envio) VALUES (?, ?, ?, ?)",
+            ((ALVO, str(codigo), momento, momento) for momento in range(int(inicio), int(agora), 300)
+             for codigo in range(filiais))
+        )
+        # Manutenção fora da medição
+        historico.conexao.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('ultima_manutencao', ?)",
+                                  (agora + 86400,))
+
+
+def medir(caminho, filiais, repeticoes, agora, meia_vida):
+    """Mediana, em milissegundos, de um registrar (com previsão, se ``meia_vida``)."""
+    tempos = []
+    with HistoricoSincronismo(caminho, dias_brutos=10000, dias_resumo=10000) as historico:
+        for i in range(repeticoes):
+            momento = agora + i * 60
+            resultado = resultado_sintetico(momento, filiais)
+            inicio = time.perf_counter()
+            tendencias = historico.registrar(ALVO, resultado, agora=momento, meia_vida=meia_vida)
+            if meia_vida:
+                prever_resultado(tendencias, resultado, 900, meia_vida=meia_vida, agora=momento)
+            tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o custo da previsão do atraso por verificação conforme o histórico cresce.")
+    parser.add_argument('--dias', type=int, nargs='+', default=[1, 30, 180], help="Dias de histórico pré-existente.")
+    parser.add_argument('--filiais', type=int, default=20, help="Filiais por verificação.")
+    parser.add_argument('--repeticoes', type=int, default=100, help="Verificações medidas (usa a mediana).")
+    args = parser.parse_args()
+
+    agora = time.time()
+    print(f"{'dias':>6} {'observacoes':>12} {'sem previsao (ms)':>18} {'com previsao (ms)':>18}")
+    for dias in args.dias:
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'historico.sqlite3')
+            with HistoricoSincronismo(caminho, dias_brutos=10000, dias_resumo=10000) as historico:
+                preencher(historico, dias, args.filiais, agora)
+            sem = medir(caminho, args.filiais, args.repeticoes, agora, None)
+            com = medir(caminho, args.filiais, args.repeticoes, agora + args.repeticoes * 60, MEIA_VIDA_PADRAO)
+            print(f"{dias:>6} {dias * 1440:>12} {sem:>18.2f} {com:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""Servidor local que imita o Controller do Tecnicon para benchmarks e testes de carga.
+
+Atende em ``/Tecnicon/Controller`` as três ações usadas pela verificação:
+
+- ``Tecnicon.EfetuaLogin.obterTelaHtml``: confere usuário e senha (se
+  configurados) e devolve o token em ``preencheSessao(...)`` ou, com
+  ``--empresas``, a tela de seleção de empresa;
+- ``Tecnicon.EmpresaLogin.selecionarEmpresa``: emite o token da empresa escolhida;
+- ``TecniconVista.CarregaVista.carregaVista``: devolve a grade de
+  ``grade_sintetica`` com ``--linhas`` filiais, ou a tela de login quando o
+  token é desconhecido ou passou de ``--token-ttl``.
+
+Latência (com variação aleatória), tamanho da grade e falhas injetadas
+(HTTP 500, página de erro do Tomcat, HTTP 401, conexão encerrada sem resposta
+e lentidão extra) são configuráveis. ``GET /__estatisticas`` devolve os
+contadores em JSON. Só usa a biblioteca padrão.
+
+Uso:
+    python benchmarks/erp_simulado.py --porta 8080 --linhas 5000 --empresas 17,22 --latencia 0.05
+    python benchmarks/erp_simulado.py --token-ttl 60 --erro http500=0.05 --erro queda=0.01 --semente 1
+    python check_sincronismo.py --url http://127.0.0.1:8080 --username MONITOR --max-delay 300
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import signal
+import secrets
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from grade_sintetica import gerar_pagina
+
+ACAO_LOGIN = 'Tecnicon.EfetuaLogin.obterTelaHtml'
+ACAO_EMPRESA = 'Tecnicon.EmpresaLogin.selecionarEmpresa'
+ACAO_VISTA = 'TecniconVista.CarregaVista.carregaVista'
+FASES = {ACAO_LOGIN: 'login', ACAO_EMPRESA: 'empresa', ACAO_VISTA: 'vista'}
+
+# Falhas que podem ser injetadas (--erro MODO=TAXA)
+ERRO_HTTP500 = 'http500'
+ERRO_PAGINA = 'pagina_erro'
+ERRO_SESSAO = 'sessao'
+ERRO_QUEDA = 'queda'
+ERRO_LENTIDAO = 'lentidao'
+ERROS = (ERRO_HTTP500, ERRO_PAGINA, ERRO_SESSAO, ERRO_QUEDA, ERRO_LENTIDAO)
+
+PAGINA_ERRO = ("<html><head><title>Apache Tomcat - Error report</title></head><body>"
+               "<h1>HTTP Status 500 - java.lang.NullPointerException</h1></body></html>")
+TELA_LOGIN = ("<html><body><div id='dv0'></div><script>logintimeout = true;"
+              "Tecnicon.EfetuaLogin.obterTelaHtml('dv0');</script></body></html>")
+LOGIN_INVALIDO = "<html><body><div class='msg'>Usuário ou senha inválidos.</div></body></html>"
+
+
+def tela_empresas(codigos):
+    """Tela de seleção de empresa exibida após o login."""
+    linhas = ''.join(f"<tr><td>{codigo}</td><td>EMPRESA {codigo}</td></tr>" for codigo in codigos)
+    return ("<div class='titulo'>Selecione a Empresa</div><table id='tblBody' class='tEmpresas'>"
+            f"<tr><th>Código</th><th>Empresa</th></tr>{linhas}</table>")
+
+
+class ERPSimulado:
+    """Configuração, tokens emitidos e contadores do ERP simulado.
+
+    ``erros`` mapeia um modo de ERROS à probabilidade (0 a 1) de cada
+    requisição das fases em ``fases_com_erro`` (todas, se vazio) falhar assim.
+    ``renovar_pagina`` define de quantos em quantos segundos a grade é gerada
+    de novo, para o último envio continuar ``atraso_envio`` segundos no passado.
+    """
+
+    def __init__(self, linhas=100, atraso_envio=30, linhas_com_log=(), empresas=(), latencia=0.0,
+                 latencia_vista=None, variacao=0.0, token_ttl=0, erros=None, fases_com_erro=(),
+                 atraso_lentidao=5.0, usuario=None, senha=None, semente=None, renovar_pagina=60):
+        desconhecidos = set(erros or {}) - set(ERROS)
+        if desconhecidos:
+            raise ValueError(f"Modos de erro desconhecidos: {sorted(desconhecidos)}")
+        self.linhas = linhas
+        self.atraso_envio = atraso_envio
+        self.linhas_com_log = tuple(linhas_com_log)
+        self.empresas = [str(codigo) for codigo in empresas]
+        self.latencia = latencia
+        self.latencia_vista = latencia if latencia_vista is None else latencia_vista
+        self.variacao = variacao
+        self.token_ttl = token_ttl
+        self.erros = dict(erros or {})
+        self.fases_com_erro = set(fases_com_erro)
+        self.atraso_lentidao = atraso_lentidao
+        self.usuario = usuario
+        self.senha = senha
+        self.renovar_pagina = renovar_pagina
+        self.aleatorio = random.Random(semente)
+        self.tokens = {}
+        self.lock = threading.Lock()
+        self._pagina = None
+        self._pagina_em = 0
+        self.contadores = {}
+        self.simultaneas = 0
+
+    def contar(self, nome, quantidade=1):
+        with self.lock:
+            self.contadores[nome] = self.contadores.get(nome, 0) + quantidade
+
+    def estatisticas(self):
+        """Contadores, tokens ativos e o maior número de requisições simultâneas."""
+        with self.lock:
+            return dict(self.contadores, tokens_ativos=len(self.tokens))
+
+    def pagina(self):
+        """Corpo (bytes) da vista, gerado de novo a cada ``renovar_pagina`` segundos."""
+        with self.lock:
+            agora = time.time()
+            if self._pagina is None or agora - self._pagina_em >= self.renovar_pagina:
+                self._pagina = gerar_pagina(self.linhas, self.atraso_envio, self.linhas_com_log).encode('utf-8')
+                self._pagina_em = agora
+            return self._pagina
+
+    def latencia_de(self, fase):
+        """Espera antes de responder à fase, com a variação aleatória."""
+        base = self.latencia_vista if fase == 'vista' else self.latencia
+        with self.lock:
+            return base + (self.aleatorio.uniform(0, self.variacao) if self.variacao else 0)
+
+    def sortear_erro(self, fase):
+        """Modo de erro a injetar nesta requisição, ou None."""
+        if self.fases_com_erro and fase not in self.fases_com_erro:
+            return None
+        with self.lock:
+            for modo, taxa in self.erros.items():
+                if self.aleatorio.random() < taxa:
+                    return modo
+        return None
+
+    def emitir_token(self, empresa):
+        token = f"{empresa or 'tk'}-{secrets.token_hex(8)}"
+        with self.lock:
+            self.tokens[token] = time.monotonic()
+        self.contar('tokens_emitidos')
+        return f"<html><script>preencheSessao('{token}');</script></html>"
+
+    def token_valido(self, token):
+        with self.lock:
+            emitido = self.tokens.get(token)
+            if emitido is None:
+                return False
+            if self.token_ttl and time.monotonic() - emitido > self.token_ttl:
+                del self.tokens[token]
+                self.contadores['tokens_expirados'] = self.contadores.get('tokens_expirados', 0) + 1
+                return False
+            return True
+
+    def responder(self, fase, formulario, autorizacao):
+        """Resposta (status, corpo) de uma requisição sem erro injetado."""
+        if fase == 'login':
+            if (self.usuario and formulario.get('usuario') != self.usuario) or \
+                    (self.senha and formulario.get('senha') != self.senha):
+                self.contar('logins_recusados')
+                return 200, LOGIN_INVALIDO
+            if self.empresas:
+                return 200, tela_empresas(self.empresas)
+            return 200, self.emitir_token(None)
+        if fase == 'empresa':
+            if formulario.get('empresa') not in self.empresas:
+                return 200, PAGINA_ERRO
+            return 200, self.emitir_token(formulario['empresa'])
+        if not self.token_valido(autorizacao):
+            self.contar('sessoes_recusadas')
+            return 200, TELA_LOGIN
+        return 200, self.pagina()
+
+
+class ManipuladorERP(BaseHTTPRequestHandler):
+    """Atende o Controller do ERP simulado em ``server.erp``."""
+
+    # Conexões persistentes, como o Tomcat: a sessão do requests as reaproveita
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        corpo = self.rfile.read(tamanho).decode('utf-8', errors='replace')
+        fase = FASES.get(parse_qs(url.query).get('acao', [''])[0])
+        if url.path != '/Tecnicon/Controller' or fase is None:
+            self._enviar(404, PAGINA_ERRO)
+            return
+
+        erp = self.server.erp
+        erp.contar(fase)
+        with erp.lock:
+            erp.simultaneas += 1
+            erp.contadores['maximo_simultaneas'] = max(erp.contadores.get('maximo_simultaneas', 0), erp.simultaneas)
+        try:
+            self._atender(erp, fase, {chave: valores[0] for chave, valores in parse_qs(corpo).items()})
+        finally:
+            with erp.lock:
+                erp.simultaneas -= 1
+
+    def _atender(self, erp, fase, formulario):
+        erro = erp.sortear_erro(fase)
+        if erro:
+            erp.contar(f"erro_{erro}")
+        time.sleep(erp.latencia_de(fase) + (erp.atraso_lentidao if erro == ERRO_LENTIDAO else 0))
+
+        if erro == ERRO_QUEDA:
+            # Fecha a conexão sem responder, como um ERP reiniciando
+            self.close_connection = True
+            return
+        if erro == ERRO_HTTP500:
+            self._enviar(500, PAGINA_ERRO)
+        elif erro == ERRO_PAGINA:
+            self._enviar(200, PAGINA_ERRO)
+        elif erro == ERRO_SESSAO:
+            self._enviar(401, TELA_LOGIN)
+        else:
+            status, resposta = erp.responder(fase, formulario, self.headers.get('Authorization'))
+            self._enviar(status, resposta, nova_sessao=fase == 'login')
+
+    def do_GET(self):
+        if urlsplit(self.path).path != '/__estatisticas':
+            self._enviar(404, PAGINA_ERRO)
+            return
+        self._enviar(200, json.dumps(self.server.erp.estatisticas()), 'application/json')
+
+    def _enviar(self, status, corpo, tipo='text/html;charset=UTF-8', nova_sessao=False):
+        if isinstance(corpo, str):
+            corpo = corpo.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(corpo)))
+        if nova_sessao:
+            self.send_header('Set-Cookie', f"JSESSIONID={secrets.token_hex(16).upper()}; Path=/Tecnicon; HttpOnly")
+        self.end_headers()
+        self.wfile.write(corpo)
+        self.server.erp.contar('bytes_enviados', len(corpo))
+
+    def log_message(self, formato, *args):
+        pass
+
+
+class ServidorERPSimulado(ThreadingHTTPServer):
+    """Servidor HTTP do ERP simulado; ``porta=0`` escolhe uma porta livre."""
+
+    daemon_threads = True
+
+    def __init__(self, erp, endereco='127.0.0.1', porta=0):
+        self.erp = erp
+        super().__init__((endereco, porta), ManipuladorERP)
+
+    @property
+    def url(self):
+        """URL base para ``--url`` da verificação."""
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def iniciar(self):
+        """Atende em segundo plano (uso em testes e benchmarks)."""
+        threading.Thread(target=self.serve_forever, name='erp-simulado', daemon=True).start()
+        return self
+
+    def encerrar(self):
+        """Para de atender e fecha o socket."""
+        self.shutdown()
+        self.server_close()
+
+
+def ler_erro(texto):
+    """Converte ``MODO=TAXA`` (argumento --erro) em (modo, taxa)."""
+    modo, _, taxa = texto.partition('=')
+    if modo not in ERROS:
+        raise argparse.ArgumentTypeError(f"modo de erro inválido: {modo} (use {', '.join(ERROS)})")
+    try:
+        taxa = float(taxa)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"taxa inválida em {texto!r}")
+    if not 0 <= taxa <= 1:
+        raise argparse.ArgumentTypeError(f"a taxa deve estar entre 0 e 1: {texto!r}")
+    return modo, taxa
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ERP Tecnicon simulado para benchmarks e testes de carga.")
+    parser.add_argument('--endereco', default='127.0.0.1', help="Endereço em que o servidor escuta.")
+    parser.add_argument('--porta', type=int, default=8080, help="Porta (0 escolhe uma livre).")
+    parser.add_argument('--linhas', type=int, default=100, help="Filiais na grade da vista.")
+    parser.add_argument('--atraso-envio', type=int, default=30, help="Segundos entre o último envio das filiais e o horário da grade.")
+    parser.add_argument('--log-a-cada', type=int, default=0, help="Uma filial com texto no log a cada N linhas (0 nenhuma).")
+    parser.add_argument('--empresas', default='', help="Códigos da tela de seleção de empresa, separados por vírgula (vazio: sem seleção).")
+    parser.add_argument('--latencia', type=float, default=0.0, help="Segundos de espera antes de responder ao login e à seleção de empresa.")
+    parser.add_argument('--latencia-vista', type=float, default=None, help="Segundos de espera antes de responder à vista (padrão: --latencia).")
+    parser.add_argument('--variacao', type=float, default=0.0, help="Variação aleatória somada à latência (0 a N segundos).")
+    parser.add_argument('--token-ttl', type=float, default=0, help="Validade do token em segundos (0 não expira).")
+    parser.add_argument('--erro', type=ler_erro, action='append', default=[], metavar='MODO=TAXA', help=f"Falha injetada ({', '.join(ERROS)}); pode repetir.")
+    parser.add_argument('--fases-com-erro', default='', help="Fases sujeitas às falhas: login, empresa, vista (vazio: todas).")
+    parser.add_argument('--atraso-lentidao', type=float, default=5.0, help="Segundos extras da falha 'lentidao'.")
+    parser.add_argument('--usuario', help="Usuário aceito no login (padrão: qualquer).")
+    parser.add_argument('--senha', help="Senha aceita no login (padrão: qualquer).")
+    parser.add_argument('--semente', type=int, help="Semente do sorteio de latência e falhas.")
+    parser.add_argument('--renovar-pagina', type=float, default=60, help="Segundos entre regenerações da grade.")
+    args = parser.parse_args()
+
+    erp = ERPSimulado(
+        linhas=args.linhas, atraso_envio=args.atraso_envio,
+        linhas_com_log=range(0, args.linhas, args.log_a_cada) if args.log_a_cada > 0 else (),
+        empresas=[codigo for codigo in args.empresas.split(',') if codigo],
+        latencia=args.latencia, latencia_vista=args.latencia_vista, variacao=args.variacao,
+        token_ttl=args.token_ttl, erros=dict(args.erro),
+        fases_com_erro=[fase for fase in args.fases_com_erro.split(',') if fase],
+        atraso_lentidao=args.atraso_lentidao, usuario=args.usuario, senha=args.senha,
+        semente=args.semente, renovar_pagina=args.renovar_pagina,
+    )
+    servidor = ServidorERPSimulado(erp, args.endereco, args.porta)
+    print(f"ERP simulado em {servidor.url} ({args.linhas} linhas); estatísticas em {servidor.url}/__estatisticas", flush=True)
+    # SIGTERM também encerra imprimindo as estatísticas
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        print(json.dumps(erp.estatisticas()))
+
+
+if __name__ == "__main__":
+    main()
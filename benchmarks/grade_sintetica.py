@@ -0,0 +1,80 @@
+"""Geração de páginas sintéticas da vista "Status Sincronismo" do Tecnicon.
+
+Reproduz a estrutura real da vista 2052 (tabela de cabeçalho ``tblHead`` e
+tabela de dados ``tblBody`` com as 16 colunas) para benchmarks e testes com
+grades de qualquer tamanho.
+"""
+
+from datetime import datetime, timedelta
+
+COLUNAS = [
+    ('Cód. Local', 'CLOCAL'),
+    ('Filial', 'NOMEFILIAL'),
+    ('Ultimo Reg. Receb.', 'ULTIMOREC'),
+    ('Data Ult. Reg. Receb.', 'DTULTIMOREC'),
+    ('Hora Ult. Reg. Receb.', 'HRULTIMOREC'),
+    ('Ultimo Reg. Env.', 'ULTIMOENV'),
+    ('Qtde Falta Receber', 'QTDEFALTAREC'),
+    ('Data Ult. Reg. Env.', 'DTULTIMOENV'),
+    ('Hora Ultimo Reg. Env.', 'HRULTIMOENV'),
+    ('Qtde Falta Enviar', 'QTDEFALTAENV'),
+    ('Qtde Receber', 'QTDEREC'),
+    ('Qtde Enviar', 'QTDEENV'),
+    ('Log Filial p/ Sinc.', 'PROBLEMA'),
+    ('Data Atual', 'DTATUAL'),
+    ('Log Sinc. p/ Filial', 'PROBLEMAFILIAL'),
+    ('Hr Atual', 'HRATUAL'),
+]
+
+
+def gerar_pagina(linhas, atraso_segundos=30, linhas_com_log=(), agora=None):
+    """Gera o HTML da vista com ``linhas`` filiais.
+
+    ``linhas_com_log`` lista os índices das linhas que terão texto na coluna
+    "Log Filial p/ Sinc.". O último envio de cada filial fica ``atraso_segundos``
+    antes de ``agora``.
+    """
+    agora = agora or datetime.now()
+    envio = agora - timedelta(seconds=atraso_segundos)
+    com_log = set(linhas_com_log)
+
+    cabecalho = ''.join(
+        f'<th title="{titulo}" role=\'cabecalho\' cp=\'{cp}\'><div style=\'\'>'
+        f'<div style=\'float:left;\'>{titulo}</div></div></th>'
+        for titulo, cp in COLUNAS
+    )
+
+    partes = [
+        "<div class='vista-role' role='vista' cvista='2052' svistaaba='2902'>"
+        "<div id='tbltblConCon2902' role='grid' class='div-grid-vistas'>"
+        '<div class="div-header-grid"><table id="tblHead" class="TGrid" cellpadding="0" cellspacing="0">'
+        f'<thead><tr>{cabecalho}</tr></thead></table></div>'
+        '<div class="div-grid-table-vistas"><table id="tblBody" class="TGrid" cellpadding="0" cellspacing="0"><tbody>'
+    ]
+    for i in range(linhas):
+        valores = {
+            'CLOCAL': str(i + 1),
+            'NOMEFILIAL': f'FILIAL {i + 1}',
+            'ULTIMOREC': str(1000 + i),
+            'DTULTIMOREC': envio.strftime('%d/%m/%Y'),
+            'HRULTIMOREC': envio.strftime('%H:%M:%S'),
+            'ULTIMOENV': str(2000 + i),
+            'QTDEFALTAREC': '0',
+            'DTULTIMOENV': envio.strftime('%d/%m/%Y'),
+            'HRULTIMOENV': envio.strftime('%H:%M:%S'),
+            'QTDEFALTAENV': '0',
+            'QTDEREC': '0',
+            'QTDEENV': '0',
+            'PROBLEMA': f'XML possui caracter inválido na filial {i + 1}' if i in com_log else '',
+            'DTATUAL': agora.strftime('%d/%m/%Y'),
+            'PROBLEMAFILIAL': '',
+            'HRATUAL': agora.strftime('%H:%M:%S'),
+        }
+        partes.append('<tr>')
+        for titulo, cp in COLUNAS:
+            partes.append(
+                f"<td coluna='{titulo}' id='{cp}' style=''><div style='' onclick='' >{valores[cp]}</div></td>"
+            )
+        partes.append('</tr>')
+    partes.append('</tbody></table></div></div></div>')
+    return ''.join(partes)
@@ -0,0 +1,350 @@
+"""Persistência local de estado entre execuções da verificação de sincronismo.
+
+Os arquivos ficam em ``cache/`` (ou em ``SINCRONISMO_CACHE_DIR``) com permissões
+restritas ao dono, pois o cache de token dá acesso à sessão do ERP.
+"""
+
+import os
+import json
+import time
+import fcntl
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger('zabbix_erp_sincronismo')
+
+# Validade padrão do token em cache (segundos); 0 desativa o cache
+TOKEN_CACHE_TTL_PADRAO = 900
+
+# Validade padrão do resultado compartilhado no modo single-flight (segundos)
+RESULTADO_TTL_PADRAO = 30
+
+# Layouts de colunas da vista guardados (os mais recentes) e versão do formato;
+# mudar a detecção de colunas exige incrementar a versão
+LAYOUTS_MAXIMO = 8
+VERSAO_LAYOUTS = 1
+
+# Análises de página memorizadas (quantidade máxima) e versão do formato do
+# resultado; mudar o que parse_status_page retorna exige incrementar a versão
+ANALISES_MAXIMO_PADRAO = 32
+VERSAO_ANALISES = 1
+
+# Intervalo (segundos) entre as tentativas de obter uma trava ocupada com prazo
+INTERVALO_TRAVA = 0.05
+
+
+class ResultadoCompartilhadoError(Exception):
+    """Excecao para uma falha publicada por outra execucao no modo single-flight."""
+    pass
+
+
+class EsperaTravaError(Exception):
+    """Excecao para o prazo da verificacao esgotado esperando a trava de outra execucao."""
+    pass
+
+
+def diretorio_cache():
+    """Retorna o diretório de cache, criando-o com permissão 700 se necessário."""
+    diretorio = os.getenv('SINCRONISMO_CACHE_DIR') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'cache'
+    )
+    os.makedirs(diretorio, mode=0o700, exist_ok=True)
+    return diretorio
+
+
+def chave_alvo(base_url, username):
+    """Gera um identificador curto e estável para o par URL/usuário."""
+    return hashlib.sha1(f"{base_url}|{username}".encode('utf-8')).hexdigest()[:16]
+
+
+def gravar_json(caminho, dados):
+    """Grava JSON de forma atômica com permissão 600."""
+    # Nome temporário único por gravação: threads do daemon gravam o mesmo arquivo
+    fd, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho),
+                                      prefix=f"{os.path.basename(caminho)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(dados, f)
+        os.replace(temporario, caminho)
+    except BaseException:
+        try:
+            os.unlink(temporario)
+        except OSError:
+            pass
+        raise
+
+
+def travar(trava, prazo=None):
+    """``flock`` exclusivo em ``trava``, esperando no máximo o que resta do ``prazo``.
+
+    Sem prazo, espera o quanto for preciso. Com prazo (objeto com
+    ``restante()``, como o ``Prazo`` da verificação), tenta sem bloquear até
+    ele acabar e retorna False se a trava continuar com outra execução.
+    """
+    if prazo is None:
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        return True
+    while True:
+        try:
+            fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            restante = prazo.restante()
+            if restante <= 0:
+                return False
+            time.sleep(min(INTERVALO_TRAVA, restante))
+
+
+def ler_json(caminho):
+    """Lê um JSON do cache; retorna None se não existir ou estiver corrompido."""
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Arquivo de cache ilegível ({caminho}): {e}")
+        return None
+
+
+def _caminho_token(base_url, username):
+    return os.path.join(diretorio_cache(), f"token_{chave_alvo(base_url, username)}.json")
+
+
+def carregar_token(session, base_url, username, ttl=TOKEN_CACHE_TTL_PADRAO):
+    """Restaura token e cookies salvos para o alvo, se ainda dentro da validade.
+
+    Os cookies são aplicados diretamente em ``session``. Retorna o token ou None.
+    """
+    if not ttl or ttl <= 0:
+        return None
+
+    dados = ler_json(_caminho_token(base_url, username))
+    if not dados:
+        return None
+
+    idade = time.time() - dados.get('criado_em', 0)
+    if idade > ttl:
+        logger.info(f"Token em cache expirado ({idade:.0f}s > {ttl}s)")
+        return None
+
+    for cookie in dados.get('cookies', []):
+        session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'), path=cookie.get('path'))
+    logger.info(f"Token em cache reutilizado (idade: {idade:.0f}s)")
+    return dados.get('token')
+
+
+def salvar_token(session, base_url, username, token):
+    """Salva token e cookies da sessão para as próximas execuções."""
+    cookies = [
+        {'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path}
+        for c in session.cookies
+    ]
+    dados = {'token': token, 'cookies': cookies, 'criado_em': time.time()}
+    try:
+        gravar_json(_caminho_token(base_url, username), dados)
+    except OSError as e:
+        logger.warning(f"Não foi possível salvar o token em cache: {e}")
+
+
+def invalidar_token(base_url, username):
+    """Remove o token em cache do alvo."""
+    try:
+        os.unlink(_caminho_token(base_url, username))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Não foi possível remover o token em cache: {e}")
+
+
+def acumular_contadores(contadores, nome_arquivo='contadores.json', prazo=None):
+    """Soma os contadores do processo aos totais persistidos e retorna os totais.
+
+    O arquivo é travado durante a leitura/gravação porque várias execuções do
+    Zabbix podem terminar ao mesmo tempo. Contadores zerados são ignorados.
+    Com ``prazo``, a espera pela trava não passa dele: os contadores desta
+    execução são descartados com um aviso.
+    """
+    incrementos = {nome: valor for nome, valor in contadores.items() if valor}
+    if not incrementos:
+        return None
+
+    caminho = os.path.join(diretorio_cache(), nome_arquivo)
+    try:
+        with open(f"{caminho}.lock", 'w') as trava:
+            if not travar(trava, prazo):
+                logger.warning("Prazo esgotado esperando a trava dos contadores; contadores desta execução descartados")
+                return None
+            totais = ler_json(caminho) or {}
+            for nome, valor in incrementos.items():
+                totais[nome] = totais.get(nome, 0) + valor
+            totais['atualizado_em'] = time.time()
+            gravar_json(caminho, totais)
+    except OSError as e:
+        logger.warning(f"Não foi possível atualizar os contadores: {e}")
+        return None
+    return totais
+
+
+def carregar_layouts_colunas():
+    """Retorna os layouts de colunas salvos ({assinatura: layout}) ou {}."""
+    dados = ler_json(os.path.join(diretorio_cache(), 'layouts_colunas.json'))
+    if not dados or dados.get('versao') != VERSAO_LAYOUTS:
+        return {}
+    return dados.get('layouts', {})
+
+
+def salvar_layouts_colunas(layouts):
+    """Salva os layouts de colunas, mantendo apenas os LAYOUTS_MAXIMO mais recentes.
+
+    ``layouts`` deve estar ordenado do uso mais antigo para o mais recente.
+    """
+    recentes = dict(list(layouts.items())[-LAYOUTS_MAXIMO:])
+    try:
+        gravar_json(os.path.join(diretorio_cache(), 'layouts_colunas.json'),
+                    {'versao': VERSAO_LAYOUTS, 'layouts': recentes})
+    except OSError as e:
+        logger.warning(f"Não foi possível salvar os layouts de colunas: {e}")
+
+
+def obter_resultado_compartilhado(chave, ttl, produzir, erros_publicaveis=(), prazo=None):
+    """Executa ``produzir()`` uma única vez entre execuções concorrentes (single-flight).
+
+    A primeira execução obtém a trava do alvo, chama ``produzir()`` e publica o
+    resultado (ou a mensagem de erro, se a falha for de um dos tipos em
+    ``erros_publicaveis``) em ``cache/resultado_<chave>.json``. As demais esperam
+    na trava e reutilizam o que foi publicado se tiver menos de ``ttl`` segundos.
+
+    Uma falha publicada por outra execução é levantada como ResultadoCompartilhadoError.
+    Com ``prazo``, a espera na trava não passa dele (EsperaTravaError): quem
+    detém a trava pode estar preso em um ERP que não responde.
+    """
+    caminho = os.path.join(diretorio_cache(), f"resultado_{chave}.json")
+
+    # Caminho rápido: resultado recente já publicado, sem disputar a trava
+    publicado = _resultado_valido(caminho, ttl)
+    if publicado is None:
+        with open(f"{caminho}.lock", 'w') as trava:
+            if not travar(trava, prazo):
+                raise EsperaTravaError("esperando a coleta de outra execucao")
+            # Quem esperou na trava encontra o resultado de quem a detinha
+            publicado = _resultado_valido(caminho, ttl)
+            if publicado is None:
+                return _produzir_e_publicar(caminho, produzir, erros_publicaveis)
+
+    logger.info(f"Reutilizando resultado publicado há {time.time() - publicado['coletado_em']:.1f}s")
+    if 'erro' in publicado:
+        raise ResultadoCompartilhadoError(publicado['erro'])
+    return publicado['resultado']
+
+
+def _resultado_valido(caminho, ttl):
+    dados = ler_json(caminho)
+    if dados and 0 <= time.time() - dados.get('coletado_em', 0) <= ttl:
+        return dados
+    return None
+
+
+def _produzir_e_publicar(caminho, produzir, erros_publicaveis):
+    try:
+        resultado = produzir()
+    except erros_publicaveis as e:
+        _publicar(caminho, {'erro': str(e), 'coletado_em': time.time()})
+        raise
+    _publicar(caminho, {'resultado': resultado, 'coletado_em': time.time()})
+    return resultado
+
+
+def _publicar(caminho, dados):
+    try:
+        gravar_json(caminho, dados)
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"Não foi possível publicar o resultado compartilhado: {e}")
+
+
+class AnalisesEmMemoria:
+    """Resultados de análise por hash da página, em memória (modo daemon).
+
+    Mantém no máximo ``maximo`` entradas, descartando a usada há mais tempo.
+    """
+
+    def __init__(self, maximo=ANALISES_MAXIMO_PADRAO):
+        self.maximo = maximo
+        self.entradas = OrderedDict()
+        self.lock = threading.Lock()
+
+    def obter(self, chave):
+        """Retorna uma cópia do resultado guardado para a chave, ou None."""
+        with self.lock:
+            dados = self.entradas.get(chave)
+            if dados is None:
+                return None
+            self.entradas.move_to_end(chave)
+        # Cópia independente: quem recebe pode alterar o dicionário
+        return json.loads(dados)
+
+    def guardar(self, chave, resultado):
+        """Guarda o resultado da análise da página identificada por ``chave``."""
+        with self.lock:
+            self.entradas[chave] = json.dumps(resultado)
+            self.entradas.move_to_end(chave)
+            while len(self.entradas) > self.maximo:
+                self.entradas.popitem(last=False)
+
+
+class AnalisesEmDisco:
+    """Resultados de análise por hash da página em ``cache/analises/`` (modo avulso).
+
+    Um arquivo por página; o horário de modificação marca o último uso e, ao
+    passar de ``maximo`` arquivos, os usados há mais tempo são removidos.
+    """
+
+    def __init__(self, maximo=ANALISES_MAXIMO_PADRAO):
+        self.maximo = maximo
+
+    def _diretorio(self):
+        diretorio = os.path.join(diretorio_cache(), 'analises')
+        os.makedirs(diretorio, mode=0o700, exist_ok=True)
+        return diretorio
+
+    def obter(self, chave):
+        """Retorna o resultado guardado para a chave, ou None."""
+        caminho = os.path.join(self._diretorio(), f"{chave}.json")
+        dados = ler_json(caminho)
+        if not dados or dados.get('versao') != VERSAO_ANALISES:
+            return None
+        try:
+            os.utime(caminho)
+        except OSError:
+            pass
+        return dados['resultado']
+
+    def guardar(self, chave, resultado):
+        """Guarda o resultado e remove as entradas excedentes mais antigas."""
+        try:
+            diretorio = self._diretorio()
+            gravar_json(os.path.join(diretorio, f"{chave}.json"), {'versao': VERSAO_ANALISES, 'resultado': resultado})
+            self._podar(diretorio)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Não foi possível guardar a análise em cache: {e}")
+
+    def _podar(self, diretorio):
+        arquivos = []
+        for nome in os.listdir(diretorio):
+            if not nome.endswith('.json'):
+                continue
+            caminho = os.path.join(diretorio, nome)
+            try:
+                arquivos.append((os.path.getmtime(caminho), caminho))
+            except OSError:
+                # Removido por outra execução em paralelo
+                continue
+        arquivos.sort()
+        for _, caminho in arquivos[:max(0, len(arquivos) - self.maximo)]:
+            try:
+                os.unlink(caminho)
+            except OSError:
+                pass
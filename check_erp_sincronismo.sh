@@ -7,6 +7,31 @@ set -e
 # Navega para o diretório do projeto (onde este script está)
 cd "/usr/lib/zabbix/externalscripts/zabbix_erp_sincronismo" || { echo "Erro: Não foi possível navegar para o diretório do projeto."; exit 1; }
 
+# Caminho rápido: se o daemon residente estiver ativo, consulta-o pelo socket UNIX.
+# O cliente usa apenas a biblioteca padrão e responde em milissegundos; o código
+# 75 indica daemon indisponível (ou sem resposta a tempo) e cai para a execução
+# avulsa abaixo.
+SINCRONISMO_SOCKET="${SINCRONISMO_SOCKET:-run/sincronismo.sock}"
+if [ -S "$SINCRONISMO_SOCKET" ] && command -v python3 >/dev/null 2>&1; then
+  export SINCRONISMO_SOCKET
+  RC=0
+  python3 cliente_sincronismo.py "$@" || RC=$?
+  if [ "$RC" -ne 75 ]; then
+    exit "$RC"
+  fi
+fi
+
+# Ambiente pré-construído (construir_ambiente.sh, chamado pelo setup/update):
+# executa o Python do .venv diretamente, sem o uv resolver e sincronizar o
+# ambiente a cada coleta. Sem o .venv, ou com uv.lock/pyproject.toml mais novos
+# que a marca de construção, recorre ao uv run abaixo.
+VENV_PYTHON=".venv/bin/python"
+MARCA_AMBIENTE=".venv/.ambiente-pronto"
+if [ -x "$VENV_PYTHON" ] && [ -f "$MARCA_AMBIENTE" ] \
+   && [ ! "uv.lock" -nt "$MARCA_AMBIENTE" ] && [ ! "pyproject.toml" -nt "$MARCA_AMBIENTE" ]; then
+  exec "$VENV_PYTHON" "check_sincronismo.py" "$@"
+fi
+
 # Seleciona o comando uv adequado
 UV_CMD="uv"
 if [ -x "/var/lib/zabbix/.local/bin/uv" ]; then
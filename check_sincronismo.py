@@ -1,47 +1,67 @@
+import time
+
+# Início da importação do módulo (relatório do --startup-profile)
+_INICIO_IMPORTACAO = time.perf_counter()
+
 import os
 import sys
 import argparse
-import requests
 import re
+import json
+import hashlib
 import logging
-from bs4 import BeautifulSoup
+import importlib
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
-from logging.handlers import TimedRotatingFileHandler
+from cache_sincronismo import (
+    carregar_token, salvar_token, invalidar_token, acumular_contadores, chave_alvo,
+    obter_resultado_compartilhado, ResultadoCompartilhadoError, EsperaTravaError,
+    carregar_layouts_colunas, salvar_layouts_colunas, AnalisesEmDisco, AnalisesEmMemoria,
+    ANALISES_MAXIMO_PADRAO,
+    TOKEN_CACHE_TTL_PADRAO, RESULTADO_TTL_PADRAO
+)
+from disjuntor_sincronismo import Disjuntor, LIMIAR_FALHAS_PADRAO, RESFRIAMENTO_PADRAO
+from log_sincronismo import iniciar_log_em_fila
+
+# Diretório dos arquivos de log diários
+DIRETORIO_LOGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
 
 # Configuração do logging com rotação diária
 def setup_logging():
-    """Configura o sistema de logs com rotação diária."""
-    # Cria o diretório de logs se não existir
-    logs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
-    os.makedirs(logs_dir, exist_ok=True)
-    
-    # Configura o handler de rotação diária
-    log_filename = os.path.join(logs_dir, 'g70k_')
-    handler = TimedRotatingFileHandler(
-        log_filename,
-        when='midnight',
-        interval=1,
-        backupCount=30,  # Mantém 30 dias de logs
-        encoding='utf-8'
-    )
-    
-    # Formato do log
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    handler.setFormatter(formatter)
-    
-    # Configura o logger
+    """Configura o log diário em logs/, gravado por uma thread (log_sincronismo).
+
+    Os registros só são enfileirados no caminho da verificação; a gravação e
+    a troca de arquivo à meia-noite acontecem fora dele. A compressão dos dias
+    anteriores fica com o daemon ou com o timer de manutenção.
+    """
+    logs_dir = DIRETORIO_LOGS
+
     logger = logging.getLogger('zabbix_erp_sincronismo')
     logger.setLevel(logging.INFO)
-    logger.addHandler(handler)
-    
+    iniciar_log_em_fila(logger, logs_dir)
+
     return logger
 
 # Inicializa o logging
 logger = setup_logging()
 
+# requests, lxml, bs4 e dotenv custam mais que o resto da verificação de um
+# ERP saudável para importar; são carregados só nos caminhos que os usam
+importacoes_adiadas = {}
+
+def importar(nome):
+    """Importa um módulo sob demanda, registrando a duração da primeira importação."""
+    if nome in sys.modules:
+        # Não usa sys.modules diretamente: com vários alvos, outra thread pode
+        # estar no meio da importação e import_module espera por ela
+        return importlib.import_module(nome)
+    t0 = time.perf_counter()
+    modulo = importlib.import_module(nome)
+    importacoes_adiadas[nome] = time.perf_counter() - t0
+    return modulo
+
 # Status de saida para o Zabbix
 STATUS_OK = "STATUS_OK"
 
@@ -57,12 +77,262 @@ class ParsingError(Exception):
     """Excecao para erros ao analisar o HTML."""
     pass
 
-def select_empresa(session, base_url, html_content, debug=False):
-    """Seleciona a primeira empresa disponível após o login."""
-    logger.info("Selecionando empresa após login...")
-    
+class PrazoEsgotadoError(Exception):
+    """Excecao para o prazo total da verificacao (--deadline) esgotado durante uma fase."""
+    def __init__(self, fase, prazo):
+        super().__init__(f"Prazo de {prazo.segundos:g}s esgotado na fase {fase} apos {prazo.decorrido():.1f}s")
+        self.fase = fase
+
+class SessaoExpiradaError(StatusFetchError):
+    """Excecao para quando o ERP recusa o token (sessao expirada ou invalida)."""
+
+    def __init__(self, mensagem, motivo=None):
+        super().__init__(mensagem)
+        self.motivo = motivo or RESPOSTA_SESSAO_EXPIRADA
+
+# Motores de análise da grade de sincronismo
+MOTOR_LXML = 'lxml'
+MOTOR_BS4 = 'bs4'
+
+# Termos que identificam a linha de cabeçalho da grade
+TERMOS_CABECALHO = ('LOG', 'FILIAL', 'DATA', 'HORA', 'ENV', 'SINC')
+
+# XPath do motor lxml, compilados por _carregar_lxml() na primeira análise
+XPATH_TABELAS = XPATH_LINHAS = XPATH_CELULAS_CABECALHO = XPATH_CELULAS = XPATH_TEXTOS = None
+
+# Data/hora procuradas no HTML quando a grade não as traz
+PADRAO_DATA = re.compile(r'(\d{2}/\d{2}/\d{4})')
+PADRAO_HORA = re.compile(r'(\d{2}:\d{2}:\d{2})')
+
+# Células da grade com o relógio do servidor (ocultas na tela e não usadas na
+# análise); ficam fora do hash para que a memorização funcione entre consultas
+PADRAO_CELULAS_RELOGIO = re.compile(r"""<td\b[^>]*\bid=['"](?:DTATUAL|HRATUAL)['"][^>]*>.*?</td>""", re.IGNORECASE | re.DOTALL)
+
+# Modo em fluxo: tamanho dos pedaços lidos do corpo e do início guardado para
+# classificar a resposta quando a grade não é encontrada
+TAMANHO_PEDACO_FLUXO = 64 * 1024
+TAMANHO_INICIO_FLUXO = 64 * 1024
+
+# Valores de exemplo (logs de filial, linhas ignoradas) no resumo da análise;
+# a lista completa só aparece no log em DEBUG (--trace)
+AMOSTRAS_LOG = 5
+
+# Classificação das respostas do ERP (compartilhada entre login e busca da vista)
+RESPOSTA_CONTEUDO = 'conteudo'
+RESPOSTA_TOKEN = 'token'
+RESPOSTA_SELECAO_EMPRESA = 'selecao_empresa'
+RESPOSTA_TELA_LOGIN = 'tela_login'
+RESPOSTA_SESSAO_EXPIRADA = 'sessao_expirada'
+RESPOSTA_ERRO = 'erro'
+
+PADRAO_TOKEN = re.compile(r"preencheSessao\s*\(\s*'([^']*)'")
+MARCADORES_SELECAO_EMPRESA = ('Selecione a Empresa', 'tEmpresas')
+MARCADORES_GRID = ('tblBody', 'div-grid-vistas')
+MARCADORES_TELA_LOGIN = ('EfetuaLogin', 'logintimeout')
+PADRAO_PAGINA_ERRO = re.compile(r'HTTP Status [45]\d\d|java\.lang\.\w*(?:Exception|Error)|Sess[aã]o (?:expirada|inv[aá]lida)', re.IGNORECASE)
+
+# Prefixo padrão das chaves dos itens trapper (modo de envio ao Zabbix)
+PREFIXO_CHAVES_PADRAO = 'erp.sincronismo'
+
+# Parâmetros da vista "Status Sincronismo" no CarregaVista (sobrescritos por
+# alvo no arquivo de configuração, ver alvos_sincronismo.py)
+VISTA_PADRAO = {
+    'empresa': '17',
+    'filial': '1',
+    'local': '1',
+    'vista': '2052',
+    'svistaaba': '2902',
+    'smenuv': '11327',
+}
+
+# Tempo máximo de cada requisição ao ERP (segundos); com --deadline, o que
+# restar do prazo total se for menor
+TIMEOUT_HTTP = 30
+
+# Com menos que isso de prazo (segundos), uma requisição não tem chance de terminar
+PRAZO_MINIMO_FASE = 0.1
+
+# Verificações simultâneas padrão no modo de vários alvos
+TRABALHADORES_PADRAO = 4
+
+# Motores HTTP: requests (síncrono, uma thread por alvo) ou aiohttp (asyncio)
+MOTOR_HTTP_REQUESTS = 'requests'
+MOTOR_HTTP_AIOHTTP = 'aiohttp'
+
+# Contadores de autenticação do processo (persistidos em cache/ pelo modo avulso)
+contadores_autenticacao = {'login': 0, 'busca_status': 0, 'relogin': 0}
+
+# Layouts de colunas já resolvidos, por assinatura do cabeçalho, do uso mais
+# antigo para o mais recente (carregados e salvos em cache/ pelo main e pelo daemon)
+layouts_colunas = {}
+estado_layouts = {'ultima': None, 'alterado': False}
+
+# Contadores e layouts são compartilhados pelas verificações simultâneas
+# (vários alvos e daemon)
+_lock_estado = threading.Lock()
+
+class Prazo:
+    """Orçamento de tempo total de uma verificação, compartilhado pelas fases.
+
+    ``inicio`` (no relógio de ``time.perf_counter``) permite contar desde a
+    partida do processo. Alvos verificados juntos compartilham o mesmo prazo.
+    """
+
+    def __init__(self, segundos, inicio=None):
+        self.segundos = segundos
+        self.inicio = time.perf_counter() if inicio is None else inicio
+        self.fim = self.inicio + segundos
+
+    def decorrido(self):
+        return time.perf_counter() - self.inicio
+
+    def restante(self):
+        return self.fim - time.perf_counter()
+
+# Prazo da verificação em andamento; por contexto, para que threads de alvos
+# diferentes e tarefas do asyncio tenham cada uma o seu
+prazo_atual = contextvars.ContextVar('prazo_atual', default=None)
+
+def verificar_prazo(fase):
+    """Levanta PrazoEsgotadoError se o prazo da verificação em andamento acabou."""
+    prazo = prazo_atual.get()
+    if prazo is not None and prazo.restante() <= PRAZO_MINIMO_FASE:
+        raise PrazoEsgotadoError(fase, prazo)
+
+def timeout_fase(fase, maximo=TIMEOUT_HTTP):
+    """Timeout da próxima requisição de ``fase``: o que resta do prazo, limitado a ``maximo``."""
+    verificar_prazo(fase)
+    prazo = prazo_atual.get()
+    return maximo if prazo is None else min(maximo, prazo.restante())
+
+def criar_prazo(args, inicio=None):
+    """Prazo de ``--deadline`` (None quando desativado)."""
+    return Prazo(args.deadline, inicio) if args.deadline and args.deadline > 0 else None
+
+# Ordem das fases no resumo e no log
+ORDEM_FASES = ('login', 'empresa', 'busca', 'analise')
+
+class MedicaoFases:
+    """Tempo de parede e de CPU, bytes recebidos e linhas analisadas por fase.
+
+    O tempo é exclusivo: uma fase aninhada (a seleção de empresa dentro do
+    login, o relogin dentro da busca) pausa a externa. A CPU é a da thread
+    (``time.thread_time``); no motor assíncrono, a das fases de rede inclui as
+    demais tarefas do laço de eventos e é apenas aproximada.
+    """
+
+    def __init__(self):
+        self.fases = {}
+        self._pilha = []
+
+    def _dados(self, fase):
+        return self.fases.setdefault(fase, {'parede_s': 0.0, 'cpu_s': 0.0, 'bytes': 0, 'linhas': 0})
+
+    def _acumular(self, fase, inicio, fim):
+        dados = self._dados(fase)
+        dados['parede_s'] += fim[0] - inicio[0]
+        dados['cpu_s'] += fim[1] - inicio[1]
+
+    @contextmanager
+    def medir(self, fase):
+        """Mede o bloco como ``fase``, pausando a fase externa em andamento."""
+        inicio = (time.perf_counter(), time.thread_time())
+        if self._pilha:
+            self._acumular(*self._pilha[-1], inicio)
+        self._pilha.append([fase, inicio])
+        try:
+            yield
+        finally:
+            fim = (time.perf_counter(), time.thread_time())
+            self._acumular(*self._pilha.pop(), fim)
+            if self._pilha:
+                self._pilha[-1][1] = fim
+
+    def contabilizar(self, bytes_recebidos=0, linhas=0):
+        """Soma bytes e linhas à fase em andamento."""
+        if self._pilha:
+            dados = self._dados(self._pilha[-1][0])
+            dados['bytes'] += bytes_recebidos
+            dados['linhas'] += linhas
+
+    def resumo(self):
+        """Dicionário {fase: {parede_s, cpu_s, bytes, linhas}} para o resultado e o JSON."""
+        return {fase: dict(dados, parede_s=round(dados['parede_s'], 4), cpu_s=round(dados['cpu_s'], 4))
+                for fase, dados in self._ordenadas()}
+
+    def _ordenadas(self):
+        return sorted(self.fases.items(), key=lambda item: ORDEM_FASES.index(item[0])
+                      if item[0] in ORDEM_FASES else len(ORDEM_FASES))
+
+    def tempos(self):
+        """Tempo de parede (segundos) de cada fase medida, para o campo 'tempos' do resultado."""
+        return {fase: dados['parede_s'] for fase, dados in self._ordenadas()}
+
+    def descrever(self):
+        """Linha de log com as fases medidas."""
+        partes = []
+        for fase, dados in self._ordenadas():
+            detalhes = [f"cpu {dados['cpu_s']:.3f}s"]
+            if dados['bytes']:
+                detalhes.append(f"{dados['bytes']} bytes")
+            if dados['linhas']:
+                detalhes.append(f"{dados['linhas']} linhas")
+            partes.append(f"{fase} {dados['parede_s']:.3f}s ({', '.join(detalhes)})")
+        return ' | '.join(partes)
+
+# Medição de fases da verificação em andamento (--phase-timing); None desativa
+medicao_atual = contextvars.ContextVar('medicao_atual', default=None)
+
+# Sem medição, medir_fase devolve sempre este contexto vazio (sem alocação)
+_SEM_MEDICAO = nullcontext()
+
+def medir_fase(fase):
+    """Contexto que mede ``fase`` na verificação em andamento, se a medição estiver ativa."""
+    medicao = medicao_atual.get()
+    return _SEM_MEDICAO if medicao is None else medicao.medir(fase)
+
+def contabilizar_resposta(response, fluxo=False):
+    """Soma à fase em andamento os bytes do corpo de uma resposta do requests."""
+    medicao = medicao_atual.get()
+    if medicao is not None:
+        # Em fluxo o corpo não fica guardado: conta o que foi lido do socket
+        medicao.contabilizar(bytes_recebidos=response.raw.tell() if fluxo else len(response.content))
+
+def contabilizar_fase(bytes_recebidos=0, linhas=0):
+    """Soma bytes e linhas à fase em andamento, se a medição estiver ativa."""
+    medicao = medicao_atual.get()
+    if medicao is not None:
+        medicao.contabilizar(bytes_recebidos, linhas)
+
+def registrar_contador(nome, quantidade=1):
+    """Incrementa um contador de autenticação do processo."""
+    with _lock_estado:
+        contadores_autenticacao[nome] = contadores_autenticacao.get(nome, 0) + quantidade
+
+def classificar_resposta(status_code, texto):
+    """Classifica uma resposta do ERP em uma das categorias RESPOSTA_*.
+
+    A ordem importa: a grade da vista pode conter textos de erro nas células de
+    log, por isso ela é reconhecida antes dos padrões de página de erro.
+    """
+    if status_code in (401, 403):
+        return RESPOSTA_SESSAO_EXPIRADA
+    if any(marcador in texto for marcador in MARCADORES_SELECAO_EMPRESA):
+        return RESPOSTA_SELECAO_EMPRESA
+    if PADRAO_TOKEN.search(texto):
+        return RESPOSTA_TOKEN
+    if any(marcador in texto for marcador in MARCADORES_GRID):
+        return RESPOSTA_CONTEUDO
+    if any(marcador in texto for marcador in MARCADORES_TELA_LOGIN):
+        return RESPOSTA_TELA_LOGIN
+    if PADRAO_PAGINA_ERRO.search(texto):
+        return RESPOSTA_ERRO
+    return RESPOSTA_CONTEUDO
+
+def codigo_empresa(html_content, empresa=None):
+    """Escolhe o código da empresa na tela de seleção: ``empresa`` ou a primeira da tabela."""
     # Procura o código da primeira empresa na tabela
-    soup = BeautifulSoup(html_content, 'lxml')
+    soup = importar('bs4').BeautifulSoup(html_content, 'lxml')
     
     # Procura a tabela de empresas
     tabela = soup.find('table', {'id': 'tblBody'}) or soup.find('tbody')
@@ -82,17 +352,24 @@ def select_empresa(session, base_url, html_content, debug=False):
         raise ERPLoginError("Nenhuma célula encontrada na linha da empresa")
     
     # O código da empresa geralmente está na primeira célula
-    codigo_empresa = celulas[0].get_text(strip=True)
-    logger.info(f"Selecionando empresa: {codigo_empresa}")
-    
-    # URL para selecionar a empresa
+    codigo = celulas[0].get_text(strip=True)
+    if empresa is not None:
+        codigos = [celulas_linha[0].get_text(strip=True) for celulas_linha in
+                   (linha.find_all('td') for linha in linhas[1:]) if celulas_linha]
+        if str(empresa) not in codigos:
+            raise ERPLoginError(f"Empresa {empresa} não disponível para o usuário (disponíveis: {', '.join(codigos)})")
+        codigo = str(empresa)
+    return codigo
+
+def requisicao_empresa(base_url, codigo):
+    """URL, payload e cabeçalhos do POST que seleciona a empresa."""
     select_url = f"{base_url}/Tecnicon/Controller?acao=Tecnicon.EmpresaLogin.selecionarEmpresa&idDialog=dv0"
     
     payload = {
         'smenuvChamado': 'null',
         'telaChamou': 'null',
         'painel': 'false',
-        'empresa': codigo_empresa,
+        'empresa': codigo,
         'modal': 'false',
         'iddialog': 'dv0'
     }
@@ -101,33 +378,45 @@ def select_empresa(session, base_url, html_content, debug=False):
         'Content-Type': 'application/x-www-form-urlencoded',
         'Cookie': 'nerroslog=0'
     }
-    
-    try:
-        response = session.post(select_url, data=payload, headers=headers, timeout=30)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        raise ERPLoginError(f"Erro ao selecionar empresa: {e}")
-    
-    if debug:
-        debug_dir = "debug"
-        os.makedirs(debug_dir, exist_ok=True)
-        debug_filename = os.path.join(debug_dir, "empresa_selection_debug.html")
-        with open(debug_filename, "w", encoding="utf-8") as f:
-            f.write(response.text)
-    
-    # Tenta extrair o token da resposta após seleção da empresa
-    token_match = re.search(r"preencheSessao\s*\(\s*'([^']*)'", response.text)
+    return select_url, payload, headers
+
+def token_empresa(texto_resposta, html_content):
+    """Extrai o token após a seleção da empresa (resposta ou, sem ele, a tela original)."""
+    token_match = PADRAO_TOKEN.search(texto_resposta)
     if not token_match:
         # Se não encontrar na resposta da seleção, tenta usar o HTML original
-        token_match = re.search(r"preencheSessao\s*\(\s*'([^']*)'", html_content)
+        token_match = PADRAO_TOKEN.search(html_content)
         if not token_match:
             raise ERPLoginError("Não foi possível encontrar o token de autorização após seleção da empresa")
     
     return token_match.group(1)
 
-def get_auth_token(session, base_url, username, password, debug=False):
-    """Realiza o login no ERP e extrai o token de autorizacao."""
-    logger.info(f"Tentando login no ERP: {base_url} com usuário: {username}")
+def select_empresa(session, base_url, html_content, debug=False, empresa=None):
+    """Seleciona a empresa após o login: ``empresa`` ou, sem ela, a primeira disponível."""
+    with medir_fase('empresa'):
+        logger.info("Selecionando empresa após login...")
+
+        requests = importar('requests')
+
+        codigo = codigo_empresa(html_content, empresa)
+        logger.info(f"Selecionando empresa: {codigo}")
+        select_url, payload, headers = requisicao_empresa(base_url, codigo)
+
+        try:
+            response = session.post(select_url, data=payload, headers=headers, timeout=timeout_fase('empresa'))
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            verificar_prazo('empresa')
+            raise ERPLoginError(f"Erro ao selecionar empresa: {e}")
+        contabilizar_resposta(response)
+
+        if debug:
+            salvar_depuracao("empresa_selection_debug.html", response.text)
+
+        return token_empresa(response.text, html_content)
+
+def requisicao_login(base_url, username, password):
+    """URL, payload e cabeçalhos do POST de login."""
     login_url = f"{base_url}/Tecnicon/Controller?acao=Tecnicon.EfetuaLogin.obterTelaHtml&idDialog=dv0"
     payload = {
         'smenuvChamado': 'null',
@@ -154,62 +443,816 @@ def get_auth_token(session, base_url, username, password, debug=False):
         'Cookie': 'nerroslog=0',
         'Authorization': '-9876'
     }
+    return login_url, payload, headers
+
+def token_login(texto_resposta):
+    """Extrai o token da resposta do login quando não há seleção de empresa."""
+    token_match = PADRAO_TOKEN.search(texto_resposta)
+    if not token_match:
+        raise ERPLoginError("Nao foi possivel encontrar o token de autorizacao em preencheSessao(). Verifique a estrutura da pagina de resposta.")
+    
+    return token_match.group(1)
+
+def salvar_depuracao(nome_arquivo, texto):
+    """Grava uma resposta do ERP em debug/ (modo --debug)."""
+    debug_dir = "debug"
+    os.makedirs(debug_dir, exist_ok=True)
+    with open(os.path.join(debug_dir, nome_arquivo), "w", encoding="utf-8") as f:
+        f.write(texto)
+
+def get_auth_token(session, base_url, username, password, debug=False, empresa=None):
+    """Realiza o login no ERP e extrai o token de autorizacao.
+
+    ``empresa`` escolhe a empresa na tela de seleção (padrão: a primeira).
+    """
+    logger.info(f"Tentando login no ERP: {base_url} com usuário: {username}")
+    login_url, payload, headers = requisicao_login(base_url, username, password)
 
+    requests = importar('requests')
     try:
-        response = session.post(login_url, data=payload, headers=headers, timeout=30)
+        response = session.post(login_url, data=payload, headers=headers, timeout=timeout_fase('login'))
         response.raise_for_status()
     except requests.exceptions.RequestException as e:
+        verificar_prazo('login')
         raise ERPLoginError(f"Erro de conexao ao tentar logar: {e}")
+    contabilizar_resposta(response)
 
     if debug:
-        debug_dir = "debug"
-        os.makedirs(debug_dir, exist_ok=True)
-        debug_filename = os.path.join(debug_dir, "login_response_debug.html")
-        with open(debug_filename, "w", encoding="utf-8") as f:
-            f.write(response.text)
+        salvar_depuracao("login_response_debug.html", response.text)
+
+    registrar_contador('login')
+    classificacao = classificar_resposta(response.status_code, response.text)
 
     # Verifica se a resposta contém a tela de seleção de empresa
-    if "Selecione a Empresa" in response.text or "tEmpresas" in response.text:
+    if classificacao == RESPOSTA_SELECAO_EMPRESA:
         logger.info("Tela de seleção de empresa detectada, selecionando empresa...")
-        return select_empresa(session, base_url, response.text, debug)
-    
+        return select_empresa(session, base_url, response.text, debug, empresa)
+
+    if classificacao == RESPOSTA_ERRO:
+        raise ERPLoginError("O ERP retornou uma pagina de erro ao tentar logar.")
+
     # Se não for tela de seleção de empresa, tenta extrair o token diretamente
-    token_match = re.search(r"preencheSessao\s*\(\s*'([^']*)'", response.text)
-    if not token_match:
-        raise ERPLoginError("Nao foi possivel encontrar o token de autorizacao em preencheSessao(). Verifique a estrutura da pagina de resposta.")
-    
-    return token_match.group(1)
+    return token_login(response.text)
+
+def get_sync_status_page(session, base_url, auth_token, relogin=None, vista=None):
+    """Busca a pagina HTML com o status do sincronismo.
+
+    Se o ERP recusar o token (tela de login, logintimeout, HTTP 401/403 ou página
+    de erro) e ``relogin`` for informado, chama ``relogin()`` para obter um novo
+    token e repete a busca uma única vez. ``vista`` sobrescreve parâmetros de
+    VISTA_PADRAO (empresa, vista, aba...).
+    """
+    return _com_relogin(_buscar_vista, session, base_url, auth_token, relogin, vista)
 
-def get_sync_status_page(session, base_url, auth_token):
-    """Busca a pagina HTML com o status do sincronismo."""
+def get_sync_status_streaming(session, base_url, auth_token, relogin=None, vista=None):
+    """Busca a vista de sincronismo em fluxo e retorna os dados já analisados.
+
+    O corpo da resposta é lido em pedaços e entregue ao parser incremental do
+    lxml à medida que chega, sem montar a página inteira em memória. O retorno
+    é o mesmo de ``parse_status_page``; a recusa do token é tratada como em
+    ``get_sync_status_page``.
+    """
+    return _com_relogin(_analisar_vista_em_fluxo, session, base_url, auth_token, relogin, vista)
+
+def _com_relogin(buscar, session, base_url, auth_token, relogin, vista=None):
+    """Executa ``buscar`` e, se o token for recusado, repete uma vez após novo login."""
+    try:
+        return buscar(session, base_url, auth_token, vista)
+    except SessaoExpiradaError as e:
+        if relogin is None:
+            raise
+        logger.info(f"Token recusado pelo ERP ({e.motivo}), refazendo login...")
+        registrar_contador('relogin')
+        registrar_contador(f'relogin_{e.motivo}')
+        return buscar(session, base_url, relogin(), vista)
+
+def requisicao_vista(base_url, auth_token, vista=None):
+    """URL, payload e cabeçalhos do POST que carrega a vista de sincronismo."""
+    parametros = dict(VISTA_PADRAO, **(vista or {}))
     status_url = f"{base_url}/Tecnicon/Controller?acao=TecniconVista.CarregaVista.carregaVista&idDialog=dv4"
     headers = {
         'Authorization': auth_token
     }
     payload = {
-        'smenuvChamado': '11327',
+        'smenuvChamado': parametros['smenuv'],
         'telaChamou': 'Status Sincronismo 2',
-        'empresa': '17',
-        'filial': '1',
-        'local': '1',
-        'vista': '2052',
+        'empresa': parametros['empresa'],
+        'filial': parametros['filial'],
+        'local': parametros['local'],
+        'vista': parametros['vista'],
         'mobile': 'false',
-        'svistaaba': '2902',
-        'idTbl': '2902',
+        'svistaaba': parametros['svistaaba'],
+        'idTbl': parametros['svistaaba'],
         'param1': '{"parametros":[]}',
-        'param2': 'svistaaba|2902',
+        'param2': f"svistaaba|{parametros['svistaaba']}",
         'tamGridVista': '681',
         'tituloPainel': 'Status Sincronismo'
     }
+    return status_url, payload, headers
+
+def _post_vista(session, base_url, auth_token, stream=False, vista=None):
+    """Envia o POST que carrega a vista de sincronismo."""
+    registrar_contador('busca_status')
+    status_url, payload, headers = requisicao_vista(base_url, auth_token, vista)
+    if stream:
+        return session.post(status_url, headers=headers, data=payload, timeout=timeout_fase('busca'), stream=True)
+    return session.post(status_url, headers=headers, data=payload, timeout=timeout_fase('busca'))
 
+def _buscar_vista(session, base_url, auth_token, vista=None):
+    """Executa o POST da vista de sincronismo e valida a resposta."""
+    requests = importar('requests')
     try:
-        response = session.post(status_url, headers=headers, data=payload, timeout=30)
+        response = _post_vista(session, base_url, auth_token, vista=vista)
+        classificacao = classificar_resposta(response.status_code, response.text)
+        if classificacao == RESPOSTA_SESSAO_EXPIRADA:
+            raise SessaoExpiradaError(f"HTTP {response.status_code} ao buscar a pagina de status", classificacao)
         response.raise_for_status()
-        return response.text
     except requests.exceptions.RequestException as e:
+        verificar_prazo('busca')
+        raise StatusFetchError(f"Erro de conexao ao buscar a pagina de status: {e}")
+    contabilizar_resposta(response)
+
+    verificar_classificacao_vista(classificacao)
+    return response.text
+
+def verificar_classificacao_vista(classificacao):
+    """Levanta SessaoExpiradaError se a resposta da vista não for a grade."""
+    if classificacao == RESPOSTA_TELA_LOGIN:
+        raise SessaoExpiradaError("O ERP retornou a tela de login em vez da vista de sincronismo", classificacao)
+    if classificacao == RESPOSTA_ERRO:
+        raise SessaoExpiradaError("O ERP retornou uma pagina de erro em vez da vista de sincronismo", classificacao)
+
+def _analisar_vista_em_fluxo(session, base_url, auth_token, vista=None):
+    """Executa o POST da vista com ``stream=True`` e analisa o corpo enquanto chega."""
+    requests = importar('requests')
+    try:
+        response = _post_vista(session, base_url, auth_token, stream=True, vista=vista)
+        try:
+            if response.status_code in (401, 403):
+                raise SessaoExpiradaError(f"HTTP {response.status_code} ao buscar a pagina de status", RESPOSTA_SESSAO_EXPIRADA)
+            response.raise_for_status()
+
+            analise = AnaliseEmFluxo()
+            # Sem charset no cabeçalho, o requests não decodificaria os pedaços
+            response.encoding = response.encoding or 'utf-8'
+            for pedaco in response.iter_content(chunk_size=TAMANHO_PEDACO_FLUXO, decode_unicode=True):
+                # O timeout de leitura vale por pedaço: um corpo lento esgotaria o prazo
+                verificar_prazo('busca')
+                analise.alimentar(pedaco)
+            contabilizar_resposta(response, fluxo=True)
+        finally:
+            response.close()
+    except requests.exceptions.RequestException as e:
+        verificar_prazo('busca')
         raise StatusFetchError(f"Erro de conexao ao buscar a pagina de status: {e}")
 
-def parse_status_page(html_content):
+    try:
+        return analise.concluir()
+    except ParsingError:
+        # Sem grade: a resposta pode ser a tela de login ou uma página de erro
+        verificar_classificacao_vista(classificar_resposta(response.status_code, analise.inicio))
+        raise
+
+def _carregar_lxml():
+    """Importa o lxml sob demanda e compila os XPath do motor; retorna (lxml.html, etree)."""
+    global XPATH_TABELAS, XPATH_LINHAS, XPATH_CELULAS_CABECALHO, XPATH_CELULAS, XPATH_TEXTOS
+    html = importar('lxml.html')
+    etree = importar('lxml.etree')
+    if XPATH_TEXTOS is None:
+        XPATH_TABELAS = etree.XPath('//table')
+        XPATH_LINHAS = etree.XPath('.//tr')
+        XPATH_CELULAS_CABECALHO = etree.XPath('.//th | .//td')
+        XPATH_CELULAS = etree.XPath('.//td')
+        XPATH_TEXTOS = etree.XPath('.//text()')
+    return html, etree
+
+def _texto_bs4(celula):
+    """Texto de uma célula no motor BeautifulSoup."""
+    return celula.get_text(strip=True)
+
+def _texto_lxml(celula):
+    """Texto de uma célula no motor lxml, equivalente a get_text(strip=True)."""
+    return ''.join(texto.strip() for texto in XPATH_TEXTOS(celula))
+
+def _parece_cabecalho(textos):
+    """Indica se os textos de uma linha parecem nomes de colunas da grade."""
+    return any(termo in texto.upper() for texto in textos for termo in TERMOS_CABECALHO)
+
+def _texto_celula(celulas, idx, texto):
+    """Retorna o texto da célula no índice informado, ou '' se não houver."""
+    if idx is None or idx >= len(celulas):
+        return ''
+    return texto(celulas[idx])
+
+def _data_hora_iso(data_texto, hora_texto):
+    """Converte data (dd/mm/aaaa) e hora (hh:mm:ss) da grade em ISO 8601, ou None."""
+    try:
+        return datetime.strptime(f"{data_texto} {hora_texto}", '%d/%m/%Y %H:%M:%S').isoformat()
+    except ValueError:
+        return None
+
+def _localizar_tabelas_bs4(html_content):
+    """Motor BeautifulSoup: localiza o cabeçalho e as linhas de dados da grade.
+
+    Retorna (textos do cabeçalho, lista de células de cada linha de dados,
+    função que extrai o texto de uma célula).
+    """
+    soup = importar('bs4').BeautifulSoup(html_content, 'lxml')
+
+    # Encontra a tabela de sincronismo
+    tabela = None
+    estrutura_colunas = None  # Para armazenar a estrutura de colunas encontrada
+    todas_tabelas = soup.find_all('table')
+
+    logger.info("Total de tabelas encontradas: %d", len(todas_tabelas))
+
+    # Primeiro, procura por uma tabela que tenha os headers/nomes das colunas
+    for idx, t in enumerate(todas_tabelas):
+        linhas = t.find_all('tr')
+        if len(linhas) > 0:
+            # Analisa a primeira linha
+            primeira_linha = linhas[0].find_all(['th', 'td'])
+            texts_primeira = [h.get_text(strip=True) for h in primeira_linha]
+
+            # Verifica se parece ser cabeçalho (tem nomes descritivos)
+            if _parece_cabecalho(texts_primeira):
+                tabela = t
+                estrutura_colunas = texts_primeira
+                logger.info("Tabela %d com estrutura de colunas encontrada", idx)
+                logger.info("Estrutura: %s", estrutura_colunas)
+                break
+
+    # Se não encontrou tabela com cabeçalho, usa a primeira com dados
+    if not tabela:
+        for idx, t in enumerate(todas_tabelas):
+            linhas = t.find_all('tr')
+            if len(linhas) > 1:  # Mais de 1 linha (dados)
+                tabela = t
+                logger.info("Usando tabela %d com dados como fallback", idx)
+                break
+
+    if not tabela:
+        logger.error("Nenhuma tabela de sincronismo encontrada")
+        raise ParsingError("Não foi possível encontrar a tabela de sincronismo")
+
+    # Agora procura a tabela que tem os dados reais
+    tabela_dados = None
+    linhas_dados = []
+
+    for idx, t in enumerate(todas_tabelas):
+        linhas = t.find_all('tr')
+        # Pula a tabela que já usamos para pegar a estrutura
+        if t == tabela:
+            continue
+
+        if len(linhas) > 0:
+            # Verifica se tem dados (não é só cabeçalho)
+            primeira_linha = linhas[0].find_all(['th', 'td'])
+            texts_primeira = [h.get_text(strip=True) for h in primeira_linha]
+
+            # Se não parece cabeçalho e tem múltiplas linhas, é provavelmente dados
+            if not _parece_cabecalho(texts_primeira) and len(linhas) > 1:
+                tabela_dados = t
+                linhas_dados = linhas
+                logger.info("Tabela %d com dados encontrada", idx)
+                break
+
+    # Se não encontrou tabela com dados, usa a primeira que não seja a de estrutura
+    if not tabela_dados and len(todas_tabelas) > 1:
+        for idx, t in enumerate(todas_tabelas):
+            if t != tabela and len(t.find_all('tr')) > 1:
+                tabela_dados = t
+                linhas_dados = t.find_all('tr')
+                logger.info("Usando tabela %d como fallback para dados", idx)
+                break
+
+    if not tabela_dados:
+        logger.error("Nenhuma tabela com dados encontrada")
+        raise ParsingError("Não foi possível encontrar tabela com dados de sincronismo")
+
+    linhas_dados = [linha.find_all('td') for linha in linhas_dados]
+    return estrutura_colunas, linhas_dados, _texto_bs4
+
+def _localizar_tabelas_lxml(html_content):
+    """Motor lxml: localiza o cabeçalho e as linhas de dados em uma única passada.
+
+    Cada tabela é visitada uma vez com XPath compilado; as regras de escolha são
+    as mesmas do motor BeautifulSoup (primeira tabela com cara de cabeçalho e
+    primeira outra tabela com mais de uma linha que não pareça cabeçalho).
+    """
+    if isinstance(html_content, str) and html_content.lstrip().startswith('<?xml'):
+        # lxml recusa str com declaração de encoding
+        html_content = html_content.encode('utf-8')
+    raiz = _carregar_lxml()[0].fromstring(html_content)
+
+    tabelas = XPATH_TABELAS(raiz)
+    logger.info("Total de tabelas encontradas: %d", len(tabelas))
+
+    tabela = None
+    estrutura_colunas = None
+    candidatas = []
+    for idx, t in enumerate(tabelas):
+        linhas = XPATH_LINHAS(t)
+        if not linhas:
+            continue
+        texts_primeira = [_texto_lxml(c) for c in XPATH_CELULAS_CABECALHO(linhas[0])]
+        parece_cabecalho = _parece_cabecalho(texts_primeira)
+        if tabela is None and parece_cabecalho:
+            tabela = t
+            estrutura_colunas = texts_primeira
+            logger.info("Tabela %d com estrutura de colunas encontrada", idx)
+            logger.info("Estrutura: %s", estrutura_colunas)
+        candidatas.append((idx, t, linhas, parece_cabecalho))
+
+    # Se não encontrou tabela com cabeçalho, usa a primeira com dados
+    if tabela is None:
+        for idx, t, linhas, _ in candidatas:
+            if len(linhas) > 1:
+                tabela = t
+                logger.info("Usando tabela %d com dados como fallback", idx)
+                break
+
+    if tabela is None:
+        logger.error("Nenhuma tabela de sincronismo encontrada")
+        raise ParsingError("Não foi possível encontrar a tabela de sincronismo")
+
+    linhas_dados = None
+    for idx, t, linhas, parece_cabecalho in candidatas:
+        if t is not tabela and not parece_cabecalho and len(linhas) > 1:
+            linhas_dados = linhas
+            logger.info("Tabela %d com dados encontrada", idx)
+            break
+
+    # Se não encontrou tabela com dados, usa a primeira que não seja a de estrutura
+    if linhas_dados is None:
+        for idx, t, linhas, _ in candidatas:
+            if t is not tabela and len(linhas) > 1:
+                linhas_dados = linhas
+                logger.info("Usando tabela %d como fallback para dados", idx)
+                break
+
+    if linhas_dados is None:
+        logger.error("Nenhuma tabela com dados encontrada")
+        raise ParsingError("Não foi possível encontrar tabela com dados de sincronismo")
+
+    return estrutura_colunas, [XPATH_CELULAS(linha) for linha in linhas_dados], _texto_lxml
+
+def assinatura_cabecalho(header_texts):
+    """Identificador curto do layout da vista a partir dos textos do cabeçalho."""
+    return hashlib.sha1('\x1f'.join(header_texts).encode('utf-8')).hexdigest()[:16]
+
+def _resolver_colunas(header_texts):
+    """Retorna os índices das colunas usadas na análise.
+
+    O mapeamento é reaproveitado enquanto o cabeçalho não mudar; um cabeçalho
+    desconhecido passa pela detecção completa, com aviso se já havia outro.
+    """
+    assinatura = assinatura_cabecalho(header_texts)
+    with _lock_estado:
+        return _resolver_colunas_assinatura(assinatura, header_texts)
+
+def _resolver_colunas_assinatura(assinatura, header_texts):
+    layout = layouts_colunas.pop(assinatura, None)
+    if layout is not None:
+        # Reinsere no fim: o dicionário fica ordenado pelo uso mais recente
+        layouts_colunas[assinatura] = layout
+        if estado_layouts['ultima'] != assinatura:
+            estado_layouts['alterado'] = True
+        estado_layouts['ultima'] = assinatura
+        logger.info("Estrutura de colunas conhecida (layout %s): %s", assinatura, layout['colunas'])
+        return dict(layout['colunas'])
+
+    if estado_layouts['ultima'] is not None:
+        logger.warning("Layout da vista de sincronismo mudou (%s -> %s), redetectando colunas", estado_layouts['ultima'], assinatura)
+    colunas = _detectar_colunas(header_texts)
+    layouts_colunas[assinatura] = {'cabecalho': list(header_texts), 'colunas': colunas}
+    estado_layouts.update(ultima=assinatura, alterado=True)
+    return dict(colunas)
+
+def carregar_layouts():
+    """Carrega em memória os layouts de colunas salvos por execuções anteriores."""
+    layouts_colunas.update(carregar_layouts_colunas())
+    if layouts_colunas:
+        estado_layouts['ultima'] = next(reversed(layouts_colunas))
+
+def salvar_layouts():
+    """Salva os layouts de colunas se algum foi detectado ou reordenado."""
+    with _lock_estado:
+        if not estado_layouts['alterado']:
+            return
+        estado_layouts['alterado'] = False
+        layouts = dict(layouts_colunas)
+    salvar_layouts_colunas(layouts)
+
+def _detectar_colunas(header_texts):
+    """Identifica pelos textos do cabeçalho os índices das colunas usadas na análise."""
+    logger.info("Usando estrutura de colunas: %s", header_texts)
+
+    # Encontra índices das colunas necessárias
+    coluna_log_idx = None
+    coluna_data_envio_idx = None
+    coluna_hora_envio_idx = None
+
+    logger.debug("Procurando índices das colunas...")
+    for idx, header in enumerate(header_texts):
+        header_upper = header.upper().strip()
+        logger.debug("Analisando coluna %d: %r -> %r", idx, header, header_upper)
+
+        # Procura por coluna de log (prioridade máxima)
+        if 'LOG FILIAL' in header_upper and 'SINC' in header_upper:
+            coluna_log_idx = idx
+            logger.info("✅ Coluna 'Log Filial p/ Sinc.' encontrada no índice: %d", idx)
+
+        # Procura por data de envio
+        elif 'DATA' in header_upper and 'ENV' in header_upper and 'ULT' in header_upper:
+            coluna_data_envio_idx = idx
+            logger.info("✅ Coluna 'Data Ult. Reg. Env.' encontrada no índice: %d", idx)
+
+        # Procura por hora de envio
+        elif 'HORA' in header_upper and ('ENV' in header_upper or 'ULT' in header_upper):
+            coluna_hora_envio_idx = idx
+            logger.info("✅ Coluna 'Hora Ultimo Reg. Env.' encontrada no índice: %d", idx)
+
+    # Se não encontrou os índices específicos, tenta correspondência parcial
+    if coluna_log_idx is None:
+        for idx, header in enumerate(header_texts):
+            header_upper = header.upper()
+            if 'LOG' in header_upper and ('FILIAL' in header_upper or 'SINC' in header_upper):
+                coluna_log_idx = idx
+                logger.info("✅ Coluna de log encontrada por correspondência parcial no índice: %d", idx)
+                break
+
+    if coluna_data_envio_idx is None:
+        for idx, header in enumerate(header_texts):
+            header_upper = header.upper()
+            if 'DATA' in header_upper and 'ENV' in header_upper:
+                coluna_data_envio_idx = idx
+                logger.info("✅ Coluna de data de envio encontrada no índice: %d", idx)
+                break
+
+    if coluna_hora_envio_idx is None:
+        for idx, header in enumerate(header_texts):
+            header_upper = header.upper()
+            if 'HORA' in header_upper and ('ENV' in header_upper or 'ULT' in header_upper):
+                coluna_hora_envio_idx = idx
+                logger.info("✅ Coluna de hora de envio encontrada no índice: %d", idx)
+                break
+
+    # Log final dos índices
+    logger.info("Índices finais - Log: %s, Data: %s, Hora: %s", coluna_log_idx, coluna_data_envio_idx, coluna_hora_envio_idx)
+
+    # Se ainda não encontrou, tenta por posição baseado na estrutura típica
+    if coluna_data_envio_idx is None and len(header_texts) > 7:
+        coluna_data_envio_idx = 7  # Baseado no debug: Data Ult. Reg. Env. está no índice 7
+        logger.info("Usando índice padrão para data de envio: %d", coluna_data_envio_idx)
+
+    if coluna_hora_envio_idx is None and len(header_texts) > 8:
+        coluna_hora_envio_idx = 8  # Baseado no debug: Hora Ultimo Reg. Env. está no índice 8
+        logger.info("Usando índice padrão para hora de envio: %d", coluna_hora_envio_idx)
+
+    if coluna_log_idx is None and len(header_texts) > 12:
+        coluna_log_idx = 12  # Baseado no debug: Log Filial p/ Sinc. está no índice 12
+        logger.info("Usando índice padrão para log filial: %d", coluna_log_idx)
+
+    # Colunas auxiliares dos registros por filial (não participam da decisão)
+    coluna_codigo_idx = None
+    coluna_filial_idx = None
+    coluna_data_receb_idx = None
+    coluna_hora_receb_idx = None
+    for idx, header in enumerate(header_texts):
+        header_upper = header.upper().strip()
+        if coluna_codigo_idx is None and 'LOCAL' in header_upper and ('CÓD' in header_upper or 'COD' in header_upper):
+            coluna_codigo_idx = idx
+        elif coluna_filial_idx is None and header_upper == 'FILIAL':
+            coluna_filial_idx = idx
+        elif 'DATA' in header_upper and 'RECEB' in header_upper:
+            coluna_data_receb_idx = idx
+        elif 'HORA' in header_upper and 'RECEB' in header_upper:
+            coluna_hora_receb_idx = idx
+
+    return {
+        'log': coluna_log_idx,
+        'data_envio': coluna_data_envio_idx,
+        'hora_envio': coluna_hora_envio_idx,
+        'codigo': coluna_codigo_idx,
+        'filial': coluna_filial_idx,
+        'data_receb': coluna_data_receb_idx,
+        'hora_receb': coluna_hora_receb_idx,
+    }
+
+def _novo_acumulador():
+    """Estado acumulado ao longo das linhas de dados da grade.
+
+    O detalhe por linha só é registrado com o log em DEBUG (``--trace``); o
+    nível é consultado uma vez por análise, não a cada linha.
+    """
+    return {
+        'linhas': 0,
+        'conteudo_log': [],
+        'ultima_data_envio': None,
+        'ultima_hora_envio': None,
+        'filiais': [],
+        'ignoradas': [],
+        'detalhar': logger.isEnabledFor(logging.DEBUG),
+    }
+
+def _processar_linha(acumulador, colunas, celulas, texto):
+    """Acumula os dados de uma linha da grade; só as colunas usadas são lidas."""
+    idx = acumulador['linhas']
+    acumulador['linhas'] += 1
+    coluna_log_idx = colunas['log']
+    coluna_data_envio_idx = colunas['data_envio']
+    coluna_hora_envio_idx = colunas['hora_envio']
+
+    if len(celulas) <= max(coluna_log_idx or 0, coluna_data_envio_idx or 0, coluna_hora_envio_idx or 0):
+        acumulador['ignoradas'].append(idx + 1)
+        if acumulador['detalhar']:
+            logger.debug("Linha %d ignorada: apenas %d células", idx + 1, len(celulas))
+        return
+
+    # Verifica a coluna de log
+    texto_log = ''
+    if coluna_log_idx is not None and coluna_log_idx < len(celulas):
+        texto_log = texto(celulas[coluna_log_idx])
+        if texto_log:  # Se tem conteúdo (não está vazio)
+            acumulador['conteudo_log'].append(texto_log)
+            if acumulador['detalhar']:
+                logger.debug("Linha %d: Log com conteúdo encontrado: %r", idx + 1, texto_log)
+
+    # Pega a data/hora do último registro (da última linha válida)
+    data_texto = hora_texto = ''
+    if coluna_data_envio_idx is not None and coluna_hora_envio_idx is not None:
+        if coluna_data_envio_idx < len(celulas) and coluna_hora_envio_idx < len(celulas):
+            data_texto = texto(celulas[coluna_data_envio_idx])
+            hora_texto = texto(celulas[coluna_hora_envio_idx])
+
+            if data_texto and hora_texto:
+                acumulador['ultima_data_envio'] = data_texto
+                acumulador['ultima_hora_envio'] = hora_texto
+                if acumulador['detalhar']:
+                    logger.debug("Linha %d: data/hora de envio %s %s", idx + 1, data_texto, hora_texto)
+
+    acumulador['filiais'].append({
+        'codigo': _texto_celula(celulas, colunas['codigo'], texto) or str(idx + 1),
+        'filial': _texto_celula(celulas, colunas['filial'], texto),
+        'ultimo_envio': _data_hora_iso(data_texto, hora_texto),
+        'ultimo_recebimento': _data_hora_iso(
+            _texto_celula(celulas, colunas['data_receb'], texto), _texto_celula(celulas, colunas['hora_receb'], texto)
+        ),
+        'log': texto_log,
+    })
+
+def _amostra(valores):
+    """Primeiros AMOSTRAS_LOG valores para o resumo do log, indicando os omitidos."""
+    amostra = ', '.join(repr(valor) for valor in valores[:AMOSTRAS_LOG])
+    omitidos = len(valores) - AMOSTRAS_LOG
+    return f"{amostra} e mais {omitidos}" if omitidos > 0 else amostra
+
+def _registrar_resumo(acumulador):
+    """Resume a análise no log: uma linha por execução em vez de uma por linha da grade."""
+    ignoradas = acumulador['ignoradas']
+    if ignoradas:
+        logger.warning("%d linha(s) ignorada(s) por ter menos células que o cabeçalho: %s",
+                       len(ignoradas), _amostra(ignoradas))
+    conteudo_log = acumulador['conteudo_log']
+    logger.info("Analisadas %d linhas: %d com log (%s), último envio %s %s",
+                acumulador['linhas'], len(conteudo_log), _amostra(conteudo_log) or 'nenhum',
+                acumulador['ultima_data_envio'], acumulador['ultima_hora_envio'])
+
+def _concluir_dados(acumulador, buscar_data_hora):
+    """Monta o resultado da análise a partir das linhas acumuladas.
+
+    ``buscar_data_hora`` é chamada só quando a grade não trouxe data/hora e
+    devolve a primeira data e a primeira hora encontradas no HTML (ou None).
+    """
+    _registrar_resumo(acumulador)
+    conteudo_log = acumulador['conteudo_log']
+    log_com_conteudo = bool(conteudo_log)
+
+    # Prepara os resultados
+    problema_envio = ""
+    problema_receb = ""
+
+    # Verificação 1: Log Filial p/ Sinc. com conteúdo
+    if log_com_conteudo:
+        problema_envio = f"Log com problema: {' | '.join(conteudo_log)}"
+
+    # Verificação 2: Data/hora do último envio
+    data_ultimo_envio = acumulador['ultima_data_envio'] or ""
+    hora_ultimo_envio = acumulador['ultima_hora_envio'] or ""
+
+    # Se não encontrou data/hora, tenta encontrar no HTML geral
+    if not data_ultimo_envio or not hora_ultimo_envio:
+        data_regex, hora_regex = buscar_data_hora()
+
+        if data_regex:
+            data_ultimo_envio = data_regex
+            logger.info("Data encontrada via regex: %s", data_ultimo_envio)
+        if hora_regex:
+            hora_ultimo_envio = hora_regex
+            logger.info("Hora encontrada via regex: %s", hora_ultimo_envio)
+
+    # Se ainda não encontrou, usa valores padrão
+    if not data_ultimo_envio:
+        data_ultimo_envio = datetime.now().strftime('%d/%m/%Y')
+        logger.warning("Data não encontrada, usando valor padrão: %s", data_ultimo_envio)
+    if not hora_ultimo_envio:
+        hora_ultimo_envio = datetime.now().strftime('%H:%M:%S')
+        logger.warning("Hora não encontrada, usando valor padrão: %s", hora_ultimo_envio)
+
+    # Log do resultado final
+    if log_com_conteudo:
+        logger.info("Status: PROBLEMA - Log com conteúdo detectado")
+    else:
+        logger.info("Status: OK - Log vazio, verificando tempo...")
+
+    data = {
+        'data_ultimo_envio': data_ultimo_envio,
+        'hora_ultimo_envio': hora_ultimo_envio,
+        'problema_envio': problema_envio,
+        'problema_receb': problema_receb,
+        'logs_filial': conteudo_log,
+        'total_linhas': acumulador['linhas'],
+        'filiais': acumulador['filiais'],
+    }
+    return data
+
+def _buscar_data_hora(html_content):
+    """Primeira data (dd/mm/aaaa) e primeira hora (hh:mm:ss) presentes no HTML."""
+    data_match = PADRAO_DATA.search(html_content)
+    hora_match = PADRAO_HORA.search(html_content)
+    return (data_match.group(1) if data_match else None,
+            hora_match.group(1) if hora_match else None)
+
+def _extrair_dados(header_texts, linhas_dados, texto, html_content):
+    """Identifica as colunas pelo cabeçalho e extrai os dados das linhas da grade.
+
+    ``linhas_dados`` é a lista de células de cada linha e ``texto`` a função do
+    motor que extrai o texto de uma célula; só as colunas usadas são lidas.
+    """
+    colunas = _resolver_colunas(header_texts)
+
+    # Processa os dados da tabela de dados
+    logger.info("Processando %d linhas de dados", len(linhas_dados))
+    acumulador = _novo_acumulador()
+    for celulas in linhas_dados:
+        _processar_linha(acumulador, colunas, celulas, texto)
+
+    return _concluir_dados(acumulador, lambda: _buscar_data_hora(html_content))
+
+class AnaliseEmFluxo:
+    """Análise incremental da vista de sincronismo a partir de pedaços do HTML.
+
+    Cada linha (``tr``) é processada assim que o parser a fecha e em seguida é
+    descartada da árvore, de modo que a memória não cresce com o número de
+    filiais. As regras de escolha das tabelas são as dos demais motores: o
+    cabeçalho vem da primeira tabela cuja primeira linha pareça cabeçalho e os
+    dados da primeira outra tabela com mais de uma linha que não pareça.
+    """
+
+    def __init__(self):
+        self.parser = _carregar_lxml()[1].HTMLPullParser(events=('end',), tag=('tr', 'table'))
+        self.tabelas = {}
+        self.tabela_cabecalho = None
+        self.tabela_dados = None
+        self.dados_por_fallback = False
+        self.colunas = None
+        self.acumulador = _novo_acumulador()
+        # Linhas de dados recebidas antes do cabeçalho (somente textos)
+        self.pendentes = []
+        # Início da resposta, usado para classificá-la se não houver grade
+        self.inicio = ''
+        self.data_regex = None
+        self.hora_regex = None
+        self._cauda = ''
+
+    def alimentar(self, pedaco):
+        """Entrega um pedaço do corpo ao parser e processa as linhas concluídas."""
+        if not pedaco:
+            return
+        if len(self.inicio) < TAMANHO_INICIO_FLUXO:
+            self.inicio += pedaco[:TAMANHO_INICIO_FLUXO - len(self.inicio)]
+        self._procurar_data_hora(pedaco)
+        try:
+            self.parser.feed(pedaco)
+            self._processar_eventos()
+        except Exception as e:
+            logger.error(f"Erro ao analisar página em fluxo: {e}")
+            raise ParsingError(f"Erro ao analisar a página de status: {e}")
+
+    def concluir(self):
+        """Finaliza o parser e retorna os dados no formato de ``parse_status_page``."""
+        try:
+            self.parser.close()
+            self._processar_eventos()
+
+            if self.colunas is None:
+                logger.error("Nenhuma tabela de sincronismo encontrada")
+                raise ParsingError("Não foi possível encontrar a tabela de sincronismo")
+            if self.tabela_dados is None:
+                logger.error("Nenhuma tabela com dados encontrada")
+                raise ParsingError("Não foi possível encontrar tabela com dados de sincronismo")
+
+            return _concluir_dados(self.acumulador, lambda: (self.data_regex, self.hora_regex))
+        except Exception as e:
+            logger.error(f"Erro ao analisar página em fluxo: {e}")
+            raise ParsingError(f"Erro ao analisar a página de status: {e}")
+
+    def _procurar_data_hora(self, pedaco):
+        # Mantém a primeira data/hora do documento, como _buscar_data_hora; a
+        # cauda do pedaço anterior cobre valores divididos entre dois pedaços
+        if self.data_regex and self.hora_regex:
+            return
+        janela = self._cauda + pedaco
+        if self.data_regex is None:
+            encontrado = PADRAO_DATA.search(janela)
+            self.data_regex = encontrado.group(1) if encontrado else None
+        if self.hora_regex is None:
+            encontrado = PADRAO_HORA.search(janela)
+            self.hora_regex = encontrado.group(1) if encontrado else None
+        self._cauda = janela[-9:]
+
+    def _processar_eventos(self):
+        for _, elemento in self.parser.read_events():
+            if elemento.tag == 'tr':
+                self._processar_tr(elemento)
+            _liberar_elemento(elemento)
+
+    def _processar_tr(self, tr):
+        tabela = next(tr.iterancestors('table'), None)
+        if tabela is None:
+            return
+        info = self.tabelas.setdefault(tabela, {'linhas': 0, 'cabecalho': False, 'primeira': None})
+        info['linhas'] += 1
+
+        if info['linhas'] == 1:
+            textos = [_texto_lxml(c) for c in XPATH_CELULAS_CABECALHO(tr)]
+            info['cabecalho'] = _parece_cabecalho(textos)
+            if info['cabecalho'] and self.tabela_cabecalho is None:
+                self.tabela_cabecalho = tabela
+                logger.info("Estrutura: %s", textos)
+                self.colunas = _resolver_colunas(textos)
+                for celulas in self.pendentes:
+                    _processar_linha(self.acumulador, self.colunas, celulas, str)
+                self.pendentes = []
+            else:
+                # Só vira tabela de dados quando chegar a segunda linha
+                info['primeira'] = [_texto_lxml(c) for c in XPATH_CELULAS(tr)]
+            return
+
+        if tabela is self.tabela_cabecalho:
+            return
+        if info['linhas'] == 2 and self._escolher_tabela_dados(tabela, info):
+            self._linha_dados(info['primeira'], str)
+        info['primeira'] = None
+        if tabela is self.tabela_dados:
+            self._linha_dados(XPATH_CELULAS(tr), _texto_lxml)
+
+    def _escolher_tabela_dados(self, tabela, info):
+        # Tabela com cara de cabeçalho só é usada como fallback e é substituída
+        # se aparecer depois uma que não pareça cabeçalho, como nos outros motores
+        if self.tabela_dados is None:
+            logger.info("Tabela com dados encontrada" if not info['cabecalho'] else "Usando tabela como fallback para dados")
+        elif self.dados_por_fallback and not info['cabecalho']:
+            logger.info("Tabela com dados encontrada, descartando a tabela de fallback")
+            self.acumulador = _novo_acumulador()
+            self.pendentes = []
+        else:
+            return False
+        self.tabela_dados = tabela
+        self.dados_por_fallback = info['cabecalho']
+        return True
+
+    def _linha_dados(self, celulas, texto):
+        if self.colunas is None:
+            self.pendentes.append([texto(c) for c in celulas])
+        else:
+            _processar_linha(self.acumulador, self.colunas, celulas, texto)
+
+def _liberar_elemento(elemento):
+    """Descarta da árvore um elemento já processado e os irmãos anteriores."""
+    elemento.clear(keep_tail=True)
+    pai = elemento.getparent()
+    if pai is not None:
+        while elemento.getprevious() is not None:
+            del pai[0]
+
+def chave_analise(html_content):
+    """Hash da região da grade no HTML, usado para memorizar a análise.
+
+    A região começa no primeiro marcador da grade; o que vem antes (scripts e
+    cabeçalhos da tela) não altera o resultado. Sem marcador, usa a página toda.
+    As células "Data Atual"/"Hr Atual" mudam a cada consulta e são ignoradas.
+    """
+    if isinstance(html_content, bytes):
+        html_content = html_content.decode('utf-8', 'replace')
+    inicios = [html_content.find(marcador) for marcador in MARCADORES_GRID]
+    inicios = [i for i in inicios if i >= 0]
+    regiao = html_content[min(inicios):] if inicios else html_content
+    regiao = PADRAO_CELULAS_RELOGIO.sub('', regiao)
+    return hashlib.sha256(regiao.encode('utf-8', 'surrogatepass')).hexdigest()
+
+def parse_status_page(html_content, motor=None, memo=None):
     """Analisa o HTML e extrai os dados de sincronismo conforme condições específicas:
     
     Condições de problema:
@@ -219,263 +1262,609 @@ def parse_status_page(html_content):
     Condições de OK:
     1. Todas as células da coluna "Log Filial p/ Sinc." estiverem vazias
     2. E a data/hora do último registro estiver dentro do limite definido
+
+    ``motor`` escolhe a implementação da análise: 'lxml' (padrão, XPath
+    compilado) ou 'bs4' (BeautifulSoup, mantida como alternativa). Sem valor
+    explícito, usa a variável de ambiente PARSER_ENGINE.
+
+    ``memo`` (AnalisesEmMemoria ou AnalisesEmDisco) guarda o resultado pelo
+    hash da região da grade: uma página idêntica à já analisada devolve o
+    resultado guardado sem montar a árvore.
     """
+    if memo is not None:
+        chave = chave_analise(html_content)
+        memorizado = memo.obter(chave)
+        if memorizado is not None:
+            logger.info("Grade idêntica à já analisada, reaproveitando o resultado")
+            return memorizado
+
+    status_data = _analisar_pagina(html_content, motor)
+    if memo is not None:
+        memo.guardar(chave, status_data)
+    return status_data
+
+def _analisar_pagina(html_content, motor):
+    """Executa a análise completa da página com o motor escolhido."""
+    motor = motor or os.getenv('PARSER_ENGINE') or MOTOR_LXML
     try:
-        soup = BeautifulSoup(html_content, 'lxml')
-        
         # Log para debug
-        logger.info("Iniciando análise da página de status com lógica específica")
-        
-        # Encontra a tabela de sincronismo
-        tabela = None
-        estrutura_colunas = None  # Para armazenar a estrutura de colunas encontrada
-        todas_tabelas = soup.find_all('table')
-        
-        logger.info(f"Total de tabelas encontradas: {len(todas_tabelas)}")
-        
-        # Primeiro, procura por uma tabela que tenha os headers/nomes das colunas
-        for idx, t in enumerate(todas_tabelas):
-            linhas = t.find_all('tr')
-            if len(linhas) > 0:
-                # Analisa a primeira linha
-                primeira_linha = linhas[0].find_all(['th', 'td'])
-                texts_primeira = [h.get_text(strip=True) for h in primeira_linha]
-                
-                # Verifica se parece ser cabeçalho (tem nomes descritivos)
-                parece_cabecalho = False
-                for texto in texts_primeira:
-                    texto_upper = texto.upper()
-                    if any(termo in texto_upper for termo in ['LOG', 'FILIAL', 'DATA', 'HORA', 'ENV', 'SINC']):
-                        parece_cabecalho = True
-                        break
-                
-                if parece_cabecalho:
-                    tabela = t
-                    estrutura_colunas = texts_primeira
-                    logger.info(f"Tabela {idx} com estrutura de colunas encontrada")
-                    logger.info(f"Estrutura: {estrutura_colunas}")
-                    break
-        
-        # Se não encontrou tabela com cabeçalho, usa a primeira com dados
-        if not tabela:
-            for idx, t in enumerate(todas_tabelas):
-                linhas = t.find_all('tr')
-                if len(linhas) > 1:  # Mais de 1 linha (dados)
-                    tabela = t
-                    logger.info(f"Usando tabela {idx} com dados como fallback")
-                    break
-        
-        if not tabela:
-            logger.error("Nenhuma tabela de sincronismo encontrada")
-            raise ParsingError("Não foi possível encontrar a tabela de sincronismo")
-        
-        # Agora procura a tabela que tem os dados reais
-        tabela_dados = None
-        linhas_dados = []
-        
-        for idx, t in enumerate(todas_tabelas):
-            linhas = t.find_all('tr')
-            # Pula a tabela que já usamos para pegar a estrutura
-            if t == tabela:
-                continue
-            
-            if len(linhas) > 0:
-                # Verifica se tem dados (não é só cabeçalho)
-                primeira_linha = linhas[0].find_all(['th', 'td'])
-                texts_primeira = [h.get_text(strip=True) for h in primeira_linha]
-                
-                # Se não parece cabeçalho e tem múltiplas linhas, é provavelmente dados
-                if not any(termo in ' '.join(texts_primeira).upper() for termo in ['LOG', 'FILIAL', 'DATA', 'HORA', 'ENV', 'SINC']) and len(linhas) > 1:
-                    tabela_dados = t
-                    linhas_dados = linhas
-                    logger.info(f"Tabela {idx} com dados encontrada")
-                    break
-        
-        # Se não encontrou tabela com dados, usa a primeira que não seja a de estrutura
-        if not tabela_dados and len(todas_tabelas) > 1:
-            for idx, t in enumerate(todas_tabelas):
-                if t != tabela and len(t.find_all('tr')) > 1:
-                    tabela_dados = t
-                    linhas_dados = t.find_all('tr')
-                    logger.info(f"Usando tabela {idx} como fallback para dados")
-                    break
-        
-        if not tabela_dados:
-            logger.error("Nenhuma tabela com dados encontrada")
-            raise ParsingError("Não foi possível encontrar tabela com dados de sincronismo")
-        
-        # Usa a estrutura encontrada anteriormente
-        header_texts = estrutura_colunas
-        logger.info(f"Usando estrutura de colunas: {header_texts}")
-        
-        # Encontra índices das colunas necessárias
-        coluna_log_idx = None
-        coluna_data_envio_idx = None
-        coluna_hora_envio_idx = None
-        
-        logger.info("Procurando índices das colunas...")
-        for idx, header in enumerate(header_texts):
-            header_upper = header.upper().strip()
-            logger.info(f"Analisando coluna {idx}: '{header}' -> '{header_upper}'")
-            
-            # Procura por coluna de log (prioridade máxima)
-            if 'LOG FILIAL' in header_upper and 'SINC' in header_upper:
-                coluna_log_idx = idx
-                logger.info(f"✅ Coluna 'Log Filial p/ Sinc.' encontrada no índice: {idx}")
-            
-            # Procura por data de envio
-            elif 'DATA' in header_upper and 'ENV' in header_upper and 'ULT' in header_upper:
-                coluna_data_envio_idx = idx
-                logger.info(f"✅ Coluna 'Data Ult. Reg. Env.' encontrada no índice: {idx}")
-            
-            # Procura por hora de envio
-            elif 'HORA' in header_upper and ('ENV' in header_upper or 'ULT' in header_upper):
-                coluna_hora_envio_idx = idx
-                logger.info(f"✅ Coluna 'Hora Ultimo Reg. Env.' encontrada no índice: {idx}")
-        
-        # Se não encontrou os índices específicos, tenta correspondência parcial
-        if coluna_log_idx is None:
-            for idx, header in enumerate(header_texts):
-                header_upper = header.upper()
-                if 'LOG' in header_upper and ('FILIAL' in header_upper or 'SINC' in header_upper):
-                    coluna_log_idx = idx
-                    logger.info(f"✅ Coluna de log encontrada por correspondência parcial no índice: {idx}")
-                    break
-        
-        if coluna_data_envio_idx is None:
-            for idx, header in enumerate(header_texts):
-                header_upper = header.upper()
-                if 'DATA' in header_upper and 'ENV' in header_upper:
-                    coluna_data_envio_idx = idx
-                    logger.info(f"✅ Coluna de data de envio encontrada no índice: {idx}")
-                    break
-        
-        if coluna_hora_envio_idx is None:
-            for idx, header in enumerate(header_texts):
-                header_upper = header.upper()
-                if 'HORA' in header_upper and ('ENV' in header_upper or 'ULT' in header_upper):
-                    coluna_hora_envio_idx = idx
-                    logger.info(f"✅ Coluna de hora de envio encontrada no índice: {idx}")
-                    break
-        
-        # Log final dos índices
-        logger.info(f"Índices finais - Log: {coluna_log_idx}, Data: {coluna_data_envio_idx}, Hora: {coluna_hora_envio_idx}")
-        
-        # Se ainda não encontrou, tenta por posição baseado na estrutura típica
-        if coluna_data_envio_idx is None and len(header_texts) > 7:
-            coluna_data_envio_idx = 7  # Baseado no debug: Data Ult. Reg. Env. está no índice 7
-            logger.info(f"Usando índice padrão para data de envio: {coluna_data_envio_idx}")
-            
-        if coluna_hora_envio_idx is None and len(header_texts) > 8:
-            coluna_hora_envio_idx = 8  # Baseado no debug: Hora Ultimo Reg. Env. está no índice 8
-            logger.info(f"Usando índice padrão para hora de envio: {coluna_hora_envio_idx}")
-            
-        if coluna_log_idx is None and len(header_texts) > 12:
-            coluna_log_idx = 12  # Baseado no debug: Log Filial p/ Sinc. está no índice 12
-            logger.info(f"Usando índice padrão para log filial: {coluna_log_idx}")
-        
-        # Processa os dados da tabela de dados
-        logger.info(f"Processando {len(linhas_dados)} linhas de dados")
-        
-        # Variáveis para armazenar os resultados
-        log_com_conteudo = False
-        conteudo_log = []
-        ultima_data_envio = None
-        ultima_hora_envio = None
-        
-        # Analisa cada linha de dados
-        for idx, linha in enumerate(linhas_dados):
-            celulas = linha.find_all('td')
-            if len(celulas) <= max(coluna_log_idx or 0, coluna_data_envio_idx or 0, coluna_hora_envio_idx or 0):
-                logger.warning(f"Linha {idx+1} ignorada: apenas {len(celulas)} células")
-                continue
-            
-            # Verifica a coluna de log
-            if coluna_log_idx is not None and coluna_log_idx < len(celulas):
-                texto_log = celulas[coluna_log_idx].get_text(strip=True)
-                if texto_log:  # Se tem conteúdo (não está vazio)
-                    log_com_conteudo = True
-                    conteudo_log.append(texto_log)
-                    logger.info(f"Linha {idx+1}: Log com conteúdo encontrado: '{texto_log}'")
-            
-            # Pega a data/hora do último registro (da última linha válida)
-            if coluna_data_envio_idx is not None and coluna_hora_envio_idx is not None:
-                if coluna_data_envio_idx < len(celulas) and coluna_hora_envio_idx < len(celulas):
-                    data_texto = celulas[coluna_data_envio_idx].get_text(strip=True)
-                    hora_texto = celulas[coluna_hora_envio_idx].get_text(strip=True)
-                    
-                    if data_texto and hora_texto:
-                        ultima_data_envio = data_texto
-                        ultima_hora_envio = hora_texto
-                        logger.info(f"Última data/hora encontrada: {data_texto} {hora_texto}")
-        
-        # Prepara os resultados
-        problema_envio = ""
-        problema_receb = ""
-        
-        # Verificação 1: Log Filial p/ Sinc. com conteúdo
-        if log_com_conteudo:
-            problema_envio = f"Log com problema: {' | '.join(conteudo_log)}"
-            logger.info(f"Problema detectado: {problema_envio}")
-        
-        # Verificação 2: Data/hora do último envio
-        data_ultimo_envio = ultima_data_envio or ""
-        hora_ultimo_envio = ultima_hora_envio or ""
-        
-        # Se não encontrou data/hora, tenta encontrar no HTML geral
-        if not data_ultimo_envio or not hora_ultimo_envio:
-            data_match = re.search(r'(\d{2}/\d{2}/\d{4})', html_content)
-            hora_match = re.search(r'(\d{2}:\d{2}:\d{2})', html_content)
-            
-            if data_match:
-                data_ultimo_envio = data_match.group(1)
-                logger.info(f"Data encontrada via regex: {data_ultimo_envio}")
-            if hora_match:
-                hora_ultimo_envio = hora_match.group(1)
-                logger.info(f"Hora encontrada via regex: {hora_ultimo_envio}")
-        
-        # Se ainda não encontrou, usa valores padrão
-        if not data_ultimo_envio:
-            data_ultimo_envio = datetime.now().strftime('%d/%m/%Y')
-            logger.warning(f"Data não encontrada, usando valor padrão: {data_ultimo_envio}")
-        if not hora_ultimo_envio:
-            hora_ultimo_envio = datetime.now().strftime('%H:%M:%S')
-            logger.warning(f"Hora não encontrada, usando valor padrão: {hora_ultimo_envio}")
-        
-        # Log do resultado final
-        if log_com_conteudo:
-            logger.info(f"Status: PROBLEMA - Log com conteúdo detectado")
+        logger.info("Iniciando análise da página de status com lógica específica (motor: %s)", motor)
+
+        if motor == MOTOR_BS4:
+            header_texts, linhas_dados, texto = _localizar_tabelas_bs4(html_content)
         else:
-            logger.info(f"Status: OK - Log vazio, verificando tempo...")
-        
-        data = {
-            'data_ultimo_envio': data_ultimo_envio,
-            'hora_ultimo_envio': hora_ultimo_envio,
-            'problema_envio': problema_envio,
-            'problema_receb': problema_receb,
-        }
-        return data
-        
+            header_texts, linhas_dados, texto = _localizar_tabelas_lxml(html_content)
+
+        return _extrair_dados(header_texts, linhas_dados, texto, html_content)
+
     except Exception as e:
         logger.error(f"Erro ao analisar página: {e}")
         raise ParsingError(f"Erro ao analisar a página de status: {e}")
 
-def main():
-    """Funcao principal do script."""
-    logger.info("Iniciando verificação de sincronismo do ERP")
-    load_dotenv()
-
+def criar_parser():
+    """Cria o parser de argumentos da verificação (compartilhado com o daemon)."""
     parser = argparse.ArgumentParser(description="Verifica o status de sincronismo do ERP Tecnicon.")
     parser.add_argument('--url', default=os.getenv('ERP_BASE_URL'), help="URL base do ERP.")
     parser.add_argument('--username', default=os.getenv('ERP_USERNAME'), help="Usuario para login.")
     parser.add_argument('--max-delay', type=int, default=os.getenv('MAX_SECONDS_DELAY'), help="Atraso maximo em segundos permitido.")
     parser.add_argument('--debug', action='store_true', help="Ativa o modo de depuracao, salvando a resposta HTML do login.")
+    parser.add_argument('--trace', action='store_true', default=os.getenv('LOG_TRACE', '').lower() in ('1', 'true', 'sim'), help="Registra no log o detalhe de cada coluna e de cada linha da grade (nivel DEBUG); sem ele, a analise registra um resumo por execucao.")
+    parser.add_argument('--format', choices=['texto', 'json'], default='texto', help="Formato da saida: linha STATUS_* (texto) ou documento JSON para item mestre do Zabbix.")
+    parser.add_argument('--parser', choices=[MOTOR_LXML, MOTOR_BS4], default=os.getenv('PARSER_ENGINE', MOTOR_LXML), help="Motor de analise da grade: lxml (XPath, padrao) ou bs4 (BeautifulSoup).")
+    parser.add_argument('--stream', action='store_true', default=os.getenv('PARSER_STREAM', '').lower() in ('1', 'true', 'sim'), help="Analisa a vista em fluxo, enquanto o corpo da resposta e recebido (usa sempre o lxml).")
+    parser.add_argument('--parse-cache-size', type=int, default=os.getenv('PARSE_CACHE_SIZE', ANALISES_MAXIMO_PADRAO), help="Quantidade de analises de pagina memorizadas pelo hash da grade (0 desativa).")
+    parser.add_argument('--zabbix-server', default=os.getenv('ZABBIX_SERVER'), help="Envia os resultados ao trapper do Zabbix (host[:porta]) alem de imprimi-los.")
+    parser.add_argument('--zabbix-host', default=os.getenv('ZABBIX_HOST'), help="Nome do host no Zabbix que recebe os itens trapper.")
+    parser.add_argument('--zabbix-key-prefix', default=os.getenv('ZABBIX_KEY_PREFIX', PREFIXO_CHAVES_PADRAO), help="Prefixo das chaves dos itens trapper.")
+    parser.add_argument('--spool-max', type=int, default=os.getenv('ZABBIX_SPOOL_MAX', 100), help="Quantidade maxima de lotes nao entregues guardados no spool.")
+    parser.add_argument('--startup-profile', action='store_true', help="Imprime em stderr o tempo de importacao do modulo, das importacoes sob demanda e de cada fase.")
+    parser.add_argument('--discovery', action='store_true', help="Imprime o JSON de descoberta (LLD) do Zabbix com uma entrada por filial.")
+    parser.add_argument('--single-flight', action='store_true', default=os.getenv('SINGLE_FLIGHT', '').lower() in ('1', 'true', 'sim'), help="Compartilha uma unica consulta ao ERP entre execucoes simultaneas.")
+    parser.add_argument('--result-ttl', type=int, default=os.getenv('RESULT_CACHE_TTL', RESULTADO_TTL_PADRAO), help="Idade maxima em segundos do resultado compartilhado no modo single-flight.")
+    parser.add_argument('--deadline', type=float, default=os.getenv('CHECK_DEADLINE', 0), help="Prazo total em segundos para login, empresa, busca e analise (0 desativa); use um pouco menos que o timeout do item no Zabbix.")
+    parser.add_argument('--phase-timing', action='store_true', default=os.getenv('PHASE_TIMING', '').lower() in ('1', 'true', 'sim'), help="Mede tempo de parede, CPU, bytes e linhas de cada fase (login, empresa, busca, analise) e os inclui no log e na saida JSON.")
+    parser.add_argument('--history', action='store_true', default=os.getenv('HISTORY', '').lower() in ('1', 'true', 'sim'), help="Grava cada verificacao no historico local (SQLite) com atraso por filial, logs e tempos por fase.")
+    parser.add_argument('--history-db', default=os.getenv('HISTORY_DB'), help="Arquivo do historico (padrao: cache/historico.sqlite3).")
+    parser.add_argument('--history-raw-days', type=int, default=os.getenv('HISTORY_RAW_DAYS', 7), help="Dias de observacoes completas no historico; as mais antigas viram resumo horario.")
+    parser.add_argument('--history-days', type=int, default=os.getenv('HISTORY_DAYS', 365), help="Dias de resumo horario e de envios das filiais mantidos no historico.")
+    parser.add_argument('--forecast', action='store_true', default=os.getenv('FORECAST', '').lower() in ('1', 'true', 'sim'), help="Preve, pela taxa de avanco do ultimo envio no historico, quando o atraso do alvo e de cada filial passara do max-delay (grava o historico).")
+    parser.add_argument('--forecast-window', type=float, default=os.getenv('FORECAST_WINDOW', 3600), help="Meia-vida em segundos da janela movel que estima a taxa de avanco do ultimo envio.")
+    parser.add_argument('--forecast-horizon', type=float, default=os.getenv('FORECAST_HORIZON', 1800), help="Antecedencia em segundos com que um estouro previsto do max-delay vira ALERTA.")
+    parser.add_argument('--circuit-threshold', type=int, default=os.getenv('CIRCUIT_THRESHOLD', LIMIAR_FALHAS_PADRAO), help="Falhas de conexao seguidas que abrem o circuito do alvo (0 desativa).")
+    parser.add_argument('--circuit-cooldown', type=float, default=os.getenv('CIRCUIT_COOLDOWN', RESFRIAMENTO_PADRAO), help="Segundos com o circuito aberto antes de uma nova tentativa.")
+    parser.add_argument('--config', default=os.getenv('SINCRONISMO_CONFIG'), help="Arquivo TOML com varios alvos (instancias do ERP e vistas) verificados em paralelo.")
+    parser.add_argument('--workers', type=int, default=os.getenv('SINCRONISMO_WORKERS', TRABALHADORES_PADRAO), help="Verificacoes simultaneas no modo de varios alvos.")
+    parser.add_argument('--http-engine', choices=[MOTOR_HTTP_REQUESTS, MOTOR_HTTP_AIOHTTP], default=os.getenv('HTTP_ENGINE', MOTOR_HTTP_REQUESTS), help="Motor HTTP do modo de varios alvos: requests (threads) ou aiohttp (asyncio, um unico laco de eventos).")
+    parser.add_argument('--per-host-limit', type=int, default=os.getenv('HTTP_PER_HOST_LIMIT', 4), help="Conexoes simultaneas por host do ERP no motor aiohttp.")
+    parser.add_argument('--token-cache-ttl', type=int, default=os.getenv('TOKEN_CACHE_TTL', TOKEN_CACHE_TTL_PADRAO), help="Validade em segundos do token em cache entre execucoes (0 desativa).")
+    return parser
+
+def calcular_atraso(status_data, agora=None):
+    """Retorna a data/hora do último envio e o atraso em segundos até ``agora``."""
+    datetime_str = f"{status_data['data_ultimo_envio']} {status_data['hora_ultimo_envio']}"
+    try:
+        last_sync_time = datetime.strptime(datetime_str, '%d/%m/%Y %H:%M:%S')
+    except ValueError:
+        raise ParsingError(f"Formato de data/hora inesperado: '{datetime_str}'")
+
+    current_time = agora or datetime.now()
+    return last_sync_time, (current_time - last_sync_time).total_seconds()
+
+def avaliar_status(status_data, max_delay, agora=None):
+    """Aplica as condições de alerta sobre os dados extraídos da página de status.
+
+    Retorna uma tupla (codigo_saida, linha_saida) no formato esperado pelo Zabbix.
+    """
+    # Verifica se há problemas no sincronismo conforme condições específicas
+    tem_problema_log = bool(status_data['problema_envio'])  # Problema na coluna Log Filial p/ Sinc.
+
+    # Se há problema no log, retorna imediatamente com o conteúdo do log
+    if tem_problema_log:
+        logger.error(f"Problema detectado na coluna Log Filial p/ Sinc.: {status_data['problema_envio']}")
+        return 1, f"STATUS_PROBLEMA: {status_data['problema_envio']}"
+
+    # Se não há problema no log, verifica o tempo
+    _, delay = calcular_atraso(status_data, agora)
+
+    if delay > max_delay:
+        # Formata o tempo excedido (segundos ou minutos)
+        if delay > 60:
+            minutos = int(delay // 60)
+            segundos = int(delay % 60)
+            tempo_excedido = f"{minutos} minutos e {segundos} segundos"
+        else:
+            tempo_excedido = f"{int(delay)} segundos"
+
+        logger.error(f"Sincronismo atrasado - tempo excedido: {tempo_excedido} (limite: {max_delay}s)")
+        return 1, f"STATUS_PROBLEMA: Tempo excedido em {tempo_excedido} (limite: {max_delay}s)"
+
+    logger.info("Sincronismo funcionando corretamente")
+    return 0, STATUS_OK
+
+def executar_verificacao(session, base_url, username, password, max_delay, debug=False, token=None,
+                         resultado_ttl=0, motor=None, fluxo=False, memo=None, vista=None, identidade=None,
+                         prazo=None, medir_fases=False):
+    """Executa o ciclo completo de verificação: login, busca, análise e decisão.
+
+    Quando ``token`` é informado (sessão mantida aberta pelo daemon ou cache), a
+    busca é tentada primeiro com ele e o login só é refeito se o ERP recusar a
+    sessão. Com ``resultado_ttl`` > 0, execuções simultâneas compartilham uma
+    única consulta ao ERP (single-flight); a decisão de atraso é sempre
+    recalculada com o relógio e o limite de cada execução. Com ``fluxo``, a
+    vista é analisada enquanto é recebida e o tempo de análise fica somado ao
+    da busca. ``memo`` é repassado a ``parse_status_page`` (não se aplica ao
+    modo em fluxo). ``vista`` sobrescreve os parâmetros de VISTA_PADRAO (a
+    empresa também é a escolhida no login) e ``identidade`` substitui o
+    usuário na chave do single-flight quando há vários alvos por usuário.
+
+    ``prazo`` (Prazo) limita o tempo total: cada requisição recebe como timeout
+    o que resta dele e, esgotado, a saída é um STATUS_PROBLEMA que nomeia a
+    fase em que o tempo acabou.
+
+    Os 'tempos' vêm sempre de uma MedicaoFases. Com ``medir_fases`` ela também
+    fica visível aos auxiliares (seleção de empresa, bytes e linhas) e o
+    resultado traz 'fases' (MedicaoFases.resumo: parede, CPU, bytes e linhas de
+    login, empresa, busca e analise), registradas em uma linha de log ao final.
+
+    Retorna um dicionário com 'codigo' (código de saída), 'saida' (linha para o
+    Zabbix), 'token' (token válido ao final, ou None em caso de falha),
+    'status_data' (dados analisados, quando houver), 'atraso_segundos',
+    'ultimo_envio', 'tempos' (duração em segundos de cada fase executada) e,
+    quando a consulta foi conclusiva, 'erp_indisponivel' (usado pelo disjuntor).
+    """
+    estado = {'token': token}
+    inicio = time.perf_counter()
+    medicao = MedicaoFases()
+
+    def relogin():
+        logger.info("Realizando login no ERP...")
+        with medicao.medir('login'):
+            estado['token'] = get_auth_token(session, base_url, username, password, debug=debug,
+                                             empresa=(vista or {}).get('empresa'))
+        logger.info("Login realizado com sucesso, buscando página de status...")
+        return estado['token']
 
+    def coletar():
+        buscar = get_sync_status_streaming if fluxo else get_sync_status_page
+        with medicao.medir('busca'):
+            if estado['token']:
+                logger.info("Reutilizando token da sessão ativa...")
+                # Token reaproveitado: o ERP pode recusá-lo, então permite um novo login
+                status = buscar(session, base_url, estado['token'], relogin=relogin, vista=vista)
+            else:
+                status = buscar(session, base_url, relogin(), vista=vista)
+            if fluxo:
+                # Em fluxo a análise acontece durante a busca e as linhas contam nela
+                contabilizar_fase(linhas=status['total_linhas'])
+        if fluxo:
+            return status
+        status_html = status
+
+        logger.info("Página de status obtida, analisando dados...")
+        verificar_prazo('analise')
+        with medicao.medir('analise'):
+            status_data = parse_status_page(status_html, motor, memo)
+            contabilizar_fase(linhas=status_data['total_linhas'])
+        return status_data
+
+    resultado = {'codigo': 1, 'token': None, 'status_data': None, 'atraso_segundos': None,
+                 'ultimo_envio': None}
+    contexto_prazo = prazo_atual.set(prazo)
+    contexto_medicao = medicao_atual.set(medicao if medir_fases else None)
+    try:
+        if resultado_ttl and resultado_ttl > 0:
+            status_data = obter_resultado_compartilhado(
+                chave_alvo(base_url, identidade or username), resultado_ttl, coletar,
+                erros_publicaveis=(ERPLoginError, StatusFetchError, ParsingError), prazo=prazo
+            )
+        else:
+            status_data = coletar()
+        concluir_verificacao(resultado, status_data, max_delay)
+        resultado.update(token=estado['token'], erp_indisponivel=False)
+
+    except ResultadoCompartilhadoError as e:
+        # Falha de outra execução: o token desta execução não foi testado
+        resultado.update(saida=f"STATUS_PROBLEMA: {e}", token=token)
+    except EsperaTravaError as e:
+        # A coleta de outra execução passou do prazo desta; o token não foi testado
+        resultado.update(saida=f"STATUS_PROBLEMA: {PrazoEsgotadoError('busca', prazo)} {e}", token=token,
+                         prazo_esgotado='busca')
+    except PrazoEsgotadoError as e:
+        resultado.update(saida=mensagem_prazo_esgotado(e, medicao.tempos()), prazo_esgotado=e.fase,
+                         erp_indisponivel=True)
+    except (ERPLoginError, StatusFetchError, ParsingError) as e:
+        # Erro de análise: o ERP respondeu, não conta para o disjuntor
+        resultado['erp_indisponivel'] = not isinstance(e, ParsingError)
+        if debug:
+            resultado['saida'] = f"STATUS_PROBLEMA: {e} Um arquivo de depuracao foi salvo em 'debug/login_response_debug.html'."
+        else:
+            resultado['saida'] = f"STATUS_PROBLEMA: {e}"
+    except Exception as e:
+        resultado['saida'] = f"STATUS_PROBLEMA: Ocorreu um erro inesperado: {e}"
+    finally:
+        prazo_atual.reset(contexto_prazo)
+        medicao_atual.reset(contexto_medicao)
+        resultado['tempos'] = dict(medicao.tempos(), total=time.perf_counter() - inicio)
+    if medir_fases:
+        registrar_fases(resultado, medicao)
+    return resultado
+
+def registrar_fases(resultado, medicao):
+    """Anexa ao resultado as fases medidas e as registra no log."""
+    resultado['fases'] = medicao.resumo()
+    logger.info("Fases da verificação: %s", medicao.descrever() or 'nenhuma (resultado compartilhado)')
+
+def mensagem_prazo_esgotado(erro, tempos):
+    """Linha de STATUS_PROBLEMA do prazo esgotado, com as fases já concluídas."""
+    concluidas = ', '.join(f"{fase} {segundos:.1f}s" for fase, segundos in tempos.items() if fase != erro.fase)
+    return f"STATUS_PROBLEMA: {erro}" + (f" (concluido: {concluidas})" if concluidas else "")
+
+def concluir_verificacao(resultado, status_data, max_delay):
+    """Preenche o resultado com os dados analisados, o atraso e a decisão de status."""
+    resultado['status_data'] = status_data
+    try:
+        ultimo_envio, atraso = calcular_atraso(status_data)
+        resultado['ultimo_envio'] = ultimo_envio.isoformat()
+        resultado['atraso_segundos'] = round(atraso, 3)
+    except ParsingError:
+        pass
+    codigo, saida = avaliar_status(status_data, max_delay)
+    resultado.update(codigo=codigo, saida=saida)
+
+def _atraso_desde(momento_iso, agora):
+    """Atraso em segundos desde um instante ISO 8601, ou None se ausente ou inválido."""
+    momento = importar('previsao_sincronismo').epoca(momento_iso)
+    if momento is None:
+        return None
+    return round(agora.timestamp() - momento, 3)
+
+def formato_saida(args):
+    """Resolve o formato de saída a partir dos argumentos (--discovery tem precedência)."""
+    return 'discovery' if args.discovery else args.format
+
+def formatar_saida(resultado, formato='texto'):
+    """Converte o resultado da verificação na saída impressa para o Zabbix.
+
+    Retorna uma tupla (codigo_saida, texto). No formato 'json' o código é sempre
+    0: o status segue no documento, para que o item mestre nunca fique
+    "não suportado" e os itens dependentes continuem recebendo valores.
+    """
+    if formato not in ('json', 'discovery'):
+        return resultado['codigo'], resultado['saida']
+
+    if formato == 'discovery':
+        # Sem dados, a descoberta vazia apagaria os itens: reporta a falha
+        if not resultado.get('status_data'):
+            return 1, resultado['saida']
+        return 0, json.dumps({'data': _entradas_descoberta(resultado['status_data'])}, ensure_ascii=False)
+
+    return 0, json.dumps(_documento_json(resultado, datetime.now()), ensure_ascii=False)
+
+def _documento_json(resultado, agora):
+    """Documento da saída JSON de uma verificação."""
+    status_data = resultado.get('status_data') or {}
+    filiais = status_data.get('filiais', [])
+    return {
+        'status': 'OK' if resultado['codigo'] == 0 else 'PROBLEMA',
+        'mensagem': resultado['saida'],
+        'atraso_segundos': resultado.get('atraso_segundos'),
+        'ultimo_envio': resultado.get('ultimo_envio'),
+        'logs_filial': status_data.get('logs_filial', []),
+        'total_linhas': status_data.get('total_linhas'),
+        'filiais': [dict(registro, atraso_segundos=_atraso_desde(registro['ultimo_envio'], agora)) for registro in filiais],
+        'tempos': {fase: round(segundos, 4) for fase, segundos in resultado.get('tempos', {}).items()},
+        'prazo_esgotado': resultado.get('prazo_esgotado'),
+        'circuito': resultado.get('circuito'),
+        'fases': resultado.get('fases'),
+        'previsao': resultado.get('previsao'),
+        'coletado_em': agora.isoformat(timespec='seconds'),
+    }
+
+def _entradas_descoberta(status_data):
+    """Entradas LLD {#CODLOCAL}/{#FILIAL}, uma por código de filial."""
+    vistos = set()
+    entradas = []
+    for registro in status_data.get('filiais', []):
+        if registro['codigo'] not in vistos:
+            vistos.add(registro['codigo'])
+            entradas.append({'{#CODLOCAL}': registro['codigo'], '{#FILIAL}': registro['filial']})
+    return entradas
+
+def criar_disjuntor(args, base_url, identidade):
+    """Disjuntor do alvo conforme ``--circuit-threshold`` (None quando desativado)."""
+    if not args.circuit_threshold or args.circuit_threshold <= 0:
+        return None
+    return Disjuntor(base_url, identidade, args.circuit_threshold, args.circuit_cooldown)
+
+def resultado_circuito_aberto(mensagem):
+    """Resultado imediato de uma verificação barrada pelo circuito aberto."""
+    return {'codigo': 1, 'saida': f"STATUS_PROBLEMA: {mensagem}", 'token': None, 'status_data': None,
+            'atraso_segundos': None, 'ultimo_envio': None, 'tempos': {}, 'circuito': 'aberto'}
+
+def executar_com_disjuntor(disjuntor, verificar):
+    """Executa ``verificar()`` se o circuito permitir e registra o resultado no disjuntor.
+
+    ``verificar`` deve incluir a preparação da sessão: com o circuito aberto
+    nada é feito além da leitura do estado, nem mesmo importar o requests.
+    """
+    if disjuntor is None:
+        return verificar()
+    bloqueio = disjuntor.permitir()
+    if bloqueio:
+        logger.warning(f"Verificação não executada: {bloqueio}")
+        return resultado_circuito_aberto(bloqueio)
+    resultado = verificar()
+    disjuntor.registrar(resultado)
+    return resultado
+
+def resultado_inesperado(alvo, erro):
+    """Resultado de um alvo cuja verificação levantou uma exceção não prevista."""
+    logger.error(f"Falha inesperada ao verificar o alvo {alvo['nome']}: {erro}")
+    return {'codigo': 1, 'saida': f"STATUS_PROBLEMA: Ocorreu um erro inesperado: {erro}", 'token': None,
+            'status_data': None, 'atraso_segundos': None, 'ultimo_envio': None, 'tempos': {}}
+
+def verificar_alvos(alvos, verificar_alvo, trabalhadores=TRABALHADORES_PADRAO):
+    """Verifica vários alvos em paralelo, com no máximo ``trabalhadores`` simultâneos.
+
+    ``verificar_alvo(alvo)`` executa a verificação de um alvo com a sessão dele
+    e retorna o resultado de ``executar_verificacao``. Retorna a lista de pares
+    (alvo, resultado) na ordem da configuração; uma exceção em um alvo vira
+    STATUS_PROBLEMA só dele.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def verificar(alvo):
+        try:
+            return verificar_alvo(alvo)
+        except Exception as e:
+            return resultado_inesperado(alvo, e)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(trabalhadores, len(alvos)))) as executor:
+        return list(zip(alvos, executor.map(verificar, alvos)))
+
+def formatar_relatorio(resultados, formato='texto'):
+    """Combina os resultados de vários alvos na saída impressa para o Zabbix.
+
+    No formato 'texto' a linha é STATUS_OK se todos os alvos estiverem OK, ou
+    STATUS_PROBLEMA com a mensagem de cada alvo com problema. O JSON traz o
+    documento de cada alvo em ``alvos`` e a descoberta inclui ``{#ALVO}``.
+    """
+    problemas = [(alvo, resultado) for alvo, resultado in resultados if resultado['codigo'] != 0]
+
+    if formato == 'discovery':
+        entradas = []
+        for alvo, resultado in resultados:
+            if resultado.get('status_data'):
+                entradas += [dict(entrada, **{'{#ALVO}': alvo['nome']}) for entrada in _entradas_descoberta(resultado['status_data'])]
+        # Algum alvo sem dados: a descoberta parcial apagaria os itens dele
+        if any(not resultado.get('status_data') for _, resultado in resultados):
+            return 1, formatar_relatorio(resultados)[1]
+        return 0, json.dumps({'data': entradas}, ensure_ascii=False)
+
+    if formato == 'json':
+        agora = datetime.now()
+        documento = {
+            'status': 'PROBLEMA' if problemas else 'OK',
+            'alvos': [dict(_documento_json(resultado, agora), alvo=alvo['nome']) for alvo, resultado in resultados],
+        }
+        return 0, json.dumps(documento, ensure_ascii=False)
+
+    if not problemas:
+        return 0, STATUS_OK
+    mensagens = [f"[{alvo['nome']}] {resultado['saida'].removeprefix('STATUS_PROBLEMA: ')}" for alvo, resultado in problemas]
+    return 1, f"STATUS_PROBLEMA: {' | '.join(mensagens)}"
+
+def valores_zabbix(resultado, host, prefixo=None, clock=None):
+    """Monta o lote de valores de uma execução para os itens trapper do Zabbix.
+
+    Envia a linha de status (``<prefixo>.status``), o documento JSON para itens
+    dependentes (``<prefixo>.json``) e, quando houver dados, a descoberta de
+    filiais (``<prefixo>.discovery``).
+    """
+    prefixo = prefixo or PREFIXO_CHAVES_PADRAO
+    clock = int(clock or time.time())
+    valores = [
+        {'host': host, 'key': f"{prefixo}.status", 'value': resultado['saida'], 'clock': clock},
+        {'host': host, 'key': f"{prefixo}.json", 'value': formatar_saida(resultado, 'json')[1], 'clock': clock},
+    ]
+    codigo_descoberta, descoberta = formatar_saida(resultado, 'discovery')
+    if codigo_descoberta == 0:
+        valores.append({'host': host, 'key': f"{prefixo}.discovery", 'value': descoberta, 'clock': clock})
+    return valores
+
+def enviar_ao_zabbix(resultado, args):
+    """Empurra os valores da execução ao trapper, guardando-os no spool em caso de falha."""
+    return _enviar_valores_zabbix(valores_zabbix(resultado, args.zabbix_host, args.zabbix_key_prefix), args)
+
+def enviar_alvos_ao_zabbix(resultados, args):
+    """Empurra os valores de todos os alvos em um único lote, cada um no seu host."""
+    valores = []
+    for alvo, resultado in resultados:
+        valores += valores_zabbix(resultado, alvo['zabbix_host'], args.zabbix_key_prefix)
+    return _enviar_valores_zabbix(valores, args)
+
+def registrar_historico(args, verificacoes):
+    """Acrescenta as verificações ao histórico local (--history ou --forecast).
+
+    ``verificacoes`` é uma lista de (url, identidade, max_delay, resultado); o
+    alvo fica registrado como ``identidade@url``. Com ``--forecast``, a
+    previsão do atraso vai para ``resultado['previsao']``: chame antes de
+    imprimir ou enviar o resultado. Falhas do histórico viram aviso no log e
+    não alteram o resultado da verificação.
+    """
+    if not (args.history or args.forecast):
+        return
+    historico = importar('historico_sincronismo')
+    meia_vida = args.forecast_window if args.forecast else None
+    try:
+        with historico.HistoricoSincronismo(args.history_db, args.history_raw_days, args.history_days) as banco:
+            for base_url, identidade, max_delay, resultado in verificacoes:
+                tendencias = banco.registrar(f"{identidade}@{base_url}", resultado, meia_vida=meia_vida)
+                if meia_vida:
+                    registrar_previsao(resultado, tendencias, max_delay, args.forecast_horizon, meia_vida)
+    except (historico.sqlite3.Error, OSError) as e:
+        logger.warning("Não foi possível gravar o histórico: %s", e)
+
+def registrar_previsao(resultado, tendencias, max_delay, horizonte, meia_vida):
+    """Calcula a previsão do atraso do resultado e avisa no log os estouros previstos."""
+    previsao_sincronismo = importar('previsao_sincronismo')
+    previsao = previsao_sincronismo.prever_resultado(tendencias, resultado, max_delay, horizonte, meia_vida)
+    if previsao is None:
+        return
+    resultado['previsao'] = previsao
+    if previsao['status'] == previsao_sincronismo.STATUS_PREVISAO_ALERTA:
+        logger.warning("Previsão: o atraso deve passar do limite de %ss em %.0fs (avanço de %.2fs por segundo)",
+                       max_delay, previsao['tempo_ate_limite_s'], previsao['taxa_avanco'])
+    filiais = sorted(codigo for codigo, filial in previsao['filiais'].items()
+                     if filial['status'] == previsao_sincronismo.STATUS_PREVISAO_ALERTA)
+    if filiais:
+        logger.warning("Previsão: atraso deve passar do limite nas filiais %s", ', '.join(filiais))
+
+def _enviar_valores_zabbix(valores, args):
+    envio = importar('envio_sincronismo')
+    servidor, porta = envio.separar_servidor(args.zabbix_server)
+    totais = envio.enviar_com_spool(servidor, porta, valores, maximo=args.spool_max)
+    if totais is not None:
+        logger.info(f"Valores enviados ao Zabbix em {servidor}:{porta}: {totais}")
+    return totais
+
+def atualizar_cache_token(session, base_url, username, token_anterior, token_novo, ttl):
+    """Persiste o token renovado ou descarta o cache após uma verificação com falha."""
+    if not ttl or ttl <= 0:
+        return
+    if token_novo is None:
+        # Só descarta o token que esta execução usou; sem token, nada foi testado
+        if token_anterior is not None:
+            invalidar_token(base_url, username)
+    elif token_novo != token_anterior:
+        salvar_token(session, base_url, username, token_novo)
+
+def carregar_alvos_args(args):
+    """Carrega os alvos de ``--config``, completando-os com o .env e os argumentos.
+
+    Levanta ConfiguracaoError (de alvos_sincronismo) se o arquivo for inválido
+    ou, com ``--zabbix-server``, se algum alvo não tiver um host do Zabbix próprio.
+    """
+    alvos_sincronismo = importar('alvos_sincronismo')
+    padroes = {'url': args.url, 'usuario': args.username, 'senha': os.getenv('ERP_PASSWORD'),
+               'max_delay': args.max_delay, 'zabbix_host': args.zabbix_host}
+    alvos = alvos_sincronismo.carregar_alvos(args.config, padroes)
+    if args.zabbix_server:
+        hosts = [alvo['zabbix_host'] for alvo in alvos]
+        if None in hosts or len(set(hosts)) != len(hosts):
+            # As chaves dos itens são as mesmas em todos os alvos
+            raise alvos_sincronismo.ConfiguracaoError("Com --zabbix-server, cada alvo precisa de um zabbix_host diferente")
+    return alvos
+
+def verificar_configuracao(args):
+    """Modo de vários alvos (--config): verifica todos e imprime o relatório combinado.
+
+    Cada alvo tem a sua sessão HTTP e o seu token em cache; no máximo
+    ``--workers`` verificações rodam ao mesmo tempo. Retorna o código de saída.
+    """
+    alvos_sincronismo = importar('alvos_sincronismo')
+    try:
+        alvos = carregar_alvos_args(args)
+    except alvos_sincronismo.ConfiguracaoError as e:
+        print(f"Erro: {e}")
+        return 1
+
+    carregar_layouts()
+    memo = AnalisesEmDisco(args.parse_cache_size) if args.parse_cache_size > 0 else None
+    # Um só prazo para todos os alvos: o item do Zabbix espera o relatório combinado
+    prazo = criar_prazo(args, _INICIO_IMPORTACAO)
+
+    def verificar_alvo(alvo):
+        identidade = alvos_sincronismo.identidade_alvo(alvo)
+
+        def verificar():
+            with importar('requests').Session() as session:
+                token_cache = carregar_token(session, alvo['url'], identidade, args.token_cache_ttl)
+                resultado = executar_verificacao(session, alvo['url'], alvo['usuario'], alvo['senha'], alvo['max_delay'],
+                                                 debug=args.debug, token=token_cache,
+                                                 resultado_ttl=args.result_ttl if args.single_flight else 0,
+                                                 motor=args.parser, fluxo=args.stream, memo=memo,
+                                                 vista=alvo['vista'], identidade=identidade, prazo=prazo,
+                                                 medir_fases=args.phase_timing)
+                atualizar_cache_token(session, alvo['url'], identidade, token_cache, resultado['token'], args.token_cache_ttl)
+            return resultado
+
+        return executar_com_disjuntor(criar_disjuntor(args, alvo['url'], identidade), verificar)
+
+    if args.http_engine == MOTOR_HTTP_AIOHTTP:
+        assincrono = importar('assincrono_sincronismo')
+        try:
+            assincrono.exigir_aiohttp()
+        except RuntimeError as e:
+            print(f"Erro: {e}")
+            return 1
+        logger.info(f"Verificando {len(alvos)} alvo(s) de {args.config} com aiohttp (até {args.per_host_limit} conexões por host)")
+        resultados = assincrono.executar_alvos_async(alvos, limite_por_host=args.per_host_limit, motor=args.parser,
+                                                     memo=memo, token_cache_ttl=args.token_cache_ttl, prazo=prazo,
+                                                     medir_fases=args.phase_timing,
+                                                     disjuntor=lambda alvo: criar_disjuntor(
+                                                         args, alvo['url'], alvos_sincronismo.identidade_alvo(alvo)))
+    else:
+        logger.info(f"Verificando {len(alvos)} alvo(s) de {args.config} com até {args.workers} simultâneo(s)")
+        resultados = verificar_alvos(alvos, verificar_alvo, args.workers)
+
+    salvar_layouts()
+    totais = acumular_contadores(contadores_autenticacao, prazo=prazo)
+    if totais:
+        logger.info(f"Contadores de autenticação acumulados: {totais}")
+
+    # Antes do envio e da saída: a previsão entra no documento JSON
+    registrar_historico(args, [(alvo['url'], alvos_sincronismo.identidade_alvo(alvo), alvo['max_delay'], resultado)
+                               for alvo, resultado in resultados])
+
+    if args.zabbix_server:
+        enviar_alvos_ao_zabbix(resultados, args)
+
+    codigo, saida = formatar_relatorio(resultados, formato_saida(args))
+    print(saida)
+    if args.startup_profile:
+        print(relatorio_inicializacao(), file=sys.stderr)
+    return codigo
+
+def relatorio_inicializacao(tempos=None):
+    """Monta o relatório do --startup-profile, no estilo de ``python -X importtime``.
+
+    Lista, em milissegundos, a importação deste módulo, cada importação adiada
+    (já incluída no tempo da fase que a disparou), as fases da verificação e o
+    total desde o início da importação. A partida do interpretador não aparece;
+    para detalhar, use ``python -X importtime check_sincronismo.py``.
+    """
+    linhas = [f"inicializacao: {'ms':>9} | etapa"]
+    etapas = [('importacao do modulo', _FIM_IMPORTACAO - _INICIO_IMPORTACAO)]
+    etapas += [(f"importacao sob demanda: {nome}", duracao) for nome, duracao in importacoes_adiadas.items()]
+    etapas += [(f"fase {fase}", duracao) for fase, duracao in (tempos or {}).items()]
+    etapas.append(('total desde a importacao', time.perf_counter() - _INICIO_IMPORTACAO))
+    for etapa, duracao in etapas:
+        linhas.append(f"inicializacao: {duracao * 1000:>9.1f} | {etapa}")
+    return '\n'.join(linhas)
+
+def main():
+    """Funcao principal do script."""
+    logger.info("Iniciando verificação de sincronismo do ERP")
+    importar('dotenv').load_dotenv()
+
+    parser = criar_parser()
     args = parser.parse_args()
+    if args.trace:
+        logger.setLevel(logging.DEBUG)
+
+    if args.config:
+        codigo = verificar_configuracao(args)
+        if codigo != 0:
+            sys.exit(codigo)
+        return
 
     if not all([args.url, args.username, args.max_delay]):
         print("Erro: Faltando parametros. Forneca URL, username e max-delay via argumentos ou arquivo .env")
         sys.exit(1)
+    if args.zabbix_server and not args.zabbix_host:
+        print("Erro: --zabbix-server exige --zabbix-host (ou ZABBIX_HOST no .env)")
+        sys.exit(1)
 
     try:
         # Lê a senha diretamente do .env (simplificado - sem criptografia)
@@ -488,59 +1877,49 @@ def main():
         print(f"STATUS_PROBLEMA: Falha ao carregar senha do .env. Erro: {e}")
         sys.exit(1)
 
-    try:
-        with requests.Session() as session:
-            logger.info("Realizando login no ERP...")
-            token = get_auth_token(session, args.url, args.username, password, debug=args.debug)
-            logger.info("Login realizado com sucesso, buscando página de status...")
-            status_html = get_sync_status_page(session, args.url, token)
-            logger.info("Página de status obtida, analisando dados...")
-            status_data = parse_status_page(status_html)
-
-        # Verifica se há problemas no sincronismo conforme condições específicas
-        tem_problema_log = bool(status_data['problema_envio'])  # Problema na coluna Log Filial p/ Sinc.
-        
-        # Se há problema no log, retorna imediatamente com o conteúdo do log
-        if tem_problema_log:
-            logger.error(f"Problema detectado na coluna Log Filial p/ Sinc.: {status_data['problema_envio']}")
-            print(f"STATUS_PROBLEMA: {status_data['problema_envio']}")
-            sys.exit(1)
+    # Colunas já resolvidas em execuções anteriores dispensam a detecção
+    carregar_layouts()
+    prazo = criar_prazo(args, _INICIO_IMPORTACAO)
 
-        # Se não há problema no log, verifica o tempo
-        datetime_str = f"{status_data['data_ultimo_envio']} {status_data['hora_ultimo_envio']}"
-        try:
-            last_sync_time = datetime.strptime(datetime_str, '%d/%m/%Y %H:%M:%S')
-        except ValueError:
-            raise ParsingError(f"Formato de data/hora inesperado: '{datetime_str}'")
-
-        current_time = datetime.now()
-        delay = (current_time - last_sync_time).total_seconds()
-
-        if delay > args.max_delay:
-            # Formata o tempo excedido (segundos ou minutos)
-            if delay > 60:
-                minutos = int(delay // 60)
-                segundos = int(delay % 60)
-                tempo_excedido = f"{minutos} minutos e {segundos} segundos"
-            else:
-                tempo_excedido = f"{int(delay)} segundos"
-            
-            logger.error(f"Sincronismo atrasado - tempo excedido: {tempo_excedido} (limite: {args.max_delay}s)")
-            print(f"STATUS_PROBLEMA: Tempo excedido em {tempo_excedido} (limite: {args.max_delay}s)")
-            sys.exit(1)
+    def verificar():
+        with importar('requests').Session() as session:
+            # Token e cookies da execução anterior poupam o login e a seleção de empresa
+            token_cache = carregar_token(session, args.url, args.username, args.token_cache_ttl)
+            resultado = executar_verificacao(session, args.url, args.username, password, args.max_delay,
+                                             debug=args.debug, token=token_cache,
+                                             resultado_ttl=args.result_ttl if args.single_flight else 0,
+                                             motor=args.parser, fluxo=args.stream,
+                                             memo=AnalisesEmDisco(args.parse_cache_size) if args.parse_cache_size > 0 else None,
+                                             prazo=prazo, medir_fases=args.phase_timing)
+            atualizar_cache_token(session, args.url, args.username, token_cache, resultado['token'], args.token_cache_ttl)
+        return resultado
 
-        logger.info("Sincronismo funcionando corretamente")
-        print(STATUS_OK)
+    resultado = executar_com_disjuntor(criar_disjuntor(args, args.url, args.username), verificar)
 
-    except (ERPLoginError, StatusFetchError, ParsingError) as e:
-        if args.debug:
-            print(f"STATUS_PROBLEMA: {e} Um arquivo de depuracao foi salvo em 'debug/login_response_debug.html'.")
-        else:
-            print(f"STATUS_PROBLEMA: {e}")
-        sys.exit(1)
-    except Exception as e:
-        print(f"STATUS_PROBLEMA: Ocorreu um erro inesperado: {e}")
-        sys.exit(1)
+    salvar_layouts()
+    totais = acumular_contadores(contadores_autenticacao, prazo=prazo)
+    if totais:
+        logger.info(f"Contadores de autenticação acumulados: {totais}")
+
+    # Antes do envio e da saída: a previsão entra no documento JSON
+    registrar_historico(args, [(args.url, args.username, args.max_delay, resultado)])
+
+    if args.zabbix_server:
+        enviar_ao_zabbix(resultado, args)
+
+    codigo, saida = formatar_saida(resultado, formato_saida(args))
+    print(saida)
+    if args.startup_profile:
+        # stderr: a saída lida pelo Zabbix continua sendo só a linha de status
+        print(relatorio_inicializacao(resultado['tempos']), file=sys.stderr)
+    if codigo != 0:
+        sys.exit(codigo)
+
+# Fim da importação do módulo (relatório do --startup-profile)
+_FIM_IMPORTACAO = time.perf_counter()
 
 if __name__ == "__main__":
+    # Módulos carregados sob demanda (envio, alvos, motor assíncrono) importam
+    # check_sincronismo: usam esta mesma instância em vez de recarregá-la
+    sys.modules.setdefault('check_sincronismo', sys.modules[__name__])
     main()
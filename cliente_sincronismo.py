@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Cliente mínimo do daemon de verificação de sincronismo.
+
+Usa apenas a biblioteca padrão para que a inicialização seja imediata: repassa
+os argumentos recebidos do Zabbix ao daemon pelo socket UNIX e imprime a linha
+de status devolvida. Se o daemon não estiver disponível ou não responder a
+tempo, sai com o código EXIT_DAEMON_INDISPONIVEL para que o wrapper execute a
+verificação avulsa.
+"""
+
+import os
+import sys
+import json
+import socket
+
+# Mesmo caminho padrão de daemon_sincronismo.SOCKET_PADRAO
+SOCKET_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run', 'sincronismo.sock')
+
+# EX_TEMPFAIL: o wrapper recorre ao check_sincronismo.py avulso
+EXIT_DAEMON_INDISPONIVEL = 75
+
+# Tempo máximo de espera pela resposta do daemon (segundos) sem --deadline:
+# abaixo do Timeout máximo de um item do Zabbix (30s), para sobrar tempo ao wrapper
+TIMEOUT_PADRAO = 25
+
+# Espera além do --deadline: o daemon responde ao esgotar o prazo, e a margem
+# cobre o envio da resposta pelo socket
+MARGEM_PRAZO = 1.0
+
+
+class DaemonIndisponivelError(Exception):
+    """Excecao para quando nao e possivel conectar ao daemon."""
+    pass
+
+
+def timeout_cliente(argv, ambiente=os.environ):
+    """Espera máxima pela resposta: SINCRONISMO_CLIENTE_TIMEOUT, o --deadline mais a margem ou o padrão.
+
+    O --deadline vem dos argumentos (como o daemon os recebe) ou de CHECK_DEADLINE.
+    """
+    if ambiente.get('SINCRONISMO_CLIENTE_TIMEOUT'):
+        return float(ambiente['SINCRONISMO_CLIENTE_TIMEOUT'])
+    prazo = ambiente.get('CHECK_DEADLINE')
+    for i, argumento in enumerate(argv):
+        if argumento == '--deadline' and i + 1 < len(argv):
+            prazo = argv[i + 1]
+        elif argumento.startswith('--deadline='):
+            prazo = argumento.split('=', 1)[1]
+    try:
+        prazo = float(prazo or 0)
+    except ValueError:
+        # O daemon recusa o argumento e responde com o erro
+        prazo = 0
+    return prazo + MARGEM_PRAZO if prazo > 0 else TIMEOUT_PADRAO
+
+
+def consultar_daemon(argv, caminho_socket=SOCKET_PADRAO, timeout=TIMEOUT_PADRAO):
+    """Envia os argumentos ao daemon e retorna o dicionário de resposta."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        try:
+            s.connect(caminho_socket)
+        except OSError as e:
+            raise DaemonIndisponivelError(f"Daemon indisponível em {caminho_socket}: {e}")
+
+        s.sendall((json.dumps({'args': list(argv)}) + '\n').encode('utf-8'))
+        arquivo = s.makefile('rb')
+        linha = arquivo.readline()
+
+    if not linha:
+        raise DaemonIndisponivelError("Daemon encerrou a conexão sem responder")
+    return json.loads(linha)
+
+
+def main():
+    """Consulta o daemon e reproduz a saída e o código de retorno da verificação."""
+    caminho_socket = os.environ.get('SINCRONISMO_SOCKET', SOCKET_PADRAO)
+    timeout = timeout_cliente(sys.argv[1:])
+
+    try:
+        resposta = consultar_daemon(sys.argv[1:], caminho_socket, timeout)
+    except DaemonIndisponivelError:
+        sys.exit(EXIT_DAEMON_INDISPONIVEL)
+    except socket.timeout:
+        # Daemon travado: a saída padrão fica para a verificação avulsa do wrapper
+        print(f"Daemon nao respondeu em {timeout:g} segundos", file=sys.stderr)
+        sys.exit(EXIT_DAEMON_INDISPONIVEL)
+    except (OSError, ValueError) as e:
+        print(f"STATUS_PROBLEMA: Resposta invalida do daemon: {e}")
+        sys.exit(1)
+
+    print(resposta['saida'])
+    sys.exit(resposta['codigo'])
+
+
+if __name__ == "__main__":
+    main()
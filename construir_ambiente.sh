@@ -0,0 +1,43 @@
+#!/bin/bash
+# Constrói o ambiente Python pré-compilado usado pelo check_erp_sincronismo.sh.
+#
+# Cria .venv com as versões travadas em uv.lock e o bytecode já compilado,
+# inclusive dos módulos do projeto (o usuário zabbix não tem permissão para
+# gravar __pycache__ no diretório do projeto). Ao final grava a marca
+# .venv/.ambiente-pronto: o wrapper só executa o .venv diretamente enquanto
+# uv.lock e pyproject.toml não forem mais novos que essa marca.
+#
+# Chamado pelo setup.sh e pelo update.sh; pode ser executado manualmente.
+
+set -e
+
+cd "$(dirname "$(readlink -f "$0")")"
+
+UV_CMD="uv"
+if ! command -v uv >/dev/null 2>&1 && [ -x "/var/lib/zabbix/.local/bin/uv" ]; then
+  UV_CMD="/var/lib/zabbix/.local/bin/uv"
+fi
+
+MARCA=".venv/.ambiente-pronto"
+rm -f "$MARCA"
+
+# Extras opcionais do pyproject.toml, separados por espaço
+# (ex.: SINCRONISMO_EXTRAS="async" para o motor HTTP aiohttp)
+EXTRAS=()
+for extra in ${SINCRONISMO_EXTRAS:-}; do
+  EXTRAS+=(--extra "$extra")
+done
+
+# Interpretador do sistema: um Python baixado pelo uv ficaria no HOME de quem
+# executa este script, fora do alcance do usuário zabbix
+echo "Construindo ambiente Python travado em .venv..."
+"$UV_CMD" sync --frozen --no-dev "${EXTRAS[@]}" --compile-bytecode --python-preference only-system
+
+echo "Pré-compilando os módulos do projeto..."
+.venv/bin/python -m compileall -q -l .
+
+# Leitura e execução para todos (o wrapper roda como zabbix)
+chmod -R a+rX .venv __pycache__
+
+touch "$MARCA"
+echo "Ambiente pré-construído pronto: $(.venv/bin/python --version)"
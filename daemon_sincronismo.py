@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""Daemon residente da verificação de sincronismo do ERP.
+
+Mantém os módulos importados, a sessão HTTP e o token do ERP em memória e
+atende as verificações solicitadas pelo Zabbix através de um socket UNIX local.
+O protocolo é uma linha JSON por conexão: o cliente envia ``{"args": [...]}``
+com os mesmos argumentos aceitos por ``check_sincronismo.py`` e recebe
+``{"codigo": 0|1, "saida": "STATUS_..."}``.
+"""
+
+import os
+import sys
+import json
+import signal
+import logging
+import socket
+import argparse
+import threading
+import socketserver
+import requests
+from dotenv import load_dotenv
+
+from check_sincronismo import (
+    criar_parser, executar_verificacao, atualizar_cache_token, formatar_saida, formato_saida,
+    carregar_layouts, salvar_layouts, enviar_ao_zabbix, contadores_autenticacao, logger,
+    carregar_alvos_args, verificar_alvos, formatar_relatorio, enviar_alvos_ao_zabbix, criar_prazo,
+    criar_disjuntor, executar_com_disjuntor, registrar_historico, DIRETORIO_LOGS, MOTOR_HTTP_AIOHTTP,
+    _lock_estado
+)
+from alvos_sincronismo import ConfiguracaoError, identidade_alvo
+from cache_sincronismo import carregar_token, AnalisesEmMemoria
+from metricas_sincronismo import MetricasSincronismo, ServidorMetricas
+from log_sincronismo import iniciar_manutencao
+
+# Caminho padrão do socket (compartilhado com cliente_sincronismo.py)
+SOCKET_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run', 'sincronismo.sock')
+
+# Tamanho máximo aceito para a linha de pedido do cliente
+TAMANHO_MAXIMO_PEDIDO = 64 * 1024
+
+
+class SessaoAlvo:
+    """Sessão HTTP e token mantidos entre verificações para um par URL/usuário."""
+
+    def __init__(self):
+        self.session = requests.Session()
+        self.token = None
+        # requests.Session não é segura para uso concorrente: uma verificação por vez
+        self.lock = threading.Lock()
+
+
+class ManipuladorCliente(socketserver.StreamRequestHandler):
+    """Atende uma conexão do cliente: lê o pedido, verifica e responde."""
+
+    def handle(self):
+        linha = self.rfile.readline(TAMANHO_MAXIMO_PEDIDO)
+        try:
+            pedido = json.loads(linha)
+            argv = pedido['args']
+            if not isinstance(argv, list) or not all(isinstance(a, str) for a in argv):
+                raise ValueError("'args' deve ser uma lista de strings")
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Pedido inválido recebido pelo daemon: {e}")
+            resposta = {'codigo': 1, 'saida': f"STATUS_PROBLEMA: Pedido invalido para o daemon: {e}"}
+        else:
+            try:
+                resposta = self.server.verificar(argv)
+            except Exception as e:
+                # Sem resposta o cliente recorreria à execução avulsa sem deixar rastro
+                logger.exception("Falha inesperada no daemon ao verificar")
+                resposta = {'codigo': 1, 'saida': f"STATUS_PROBLEMA: Falha inesperada no daemon: {e}"}
+
+        self.wfile.write((json.dumps(resposta, ensure_ascii=False) + '\n').encode('utf-8'))
+
+
+class ServidorVerificacao(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Servidor UNIX que executa verificações reaproveitando sessões abertas."""
+
+    daemon_threads = True
+
+    def __init__(self, caminho_socket, password):
+        self.password = password
+        self.sessoes = {}
+        self._lock_sessoes = threading.Lock()
+        # Análises memorizadas pelo hash da grade, compartilhadas entre alvos
+        self.analises = AnalisesEmMemoria()
+        # Último estado de cada alvo, exposto em /metrics sem consultar o ERP
+        self.metricas = MetricasSincronismo(contadores_autenticacao, lock_contadores=_lock_estado)
+        carregar_layouts()
+        preparar_socket(caminho_socket)
+        super().__init__(caminho_socket, ManipuladorCliente)
+        # Apenas o dono (zabbix) e o grupo podem conversar com o daemon
+        os.chmod(caminho_socket, 0o660)
+
+    def obter_sessao(self, base_url, username):
+        """Retorna a sessão mantida para o alvo, criando-a se necessário."""
+        with self._lock_sessoes:
+            chave = (base_url, username)
+            if chave not in self.sessoes:
+                logger.info(f"Criando sessão residente para {username}@{base_url}")
+                self.sessoes[chave] = SessaoAlvo()
+            return self.sessoes[chave]
+
+    def verificar(self, argv):
+        """Executa uma verificação com os argumentos recebidos do cliente."""
+        parser = criar_parser()
+        try:
+            args = parser.parse_args(argv)
+        except SystemExit:
+            return {'codigo': 1, 'saida': "STATUS_PROBLEMA: Parametros invalidos enviados ao daemon"}
+
+        if args.config:
+            return self.verificar_configuracao(args)
+
+        if not all([args.url, args.username, args.max_delay]):
+            return {'codigo': 1, 'saida': "Erro: Faltando parametros. Forneca URL, username e max-delay via argumentos ou arquivo .env"}
+        if args.zabbix_server and not args.zabbix_host:
+            return {'codigo': 1, 'saida': "Erro: --zabbix-server exige --zabbix-host (ou ZABBIX_HOST no .env)"}
+
+        resultado = self.verificar_alvo(args, args.url, args.username, self.password, args.max_delay,
+                                        prazo=criar_prazo(args))
+        salvar_layouts()
+        if args.zabbix_server:
+            enviar_ao_zabbix(resultado, args)
+        codigo, saida = formatar_saida(resultado, formato_saida(args))
+        return {'codigo': codigo, 'saida': saida}
+
+    def verificar_configuracao(self, args):
+        """Verifica os alvos de ``--config`` em paralelo, cada um com a sua sessão residente.
+
+        O daemon usa sempre as sessões ``requests`` residentes com o pool de
+        threads: ``--http-engine aiohttp`` é ignorado aqui, com aviso no log.
+        """
+        try:
+            alvos = carregar_alvos_args(args)
+        except ConfiguracaoError as e:
+            return {'codigo': 1, 'saida': f"Erro: {e}"}
+        if args.http_engine == MOTOR_HTTP_AIOHTTP:
+            logger.warning(f"--http-engine aiohttp não vale no daemon; verificando {len(alvos)} alvo(s) "
+                           f"com as sessões residentes e até {args.workers} thread(s)")
+        prazo = criar_prazo(args)
+
+        def verificar_alvo(alvo):
+            return self.verificar_alvo(args, alvo['url'], alvo['usuario'], alvo['senha'], alvo['max_delay'],
+                                       vista=alvo['vista'], identidade=identidade_alvo(alvo), prazo=prazo)
+
+        resultados = verificar_alvos(alvos, verificar_alvo, args.workers)
+        salvar_layouts()
+        if args.zabbix_server:
+            enviar_alvos_ao_zabbix(resultados, args)
+        codigo, saida = formatar_relatorio(resultados, formato_saida(args))
+        return {'codigo': codigo, 'saida': saida}
+
+    def verificar_alvo(self, args, base_url, username, password, max_delay, vista=None, identidade=None, prazo=None):
+        """Executa a verificação de um alvo com a sessão residente dele.
+
+        O ``prazo`` começa a contar antes da espera pela sessão: uma verificação
+        enfileirada atrás de outra do mesmo alvo também consome o tempo do item.
+        """
+        identidade = identidade or username
+        sessao = self.obter_sessao(base_url, identidade)
+
+        def verificar():
+            with sessao.lock:
+                token_anterior = sessao.token
+                if token_anterior is None:
+                    # Após reinício do daemon, aproveita o token salvo pela última execução
+                    token_anterior = carregar_token(sessao.session, base_url, identidade, args.token_cache_ttl)
+                resultado = executar_verificacao(
+                    sessao.session, base_url, username, password,
+                    max_delay, debug=args.debug, token=token_anterior,
+                    resultado_ttl=args.result_ttl if args.single_flight else 0,
+                    motor=args.parser, fluxo=args.stream,
+                    memo=self.analises if args.parse_cache_size > 0 else None,
+                    vista=vista, identidade=identidade, prazo=prazo, medir_fases=args.phase_timing
+                )
+                sessao.token = resultado['token']
+                atualizar_cache_token(sessao.session, base_url, identidade, token_anterior,
+                                      resultado['token'], args.token_cache_ttl)
+            return resultado
+
+        # Com o circuito aberto, a resposta sai sem esperar a sessão do alvo
+        resultado = executar_com_disjuntor(criar_disjuntor(args, base_url, identidade), verificar)
+        registrar_historico(args, [(base_url, identidade, max_delay, resultado)])
+        self.metricas.registrar(base_url, identidade, resultado)
+        return resultado
+
+    def server_close(self):
+        super().server_close()
+        for sessao in self.sessoes.values():
+            sessao.session.close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def preparar_socket(caminho_socket):
+    """Cria o diretório do socket e remove um socket órfão de execução anterior.
+
+    Levanta RuntimeError se já houver um daemon ativo escutando no caminho.
+    """
+    os.makedirs(os.path.dirname(caminho_socket) or '.', exist_ok=True)
+    if not os.path.exists(caminho_socket):
+        return
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(caminho_socket)
+        except OSError:
+            logger.info(f"Removendo socket órfão: {caminho_socket}")
+            os.unlink(caminho_socket)
+            return
+    raise RuntimeError(f"Já existe um daemon ativo em {caminho_socket}")
+
+
+def main():
+    """Inicia o daemon e atende até receber SIGTERM/SIGINT."""
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Daemon residente da verificação de sincronismo do ERP.")
+    parser.add_argument('--socket', default=os.getenv('SINCRONISMO_SOCKET', SOCKET_PADRAO), help="Caminho do socket UNIX.")
+    parser.add_argument('--metrics-port', type=int, default=os.getenv('SINCRONISMO_METRICS_PORT', 0), help="Porta do endpoint /metrics do Prometheus (0 desativa).")
+    parser.add_argument('--metrics-address', default=os.getenv('SINCRONISMO_METRICS_ADDRESS', '127.0.0.1'), help="Endereço em que o endpoint /metrics escuta.")
+    parser.add_argument('--trace', action='store_true', default=os.getenv('LOG_TRACE', '').lower() in ('1', 'true', 'sim'), help="Registra no log o detalhe de cada linha da grade (nivel DEBUG).")
+    args = parser.parse_args()
+    if args.trace:
+        logger.setLevel(logging.DEBUG)
+
+    password = os.getenv('ERP_PASSWORD')
+    if not password:
+        print("Erro: ERP_PASSWORD não encontrado no arquivo .env")
+        sys.exit(1)
+
+    try:
+        servidor = ServidorVerificacao(args.socket, password)
+    except RuntimeError as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+
+    metricas = None
+    if args.metrics_port:
+        try:
+            metricas = ServidorMetricas(servidor.metricas, args.metrics_address, args.metrics_port).iniciar()
+        except OSError as e:
+            print(f"Erro: não foi possível abrir o endpoint de métricas em {args.metrics_address}:{args.metrics_port}: {e}")
+            servidor.server_close()
+            sys.exit(1)
+
+    # SIGTERM (systemd) encerra de forma limpa, removendo o socket
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    # Compressão e retenção dos logs, fora das verificações avulsas
+    parar_manutencao = iniciar_manutencao(DIRETORIO_LOGS)
+
+    logger.info(f"Daemon de sincronismo escutando em {args.socket}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info("Encerrando daemon de sincronismo")
+        parar_manutencao.set()
+        if metricas:
+            metricas.encerrar()
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
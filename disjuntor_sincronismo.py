@@ -0,0 +1,130 @@
+"""Disjuntor (circuit breaker) por alvo, compartilhado entre as execuções.
+
+Com o ERP fora do ar, cada coleta do Zabbix abriria novas conexões e esperaria
+os timeouts inteiros, acumulando pollers ocupados. O disjuntor guarda em
+``cache/disjuntor_<chave>.json`` o estado do alvo:
+
+- ``fechado``: as verificações consultam o ERP normalmente; falhas de conexão,
+  login ou prazo seguidas são contadas;
+- ``aberto``: atingido o limiar de falhas, as verificações terminam em
+  milissegundos com STATUS_PROBLEMA, sem tocar a rede, até passar o resfriamento;
+- ``meio_aberto``: passado o resfriamento, uma única verificação (a sonda)
+  consulta o ERP; sucesso fecha o circuito, falha o reabre por mais um período.
+  Se a sonda não registrar resultado, outra é liberada após o resfriamento.
+
+Respostas do ERP que não dependem da disponibilidade (grade analisada, erro de
+análise) contam como sucesso; falhas publicadas por outra execução não alteram
+o estado.
+"""
+
+import os
+import time
+import fcntl
+import logging
+from contextlib import contextmanager
+
+from cache_sincronismo import diretorio_cache, chave_alvo, gravar_json, ler_json
+
+logger = logging.getLogger('zabbix_erp_sincronismo')
+
+ESTADO_FECHADO = 'fechado'
+ESTADO_ABERTO = 'aberto'
+ESTADO_MEIO_ABERTO = 'meio_aberto'
+
+# Falhas seguidas que abrem o circuito (0 desativa) e resfriamento em segundos
+LIMIAR_FALHAS_PADRAO = 3
+RESFRIAMENTO_PADRAO = 60
+
+# Tamanho máximo da mensagem da última falha guardada no estado
+TAMANHO_MAXIMO_ERRO = 200
+
+
+class Disjuntor:
+    """Estado do circuito de um alvo (URL e identidade do usuário)."""
+
+    def __init__(self, base_url, identidade, limiar=LIMIAR_FALHAS_PADRAO, resfriamento=RESFRIAMENTO_PADRAO):
+        self.caminho = os.path.join(diretorio_cache(), f"disjuntor_{chave_alvo(base_url, identidade)}.json")
+        self.limiar = limiar
+        self.resfriamento = resfriamento
+        self.sonda = False
+
+    def estado(self):
+        """Retorna o estado persistido ({'estado', 'falhas', ...})."""
+        dados = ler_json(self.caminho)
+        if not isinstance(dados, dict) or dados.get('estado') not in (ESTADO_FECHADO, ESTADO_ABERTO, ESTADO_MEIO_ABERTO):
+            return {'estado': ESTADO_FECHADO, 'falhas': 0}
+        return dados
+
+    def permitir(self, agora=None):
+        """Decide se a verificação pode consultar o ERP.
+
+        Retorna None para seguir (circuito fechado ou esta execução é a sonda)
+        ou a mensagem do circuito aberto, para a saída imediata.
+        """
+        # Caminho rápido: circuito fechado, sem disputar a trava
+        if self.estado()['estado'] == ESTADO_FECHADO:
+            return None
+        agora = time.time() if agora is None else agora
+        try:
+            with self._trava():
+                dados = self.estado()
+                if dados['estado'] == ESTADO_FECHADO:
+                    return None
+                desde = dados.get('sonda_em' if dados['estado'] == ESTADO_MEIO_ABERTO else 'aberto_em', 0)
+                espera = desde + self.resfriamento - agora
+                if espera <= 0:
+                    dados.update(estado=ESTADO_MEIO_ABERTO, sonda_em=agora)
+                    gravar_json(self.caminho, dados)
+                    self.sonda = True
+                    logger.info("Circuito meio aberto: esta verificação testa se o ERP voltou")
+                    return None
+        except OSError as e:
+            logger.warning(f"Não foi possível consultar o disjuntor, seguindo com a verificação: {e}")
+            return None
+        return (f"ERP indisponivel, circuito aberto apos {dados.get('falhas', 0)} falha(s) seguida(s) "
+                f"(ultima: {dados.get('erro', '?')}); nova tentativa em {espera:.0f}s")
+
+    def registrar(self, resultado, agora=None):
+        """Atualiza o estado com o resultado de uma verificação que consultou o ERP.
+
+        Usa ``resultado['erp_indisponivel']``: True conta uma falha, False
+        fecha o circuito e a ausência (resultado de outra execução, erro
+        inesperado) não altera o estado.
+        """
+        indisponivel = resultado.get('erp_indisponivel')
+        if indisponivel is None:
+            return
+        sonda, self.sonda = self.sonda, False
+        if not indisponivel and not sonda and self.estado().get('falhas', 0) == 0:
+            # Sucesso com o circuito já fechado e zerado: nada a gravar
+            return
+        agora = time.time() if agora is None else agora
+        try:
+            with self._trava():
+                self._transicao(self.estado(), indisponivel, resultado.get('saida', ''), agora)
+        except OSError as e:
+            logger.warning(f"Não foi possível atualizar o disjuntor: {e}")
+
+    def _transicao(self, dados, indisponivel, saida, agora):
+        if not indisponivel:
+            if dados['estado'] != ESTADO_FECHADO:
+                logger.info("Circuito fechado: o ERP voltou a responder")
+            gravar_json(self.caminho, {'estado': ESTADO_FECHADO, 'falhas': 0})
+            return
+
+        falhas = dados.get('falhas', 0) + 1
+        erro = saida.removeprefix('STATUS_PROBLEMA: ')[:TAMANHO_MAXIMO_ERRO]
+        if dados['estado'] == ESTADO_MEIO_ABERTO or (dados['estado'] == ESTADO_FECHADO and falhas >= self.limiar):
+            logger.warning(f"Circuito aberto após {falhas} falha(s) seguida(s); "
+                           f"novas verificações falham de imediato por {self.resfriamento}s")
+            dados = {'estado': ESTADO_ABERTO, 'aberto_em': agora}
+        # Aberto por outra execução enquanto esta consultava o ERP: mantém o período
+        dados.update(falhas=falhas, erro=erro)
+        gravar_json(self.caminho, dados)
+
+    @contextmanager
+    def _trava(self):
+        # flock em um descritor próprio: exclui outros processos e outras threads do daemon
+        with open(f"{self.caminho}.lock", 'w') as trava:
+            fcntl.flock(trava, fcntl.LOCK_EX)
+            yield
@@ -0,0 +1,232 @@
+"""Envio de valores ao Zabbix pelo protocolo do trapper (zabbix_sender).
+
+Em vez de o Zabbix ocupar um poller durante o login e a busca da vista (check
+externo), a verificação pode empurrar os resultados para itens do tipo Zabbix
+trapper. Todos os valores de uma execução vão em um único pacote:
+
+    b'ZBXD' + flags (0x01) + tamanho (uint32 LE) + reservado (uint32 LE) + JSON
+
+com ``{"request": "sender data", "data": [{"host", "key", "value", "clock"}]}``.
+
+Se o servidor estiver inacessível, o lote fica em ``cache/spool/`` (limitado a
+``maximo`` lotes, descartando os mais antigos) e é reenviado, em um pacote
+próprio, depois que o lote da próxima execução for entregue. Um lote que o
+servidor continua recusando é descartado após ``TENTATIVAS_MAXIMAS_SPOOL``
+recusas, sem prender os valores das execuções seguintes.
+"""
+
+import os
+import json
+import time
+import zlib
+import fcntl
+import socket
+import struct
+import logging
+
+from cache_sincronismo import diretorio_cache, gravar_json, ler_json
+
+logger = logging.getLogger('zabbix_erp_sincronismo')
+
+# Porta padrão do trapper do Zabbix server/proxy
+PORTA_ZABBIX_PADRAO = 10051
+
+# Tempo máximo para conectar e receber a resposta do servidor (segundos)
+TIMEOUT_ENVIO_PADRAO = 10
+
+# Quantidade máxima de lotes guardados no spool
+SPOOL_MAXIMO_PADRAO = 100
+
+# Recusas do servidor após as quais um lote do spool é descartado
+TENTATIVAS_MAXIMAS_SPOOL = 5
+
+CABECALHO_ZBXD = b'ZBXD'
+FLAG_PROTOCOLO = 0x01
+FLAG_COMPRIMIDO = 0x02
+
+# Respostas maiores que isso indicam um servidor que não fala o protocolo
+TAMANHO_MAXIMO_RESPOSTA = 16 * 1024 * 1024
+
+
+class ZabbixSenderError(Exception):
+    """Excecao para respostas invalidas ou de falha do servidor Zabbix."""
+    pass
+
+
+def separar_servidor(endereco):
+    """Converte 'host' ou 'host:porta' em (host, porta)."""
+    host, separador, porta = endereco.rpartition(':')
+    if separador and porta.isdigit() and not host.endswith(':'):
+        return host.strip('[]'), int(porta)
+    return endereco.strip('[]'), PORTA_ZABBIX_PADRAO
+
+
+def montar_pacote(dados):
+    """Serializa ``dados`` em um pacote ZBXD sem compressão."""
+    corpo = json.dumps(dados, ensure_ascii=False).encode('utf-8')
+    return CABECALHO_ZBXD + bytes([FLAG_PROTOCOLO]) + struct.pack('<II', len(corpo), 0) + corpo
+
+
+def _receber_exato(conexao, tamanho):
+    partes = []
+    restante = tamanho
+    while restante:
+        parte = conexao.recv(min(restante, 65536))
+        if not parte:
+            raise ZabbixSenderError("Conexao encerrada pelo servidor Zabbix antes do fim da resposta")
+        partes.append(parte)
+        restante -= len(parte)
+    return b''.join(partes)
+
+
+def ler_pacote(conexao):
+    """Lê um pacote ZBXD da conexão e retorna o JSON decodificado."""
+    cabecalho = _receber_exato(conexao, 13)
+    if cabecalho[:4] != CABECALHO_ZBXD:
+        raise ZabbixSenderError(f"Resposta fora do protocolo do Zabbix: {cabecalho!r}")
+    flags = cabecalho[4]
+    tamanho, tamanho_original = struct.unpack('<II', cabecalho[5:13])
+    if tamanho > TAMANHO_MAXIMO_RESPOSTA:
+        raise ZabbixSenderError(f"Resposta do Zabbix grande demais: {tamanho} bytes")
+    corpo = _receber_exato(conexao, tamanho)
+    if flags & FLAG_COMPRIMIDO:
+        corpo = zlib.decompress(corpo)
+    try:
+        return json.loads(corpo.decode('utf-8'))
+    except ValueError as e:
+        raise ZabbixSenderError(f"Resposta JSON invalida do Zabbix: {e}")
+
+
+def interpretar_info(info):
+    """Converte 'processed: 3; failed: 0; total: 3; ...' em dicionário."""
+    resultado = {}
+    for parte in (info or '').split(';'):
+        nome, _, valor = parte.partition(':')
+        try:
+            resultado[nome.strip().replace(' ', '_')] = float(valor) if '.' in valor else int(valor)
+        except ValueError:
+            continue
+    return resultado
+
+
+def enviar_valores(servidor, porta, valores, timeout=TIMEOUT_ENVIO_PADRAO):
+    """Envia os valores em um único pacote e retorna os totais informados pelo servidor.
+
+    Levanta OSError se não for possível falar com o servidor e
+    ZabbixSenderError se a resposta for inválida ou diferente de 'success'.
+    """
+    pacote = montar_pacote({'request': 'sender data', 'data': valores, 'clock': int(time.time())})
+    with socket.create_connection((servidor, porta), timeout=timeout) as conexao:
+        conexao.sendall(pacote)
+        resposta = ler_pacote(conexao)
+
+    if resposta.get('response') != 'success':
+        raise ZabbixSenderError(f"Servidor Zabbix recusou o lote: {resposta}")
+    totais = interpretar_info(resposta.get('info'))
+    if totais.get('failed'):
+        # Chave inexistente, host errado ou item que não é trapper
+        logger.warning(f"Zabbix não processou {totais['failed']} de {totais.get('total')} valores: {resposta.get('info')}")
+    return totais
+
+
+def _diretorio_spool():
+    diretorio = os.path.join(diretorio_cache(), 'spool')
+    os.makedirs(diretorio, mode=0o700, exist_ok=True)
+    return diretorio
+
+
+def _lotes_no_spool(diretorio):
+    return sorted(nome for nome in os.listdir(diretorio) if nome.startswith('lote_') and nome.endswith('.json'))
+
+
+def _ler_lote(caminho):
+    """Retorna (valores, recusas) de um lote do spool, ou (None, 0) se ilegível.
+
+    Lotes gravados por versões anteriores são apenas a lista de valores.
+    """
+    dados = ler_json(caminho)
+    if isinstance(dados, list):
+        return dados, 0
+    if isinstance(dados, dict) and isinstance(dados.get('valores'), list):
+        return dados['valores'], dados.get('recusas', 0)
+    return None, 0
+
+
+def _remover(caminho):
+    try:
+        os.unlink(caminho)
+    except OSError:
+        pass
+
+
+def guardar_no_spool(valores, maximo=SPOOL_MAXIMO_PADRAO, recusas=0):
+    """Guarda um lote não entregue, descartando os mais antigos acima de ``maximo``."""
+    diretorio = _diretorio_spool()
+    gravar_json(os.path.join(diretorio, f"lote_{time.time_ns():020d}_{os.getpid()}.json"),
+                {'valores': valores, 'recusas': recusas})
+    lotes = _lotes_no_spool(diretorio)
+    excedentes = lotes[:max(0, len(lotes) - maximo)]
+    if excedentes:
+        logger.warning(f"Spool do Zabbix cheio: descartando {len(excedentes)} lote(s) mais antigo(s)")
+    for nome in excedentes:
+        _remover(os.path.join(diretorio, nome))
+
+
+def _reenviar_spool(diretorio, pendentes, servidor, porta, timeout):
+    """Reenvia os lotes ``pendentes`` do spool, um pacote por lote, do mais antigo ao mais novo.
+
+    Um lote recusado conta uma recusa e é descartado ao atingir
+    TENTATIVAS_MAXIMAS_SPOOL; com o servidor inacessível, os demais ficam para a
+    próxima execução. Retorna a quantidade de lotes entregues.
+    """
+    reenviados = 0
+    for nome in pendentes:
+        caminho = os.path.join(diretorio, nome)
+        valores, recusas = _ler_lote(caminho)
+        if valores is None:
+            logger.warning(f"Descartando lote ilegível do spool do Zabbix: {nome}")
+        elif valores:
+            try:
+                enviar_valores(servidor, porta, valores, timeout)
+                reenviados += 1
+            except OSError as e:
+                logger.warning(f"Falha ao reenviar o spool do Zabbix, {nome} e seguintes ficam para a próxima execução: {e}")
+                break
+            except ZabbixSenderError as e:
+                recusas += 1
+                if recusas < TENTATIVAS_MAXIMAS_SPOOL:
+                    gravar_json(caminho, {'valores': valores, 'recusas': recusas})
+                    continue
+                logger.warning(f"Descartando lote do spool do Zabbix com {len(valores)} valor(es) após {recusas} recusas: {e}")
+        _remover(caminho)
+    return reenviados
+
+
+def enviar_com_spool(servidor, porta, valores, timeout=TIMEOUT_ENVIO_PADRAO, maximo=SPOOL_MAXIMO_PADRAO):
+    """Envia os ``valores`` desta execução e, em seguida, os lotes pendentes do spool.
+
+    Cada lote vai em um pacote próprio: um lote antigo recusado não impede a
+    entrega dos valores atuais. Retorna os totais do servidor para os valores
+    desta execução ou None se o envio falhou (o lote fica no spool). A trava
+    impede que execuções simultâneas reenviem o mesmo lote.
+    """
+    diretorio = _diretorio_spool()
+    with open(os.path.join(diretorio, 'spool.lock'), 'w') as trava:
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        pendentes = _lotes_no_spool(diretorio)
+        try:
+            totais = enviar_valores(servidor, porta, valores, timeout)
+        except OSError as e:
+            # Servidor inacessível: não adianta tentar os lotes pendentes agora
+            logger.warning(f"Falha ao enviar {len(valores)} valor(es) ao Zabbix em {servidor}:{porta}, guardando no spool: {e}")
+            guardar_no_spool(valores, maximo)
+            return None
+        except ZabbixSenderError as e:
+            logger.warning(f"Zabbix em {servidor}:{porta} recusou {len(valores)} valor(es), guardando no spool: {e}")
+            guardar_no_spool(valores, maximo, recusas=1)
+            totais = None
+
+        reenviados = _reenviar_spool(diretorio, pendentes, servidor, porta, timeout)
+    if reenviados:
+        logger.info(f"Reenviados {reenviados} lote(s) do spool do Zabbix")
+    return totais
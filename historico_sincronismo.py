@@ -0,0 +1,320 @@
+"""Histórico local das verificações de sincronismo (SQLite).
+
+Cada verificação com ``--history`` acrescenta um registro a
+``cache/historico.sqlite3`` (ou ``--history-db``), para acompanhar a evolução
+do atraso e a latência do ERP sem consultar o Zabbix:
+
+- ``observacoes``: uma linha por verificação (alvo, status, atraso, último
+  envio, linhas da grade, mensagens de log das filiais e tempos por fase);
+- ``envios_filiais``: o último envio e o log de cada filial, gravados só
+  quando mudam; o atraso de uma filial em qualquer instante é o tempo desde
+  o último envio registrado até ele;
+- ``resumo_horario``: as observações mais antigas que ``dias_brutos`` são
+  agregadas por hora (amostras, problemas, atraso médio e máximo, busca e
+  total médios) e removidas; resumos e envios são mantidos por ``dias_resumo``;
+- ``tendencias``: com ``--forecast``, o estado da janela móvel de cada série
+  (alvo e filiais) de ``previsao_sincronismo``, atualizado a cada verificação.
+
+O banco usa WAL: várias verificações simultâneas gravam sem bloquear as
+leituras. A manutenção roda no máximo uma vez por hora, na gravação.
+
+Uso (consultas):
+    python historico_sincronismo.py --alvos
+    python historico_sincronismo.py --alvo 'MONITOR@http://erp:8080' --horas 24
+    python historico_sincronismo.py --alvo 'MONITOR@http://erp:8080' --filial 4 --horas 168
+    python historico_sincronismo.py --alvo 'MONITOR@http://erp:8080' --resumo --horas 720
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from contextlib import contextmanager
+
+from cache_sincronismo import diretorio_cache
+from previsao_sincronismo import TendenciaEnvio, envios_por_serie, epoca
+
+ARQUIVO_HISTORICO = 'historico.sqlite3'
+
+# Versão do esquema (PRAGMA user_version)
+VERSAO_HISTORICO = 2
+
+# Dias de observações completas e de resumos horários/envios das filiais
+DIAS_BRUTOS_PADRAO = 7
+DIAS_RESUMO_PADRAO = 365
+
+# Intervalo mínimo entre duas manutenções (segundos)
+INTERVALO_MANUTENCAO = 3600
+
+# Espera máxima pela trava de escrita de outra verificação (milissegundos)
+ESPERA_TRAVA_MS = 5000
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS observacoes (
+    id INTEGER PRIMARY KEY,
+    momento REAL NOT NULL,
+    alvo TEXT NOT NULL,
+    codigo INTEGER NOT NULL,
+    atraso_segundos REAL,
+    ultimo_envio REAL,
+    total_linhas INTEGER,
+    mensagem TEXT,
+    logs_filial TEXT,
+    tempos TEXT
+);
+CREATE INDEX IF NOT EXISTS observacoes_alvo_momento ON observacoes (alvo, momento);
+CREATE INDEX IF NOT EXISTS observacoes_momento ON observacoes (momento);
+
+CREATE TABLE IF NOT EXISTS envios_filiais (
+    alvo TEXT NOT NULL,
+    codigo TEXT NOT NULL,
+    momento REAL NOT NULL,
+    ultimo_envio REAL,
+    log TEXT
+);
+CREATE INDEX IF NOT EXISTS envios_filiais_alvo_codigo_momento ON envios_filiais (alvo, codigo, momento);
+CREATE INDEX IF NOT EXISTS envios_filiais_momento ON envios_filiais (momento);
+
+CREATE TABLE IF NOT EXISTS filiais_estado (
+    alvo TEXT NOT NULL,
+    codigo TEXT NOT NULL,
+    ultimo_envio REAL,
+    log TEXT,
+    PRIMARY KEY (alvo, codigo)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS resumo_horario (
+    alvo TEXT NOT NULL,
+    hora INTEGER NOT NULL,
+    amostras INTEGER NOT NULL,
+    problemas INTEGER NOT NULL,
+    atraso_medio REAL,
+    atraso_maximo REAL,
+    busca_media REAL,
+    total_medio REAL,
+    PRIMARY KEY (alvo, hora)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS tendencias (
+    alvo TEXT NOT NULL,
+    serie TEXT NOT NULL,
+    meia_vida REAL NOT NULL,
+    inicio REAL,
+    momento REAL,
+    peso REAL,
+    media_t REAL,
+    media_e REAL,
+    var_t REAL,
+    cov REAL,
+    PRIMARY KEY (alvo, serie)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor REAL
+) WITHOUT ROWID;
+"""
+
+
+class HistoricoSincronismo:
+    """Banco SQLite do histórico; uma conexão por instância (use ``with``)."""
+
+    def __init__(self, caminho=None, dias_brutos=DIAS_BRUTOS_PADRAO, dias_resumo=DIAS_RESUMO_PADRAO):
+        self.caminho = caminho or os.path.join(diretorio_cache(), ARQUIVO_HISTORICO)
+        self.dias_brutos = dias_brutos
+        self.dias_resumo = dias_resumo
+        self.conexao = sqlite3.connect(self.caminho, timeout=ESPERA_TRAVA_MS / 1000, isolation_level=None)
+        self.conexao.execute('PRAGMA journal_mode=WAL')
+        self.conexao.execute('PRAGMA synchronous=NORMAL')
+        if self.conexao.execute('PRAGMA user_version').fetchone()[0] != VERSAO_HISTORICO:
+            self.conexao.executescript(ESQUEMA)
+            self.conexao.execute(f'PRAGMA user_version={VERSAO_HISTORICO}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+    def fechar(self):
+        self.conexao.close()
+
+    def registrar(self, alvo, resultado, agora=None, meia_vida=None):
+        """Acrescenta a verificação (dicionário de ``executar_verificacao``) ao histórico.
+
+        Com ``meia_vida``, atualiza também as tendências do alvo e das filiais
+        e retorna o dicionário série -> TendenciaEnvio (vazio sem ``meia_vida``).
+        """
+        agora = time.time() if agora is None else agora
+        status_data = resultado.get('status_data') or {}
+        tempos = {fase: round(segundos, 4) for fase, segundos in (resultado.get('tempos') or {}).items()}
+        if resultado.get('fases'):
+            # A parede de cada fase já está em 'tempos' (a mesma medição); só o detalhe vai junto
+            tempos['fases'] = {fase: {chave: valor for chave, valor in dados.items() if chave != 'parede_s'}
+                               for fase, dados in resultado['fases'].items()}
+        logs_filial = status_data.get('logs_filial')
+
+        with self._transacao():
+            self.conexao.execute(
+                "INSERT INTO observacoes (momento, alvo, codigo, atraso_segundos, ultimo_envio, total_linhas,"
+                " mensagem, logs_filial, tempos) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (agora, alvo, resultado['codigo'], resultado.get('atraso_segundos'),
+                 epoca(resultado.get('ultimo_envio')), status_data.get('total_linhas'), resultado.get('saida'),
+                 json.dumps(logs_filial, ensure_ascii=False) if logs_filial else None,
+                 json.dumps(tempos) if tempos else None)
+            )
+            if status_data.get('filiais'):
+                self._registrar_filiais(alvo, status_data['filiais'], agora)
+            tendencias = self._atualizar_tendencias(alvo, resultado, agora, meia_vida) if meia_vida else {}
+            self._manter_se_devido(agora)
+        return tendencias
+
+    def _registrar_filiais(self, alvo, filiais, agora):
+        anteriores = {codigo: (envio, log) for codigo, envio, log in self.conexao.execute(
+            "SELECT codigo, ultimo_envio, log FROM filiais_estado WHERE alvo = ?", (alvo,))}
+        mudancas = []
+        for registro in filiais:
+            estado = (epoca(registro['ultimo_envio']), registro['log'] or None)
+            if anteriores.get(registro['codigo']) != estado:
+                mudancas.append((alvo, registro['codigo'], *estado))
+        if not mudancas:
+            return
+        self.conexao.executemany(
+            "INSERT INTO envios_filiais (alvo, codigo, momento, ultimo_envio, log) VALUES (?, ?, ?, ?, ?)",
+            [(alvo, codigo, agora, envio, log) for alvo, codigo, envio, log in mudancas]
+        )
+        self.conexao.executemany(
+            "INSERT OR REPLACE INTO filiais_estado (alvo, codigo, ultimo_envio, log) VALUES (?, ?, ?, ?)", mudancas
+        )
+
+    def _atualizar_tendencias(self, alvo, resultado, agora, meia_vida):
+        envios = envios_por_serie(resultado)
+        if not envios:
+            return {}
+        # Uma janela de outra meia-vida recomeça do zero
+        tendencias = {serie: TendenciaEnvio(*estado) for serie, janela, *estado in self.conexao.execute(
+            "SELECT serie, meia_vida, inicio, momento, peso, media_t, media_e, var_t, cov"
+            " FROM tendencias WHERE alvo = ?", (alvo,)) if janela == meia_vida}
+        for serie, envio in envios.items():
+            tendencias.setdefault(serie, TendenciaEnvio()).observar(agora, envio, meia_vida)
+        self.conexao.executemany(
+            "INSERT OR REPLACE INTO tendencias (alvo, serie, meia_vida, inicio, momento, peso, media_t, media_e,"
+            " var_t, cov) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(alvo, serie, meia_vida, *tendencias[serie].estado()) for serie in envios]
+        )
+        return {serie: tendencias[serie] for serie in envios}
+
+    def _manter_se_devido(self, agora):
+        linha = self.conexao.execute("SELECT valor FROM meta WHERE chave = 'ultima_manutencao'").fetchone()
+        if linha is None or agora - linha[0] >= INTERVALO_MANUTENCAO:
+            self._manter(agora)
+
+    def manter(self, agora=None):
+        """Agrega por hora as observações fora de ``dias_brutos`` e aplica a retenção."""
+        with self._transacao():
+            self._manter(time.time() if agora is None else agora)
+
+    def _manter(self, agora):
+        # Limite na virada da hora: cada hora é resumida uma única vez, completa
+        limite_brutos = int(agora - self.dias_brutos * 86400) // 3600 * 3600
+        limite_resumo = agora - self.dias_resumo * 86400
+        self.conexao.execute("""
+            INSERT INTO resumo_horario (alvo, hora, amostras, problemas, atraso_medio, atraso_maximo,
+                                        busca_media, total_medio)
+            SELECT alvo, CAST(momento / 3600 AS INTEGER) * 3600, COUNT(*), SUM(codigo != 0),
+                   AVG(atraso_segundos), MAX(atraso_segundos),
+                   AVG(json_extract(tempos, '$.busca')), AVG(json_extract(tempos, '$.total'))
+            FROM observacoes WHERE momento < ? GROUP BY 1, 2
+            ON CONFLICT (alvo, hora) DO NOTHING
+        """, (limite_brutos,))
+        self.conexao.execute("DELETE FROM observacoes WHERE momento < ?", (limite_brutos,))
+        self.conexao.execute("DELETE FROM resumo_horario WHERE hora < ?", (limite_resumo,))
+        self.conexao.execute("DELETE FROM envios_filiais WHERE momento < ?", (limite_resumo,))
+        # Filiais que saíram da vista
+        self.conexao.execute("DELETE FROM tendencias WHERE momento < ?", (limite_resumo,))
+        self.conexao.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('ultima_manutencao', ?)", (agora,))
+
+    @contextmanager
+    def _transacao(self):
+        # BEGIN IMMEDIATE: a trava de escrita é obtida de início (e esperada
+        # por até ESPERA_TRAVA_MS), sem falhas de upgrade no meio da transação
+        self.conexao.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self.conexao.execute('ROLLBACK')
+            raise
+        self.conexao.execute('COMMIT')
+
+    def alvos(self):
+        """Alvos com observações ou resumos, com o instante da última verificação."""
+        return self._dicionarios("""
+            SELECT alvo, MAX(momento) AS ultima FROM (
+                SELECT alvo, momento FROM observacoes UNION ALL SELECT alvo, hora FROM resumo_horario
+            ) GROUP BY alvo ORDER BY alvo
+        """)
+
+    def observacoes(self, alvo, desde=0, ate=None):
+        """Observações completas do alvo no intervalo, da mais antiga para a mais recente."""
+        registros = self._dicionarios(
+            "SELECT momento, codigo, atraso_segundos, ultimo_envio, total_linhas, mensagem, logs_filial, tempos"
+            " FROM observacoes WHERE alvo = ? AND momento >= ? AND momento <= ? ORDER BY momento",
+            (alvo, desde, float('inf') if ate is None else ate)
+        )
+        for registro in registros:
+            registro['logs_filial'] = json.loads(registro['logs_filial']) if registro['logs_filial'] else []
+            registro['tempos'] = json.loads(registro['tempos']) if registro['tempos'] else {}
+        return registros
+
+    def resumo(self, alvo, desde=0, ate=None):
+        """Resumo horário do alvo no intervalo (horas já fora da retenção bruta)."""
+        return self._dicionarios(
+            "SELECT hora, amostras, problemas, atraso_medio, atraso_maximo, busca_media, total_medio"
+            " FROM resumo_horario WHERE alvo = ? AND hora >= ? AND hora <= ? ORDER BY hora",
+            (alvo, desde, float('inf') if ate is None else ate)
+        )
+
+    def envios_filial(self, alvo, codigo, desde=0, ate=None):
+        """Mudanças de último envio e de log da filial no intervalo."""
+        return self._dicionarios(
+            "SELECT momento, ultimo_envio, log FROM envios_filiais"
+            " WHERE alvo = ? AND codigo = ? AND momento >= ? AND momento <= ? ORDER BY momento",
+            (alvo, codigo, desde, float('inf') if ate is None else ate)
+        )
+
+    def _dicionarios(self, sql, parametros=()):
+        cursor = self.conexao.execute(sql, parametros)
+        colunas = [descricao[0] for descricao in cursor.description]
+        return [dict(zip(colunas, linha)) for linha in cursor]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta o histórico local das verificações de sincronismo.")
+    parser.add_argument('--db', default=os.getenv('HISTORY_DB'), help="Arquivo do histórico (padrão: cache/historico.sqlite3).")
+    parser.add_argument('--alvos', action='store_true', help="Lista os alvos registrados.")
+    parser.add_argument('--alvo', help="Alvo consultado (usuario@url, como em --alvos).")
+    parser.add_argument('--filial', help="Código da filial: lista as mudanças de último envio e log.")
+    parser.add_argument('--resumo', action='store_true', help="Lista o resumo horário em vez das observações.")
+    parser.add_argument('--horas', type=float, default=24, help="Janela consultada, em horas até agora.")
+    args = parser.parse_args()
+
+    if not args.alvos and not args.alvo:
+        parser.error("informe --alvos ou --alvo")
+    desde = time.time() - args.horas * 3600
+    with HistoricoSincronismo(args.db) as historico:
+        if args.alvos:
+            registros = historico.alvos()
+        elif args.filial:
+            registros = historico.envios_filial(args.alvo, args.filial, desde)
+        elif args.resumo:
+            registros = historico.resumo(args.alvo, desde)
+        else:
+            registros = historico.observacoes(args.alvo, desde)
+    for registro in registros:
+        print(json.dumps(registro, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""Log em arquivo diário gravado fora do caminho da verificação.
+
+O Zabbix executa várias verificações ao mesmo tempo, e cada uma gravava e
+rotacionava o mesmo ``logs/g70k_`` à meia-noite: o ``TimedRotatingFileHandler``
+renomeia o arquivo por processo, e as gravações síncronas em disco ficavam
+dentro do tempo da verificação. Aqui:
+
+- o logger só enfileira os registros (``QueueHandler``); uma thread
+  (``QueueListener``) os grava e é drenada na saída do processo;
+- cada dia tem o seu arquivo (``g70k_.AAAA-MM-DD``), aberto com ``O_APPEND``
+  e gravado com um ``write()`` por registro: vários processos acrescentam
+  linhas inteiras ao mesmo arquivo e nenhum precisa renomeá-lo;
+- os dias encerrados são comprimidos (``.gz``) e os mais antigos que a
+  retenção removidos fora das verificações: por uma thread do daemon
+  residente ou por ``python log_sincronismo.py logs/`` (timer do systemd ou
+  cron); um processo por vez (``flock``) e uma tentativa por dia, com falhas
+  registradas no próprio log. Uma verificação avulsa não comprime nada: o
+  Zabbix mede o tempo até a saída do processo;
+- o ``logs/g70k_`` da versão anterior é movido para o arquivo do dia da sua
+  última gravação.
+
+No daemon, o processo residente é o único gravador dos registros das suas threads.
+"""
+
+import os
+import sys
+import time
+import fcntl
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+logger = logging.getLogger('zabbix_erp_sincronismo')
+
+PREFIXO_ARQUIVO = 'g70k_.'
+FORMATO_DIA = '%Y-%m-%d'
+FORMATO_LOG = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Dias de log mantidos (comprimidos ou não)
+DIAS_RETENCAO_PADRAO = 30
+
+# Segundos sem gravação antes de comprimir o arquivo de um dia encerrado: uma
+# verificação iniciada antes da meia-noite ainda pode estar terminando
+CARENCIA_COMPRESSAO = 300
+
+# Intervalo (segundos) entre as consultas da thread de manutenção do daemon
+INTERVALO_MANUTENCAO = 3600
+
+# Trava da manutenção; guarda o dia da última tentativa
+ARQUIVO_TRAVA = '.manutencao.lock'
+
+# Arquivo único das versões com TimedRotatingFileHandler (os dias já
+# rotacionados por ele têm o mesmo nome dos atuais)
+ARQUIVO_LEGADO = 'g70k_'
+
+
+class ArquivoDiario(logging.Handler):
+    """Grava cada registro no arquivo do dia, sem renomear arquivos."""
+
+    def __init__(self, diretorio, prefixo=PREFIXO_ARQUIVO):
+        super().__init__()
+        self.diretorio = diretorio
+        self.prefixo = prefixo
+        self.dia = None
+        self.arquivo = None
+
+    def caminho(self, dia):
+        return os.path.join(self.diretorio, f"{self.prefixo}{dia}")
+
+    def emit(self, record):
+        try:
+            dia = time.strftime(FORMATO_DIA, time.localtime(record.created))
+            if dia != self.dia:
+                self._abrir(dia)
+            # Sem buffer: cada registro é um único write() no fim do arquivo
+            self.arquivo.write(f"{self.format(record)}\n".encode('utf-8'))
+        except Exception:
+            self.handleError(record)
+
+    def _abrir(self, dia):
+        if self.arquivo is not None:
+            self.arquivo.close()
+        os.makedirs(self.diretorio, exist_ok=True)
+        self.arquivo = open(self.caminho(dia), 'ab', buffering=0)
+        self.dia = dia
+
+    def close(self):
+        self.acquire()
+        try:
+            if self.arquivo is not None:
+                self.arquivo.close()
+                self.arquivo = None
+        finally:
+            self.release()
+        super().close()
+
+
+class OuvinteLog(QueueListener):
+    """QueueListener que pode ser parado mais de uma vez (pelo código e pelo atexit)."""
+
+    parado = False
+
+    def stop(self):
+        if not self.parado:
+            self.parado = True
+            super().stop()
+
+
+def _dia_do_arquivo(nome, prefixo):
+    """Data (struct_time) do nome ``<prefixo>AAAA-MM-DD[.gz]`` ou None."""
+    if not nome.startswith(prefixo):
+        return None
+    try:
+        return time.strptime(nome[len(prefixo):].removesuffix('.gz'), FORMATO_DIA)
+    except ValueError:
+        return None
+
+
+def arquivos_pendentes(diretorio, prefixo=PREFIXO_ARQUIVO, dias_retencao=DIAS_RETENCAO_PADRAO, agora=None):
+    """Retorna (a comprimir, a remover): caminhos de dias encerrados e de dias fora da retenção."""
+    agora = time.time() if agora is None else agora
+    hoje = time.strftime(FORMATO_DIA, time.localtime(agora))
+    limite = time.strftime(FORMATO_DIA, time.localtime(agora - dias_retencao * 86400))
+    comprimir, remover = [], []
+    try:
+        entradas = list(os.scandir(diretorio))
+    except FileNotFoundError:
+        return comprimir, remover
+    for entrada in entradas:
+        if entrada.name.startswith(prefixo) and entrada.name.endswith('.gz.tmp'):
+            # Compressão interrompida pelo fim do processo
+            remover.append(entrada.path)
+            continue
+        data = _dia_do_arquivo(entrada.name, prefixo)
+        if data is None:
+            continue
+        dia = time.strftime(FORMATO_DIA, data)
+        if dia < limite:
+            remover.append(entrada.path)
+        elif (dia < hoje and not entrada.name.endswith('.gz')
+              and entrada.stat().st_mtime < agora - CARENCIA_COMPRESSAO):
+            comprimir.append(entrada.path)
+    return sorted(comprimir), sorted(remover)
+
+
+def comprimir_arquivo(caminho):
+    """Comprime ``caminho`` em ``caminho.gz`` (via arquivo temporário) e remove o original."""
+    import gzip
+    import shutil
+
+    temporario = f"{caminho}.gz.tmp"
+    with open(caminho, 'rb') as origem, gzip.open(temporario, 'wb') as destino:
+        shutil.copyfileobj(origem, destino)
+    shutil.copystat(caminho, temporario)
+    os.replace(temporario, f"{caminho}.gz")
+    os.unlink(caminho)
+
+
+def migrar_legado(diretorio, prefixo=PREFIXO_ARQUIVO, agora=None):
+    """Move ``logs/g70k_`` para o arquivo do dia da sua última gravação.
+
+    Se o dia já tem arquivo, o conteúdo é acrescentado a ele (como mais um
+    membro gzip, se já comprimido). Retorna o caminho de destino ou None.
+    """
+    import gzip
+    import shutil
+
+    agora = time.time() if agora is None else agora
+    caminho = os.path.join(diretorio, ARQUIVO_LEGADO)
+    try:
+        modificado = os.stat(caminho).st_mtime
+    except FileNotFoundError:
+        return None
+    # Uma verificação da versão anterior ainda pode estar gravando
+    if modificado >= agora - CARENCIA_COMPRESSAO:
+        return None
+    destino = os.path.join(diretorio, f"{prefixo}{time.strftime(FORMATO_DIA, time.localtime(modificado))}")
+    if os.path.exists(f"{destino}.gz"):
+        with open(caminho, 'rb') as origem, gzip.open(f"{destino}.gz", 'ab') as saida:
+            shutil.copyfileobj(origem, saida)
+    elif os.path.exists(destino):
+        with open(caminho, 'rb') as origem, open(destino, 'ab') as saida:
+            shutil.copyfileobj(origem, saida)
+    else:
+        os.rename(caminho, destino)
+        return destino
+    os.unlink(caminho)
+    return destino
+
+
+def manter_logs(diretorio, prefixo=PREFIXO_ARQUIVO, dias_retencao=DIAS_RETENCAO_PADRAO, agora=None):
+    """Migra o arquivo legado, comprime os dias encerrados e remove os fora da retenção.
+
+    Só um processo faz a manutenção por vez; os demais retornam False sem
+    esperar. O dia da tentativa fica na trava mesmo quando ela falha.
+    """
+    agora = time.time() if agora is None else agora
+    with open(os.path.join(diretorio, ARQUIVO_TRAVA), 'a+') as trava:
+        try:
+            fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        try:
+            migrar_legado(diretorio, prefixo, agora)
+            comprimir, remover = arquivos_pendentes(diretorio, prefixo, dias_retencao, agora)
+            for caminho in remover:
+                os.unlink(caminho)
+            for caminho in comprimir:
+                comprimir_arquivo(caminho)
+        finally:
+            trava.truncate(0)
+            trava.write(time.strftime(FORMATO_DIA, time.localtime(agora)))
+    return True
+
+
+def ultima_manutencao(diretorio):
+    """Dia (``AAAA-MM-DD``) da última tentativa de manutenção, ou None."""
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_TRAVA), encoding='utf-8') as trava:
+            return trava.read().strip() or None
+    except OSError:
+        return None
+
+
+def manter_se_pendente(diretorio, agora=None):
+    """Roda ``manter_logs`` se há arquivos pendentes e ainda não houve tentativa no dia.
+
+    Uma falha é registrada no log e conta como a tentativa do dia: os
+    arquivos ficam como estão até o dia seguinte. Retorna True se a
+    manutenção rodou.
+    """
+    agora = time.time() if agora is None else agora
+    if ultima_manutencao(diretorio) == time.strftime(FORMATO_DIA, time.localtime(agora)):
+        return False
+    if not (os.path.exists(os.path.join(diretorio, ARQUIVO_LEGADO)) or any(arquivos_pendentes(diretorio, agora=agora))):
+        return False
+    try:
+        return manter_logs(diretorio, agora=agora)
+    except Exception:
+        logger.exception("Falha na manutenção dos logs em %s", diretorio)
+        return False
+
+
+def iniciar_manutencao(diretorio, intervalo=INTERVALO_MANUTENCAO):
+    """Inicia no processo residente uma thread que chama ``manter_se_pendente`` a cada ``intervalo``.
+
+    A thread é daemon: se o processo terminar no meio de uma compressão, o
+    ``.gz.tmp`` que sobra é removido pela próxima manutenção. Retorna o
+    ``threading.Event`` que a encerra.
+    """
+    parar = threading.Event()
+
+    def executar():
+        while True:
+            manter_se_pendente(diretorio)
+            if parar.wait(intervalo):
+                return
+
+    threading.Thread(target=executar, name='manutencao-logs', daemon=True).start()
+    return parar
+
+
+def iniciar_log_em_fila(logger, diretorio, prefixo=PREFIXO_ARQUIVO):
+    """Liga ao ``logger`` um QueueHandler cuja thread grava em ``ArquivoDiario``.
+
+    A thread é parada (e a fila drenada) na saída do processo. Retorna o OuvinteLog.
+    """
+    fila = queue.SimpleQueue()
+    arquivo = ArquivoDiario(diretorio, prefixo)
+    arquivo.setFormatter(logging.Formatter(FORMATO_LOG))
+    ouvinte = OuvinteLog(fila, arquivo)
+    ouvinte.start()
+    atexit.register(ouvinte.stop)
+    logger.addHandler(QueueHandler(fila))
+    return ouvinte
+
+
+if __name__ == "__main__":
+    manter_logs(sys.argv[1])
@@ -0,0 +1,255 @@
+"""Exportador de métricas Prometheus/OpenMetrics do daemon de sincronismo.
+
+O daemon registra aqui o resultado de cada verificação e um servidor HTTP
+opcional expõe ``/metrics``. A coleta (scrape) só lê o que já foi guardado:
+nenhuma requisição ao ERP é feita por ela. Os atrasos são recalculados no
+momento da coleta a partir do último envio analisado.
+
+Usa apenas a biblioteca padrão. O formato de texto do Prometheus (0.0.4) é o
+padrão; clientes que pedem ``application/openmetrics-text`` recebem OpenMetrics.
+"""
+
+import time
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from previsao_sincronismo import epoca
+
+logger = logging.getLogger('zabbix_erp_sincronismo')
+
+# Limites (segundos) dos buckets dos histogramas de duração das fases
+BUCKETS_DURACAO_PADRAO = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Fases de executar_verificacao observadas nos histogramas
+FASES_HISTOGRAMA = ('login', 'busca', 'analise', 'total')
+
+TIPO_PROMETHEUS = 'text/plain; version=0.0.4; charset=utf-8'
+TIPO_OPENMETRICS = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+def _escapar_rotulo(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(**rotulos):
+    if not rotulos:
+        return ''
+    return '{' + ','.join(f'{nome}="{_escapar_rotulo(valor)}"' for nome, valor in rotulos.items()) + '}'
+
+
+def _numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    if isinstance(valor, float) and valor.is_integer() and abs(valor) < 1e15:
+        return str(int(valor))
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+class Histograma:
+    """Histograma cumulativo no formato do Prometheus (buckets, soma e contagem)."""
+
+    def __init__(self, buckets=BUCKETS_DURACAO_PADRAO):
+        self.buckets = tuple(sorted(buckets))
+        self.contagens = [0] * len(self.buckets)
+        self.soma = 0.0
+        self.contagem = 0
+
+    def observar(self, valor):
+        """Registra uma observação."""
+        self.soma += valor
+        self.contagem += 1
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.contagens[i] += 1
+
+    def amostras(self):
+        """Lista (le, contagem acumulada), terminando em +Inf."""
+        return list(zip(self.buckets, self.contagens)) + [(float('inf'), self.contagem)]
+
+
+class MetricasSincronismo:
+    """Último estado de cada alvo e estatísticas acumuladas desde o início do daemon.
+
+    ``contadores`` é o dicionário vivo de contadores de autenticação do processo
+    (``check_sincronismo.contadores_autenticacao``), copiado a cada coleta sob
+    ``lock_contadores``, a mesma trava usada por quem o atualiza.
+    """
+
+    def __init__(self, contadores=None, buckets=BUCKETS_DURACAO_PADRAO, lock_contadores=None):
+        self.contadores = contadores if contadores is not None else {}
+        self.lock_contadores = lock_contadores or threading.Lock()
+        self.duracoes = {fase: Histograma(buckets) for fase in FASES_HISTOGRAMA}
+        self.alvos = {}
+        self.verificacoes = {}
+        self.lock = threading.Lock()
+
+    def registrar(self, base_url, username, resultado, agora=None):
+        """Guarda o resultado de uma verificação do alvo e observa as durações."""
+        agora = agora or time.time()
+        with self.lock:
+            alvo = self.alvos.setdefault((base_url, username), {'status_data': None, 'analisado_em': None})
+            alvo['codigo'] = resultado['codigo']
+            alvo['verificado_em'] = agora
+            # Sem dados analisados não há previsão nova; a antiga deixaria de valer
+            alvo['previsao'] = resultado.get('previsao')
+            if resultado.get('status_data'):
+                # Falhas não apagam a última grade analisada; o timestamp mostra a idade
+                alvo['status_data'] = resultado['status_data']
+                alvo['ultimo_envio'] = resultado.get('ultimo_envio')
+                alvo['analisado_em'] = agora
+
+            status = 'ok' if resultado['codigo'] == 0 else 'problema'
+            chave = (base_url, username, status)
+            self.verificacoes[chave] = self.verificacoes.get(chave, 0) + 1
+
+            for fase, segundos in (resultado.get('tempos') or {}).items():
+                if fase in self.duracoes:
+                    self.duracoes[fase].observar(segundos)
+
+    def renderizar(self, openmetrics=False, agora=None):
+        """Gera o texto da exposição com o estado guardado (não consulta o ERP)."""
+        agora = agora or time.time()
+        familias = []
+
+        def familia(nome, tipo, ajuda, amostras):
+            familias.append((nome, tipo, ajuda, amostras))
+
+        # Cópia antes da trava das métricas: as verificações incrementam os
+        # contadores sob a trava delas enquanto a coleta renderiza
+        with self.lock_contadores:
+            contadores = dict(self.contadores)
+
+        with self.lock:
+            up, status_ok, verificado, analisado, atraso, linhas = [], [], [], [], [], []
+            filial_atraso, filial_envio, filial_log = [], [], []
+            ate_limite, alerta, taxa, filial_ate_limite = [], [], [], []
+            for (base_url, username), alvo in sorted(self.alvos.items()):
+                r = {'alvo': base_url, 'usuario': username}
+                up.append(('', r, 1 if alvo['analisado_em'] == alvo['verificado_em'] else 0))
+                status_ok.append(('', r, 1 if alvo['codigo'] == 0 else 0))
+                verificado.append(('', r, alvo['verificado_em']))
+                previsao = alvo.get('previsao')
+                if previsao:
+                    decorrido = agora - alvo['verificado_em']
+                    alerta.append(('', r, 1 if previsao['status'] == 'ALERTA' else 0))
+                    if previsao['taxa_avanco'] is not None:
+                        taxa.append(('', r, previsao['taxa_avanco']))
+                    if previsao['status'] != 'INDISPONIVEL':
+                        ate_limite.append(('', r, self._ate_limite(previsao, decorrido)))
+                    for codigo, filial in sorted(previsao['filiais'].items()):
+                        if filial['status'] != 'INDISPONIVEL':
+                            filial_ate_limite.append(('', dict(r, codigo=codigo), self._ate_limite(filial, decorrido)))
+                if alvo['status_data'] is None:
+                    continue
+                analisado.append(('', r, alvo['analisado_em']))
+                linhas.append(('', r, alvo['status_data'].get('total_linhas') or 0))
+                momento = epoca(alvo.get('ultimo_envio'))
+                if momento is not None:
+                    atraso.append(('', r, round(agora - momento, 3)))
+                for codigo, filial in self._filiais(alvo['status_data']).items():
+                    rf = dict(r, codigo=codigo, filial=filial['filial'])
+                    filial_log.append(('', rf, 1 if filial['problema_log'] else 0))
+                    if filial['ultimo_envio'] is not None:
+                        filial_envio.append(('', rf, filial['ultimo_envio']))
+                        filial_atraso.append(('', rf, round(agora - filial['ultimo_envio'], 3)))
+
+            familia('erp_sincronismo_up', 'gauge', 'A ultima verificacao do alvo leu a vista de sincronismo', up)
+            familia('erp_sincronismo_status_ok', 'gauge', 'A ultima verificacao do alvo terminou em STATUS_OK', status_ok)
+            familia('erp_sincronismo_ultima_verificacao_timestamp_seconds', 'gauge', 'Instante da ultima verificacao do alvo', verificado)
+            familia('erp_sincronismo_ultima_analise_timestamp_seconds', 'gauge', 'Instante da ultima grade analisada com sucesso', analisado)
+            familia('erp_sincronismo_atraso_seconds', 'gauge', 'Atraso do ultimo envio da vista ate a coleta', atraso)
+            familia('erp_sincronismo_linhas_grade', 'gauge', 'Linhas de dados na ultima grade analisada', linhas)
+            familia('erp_sincronismo_filial_atraso_seconds', 'gauge', 'Atraso do ultimo envio da filial ate a coleta', filial_atraso)
+            familia('erp_sincronismo_filial_ultimo_envio_timestamp_seconds', 'gauge', 'Instante do ultimo envio da filial', filial_envio)
+            familia('erp_sincronismo_filial_problema_log', 'gauge', 'Coluna Log Filial p/ Sinc. com conteudo na filial', filial_log)
+            familia('erp_sincronismo_tempo_ate_limite_seconds', 'gauge', 'Tempo previsto ate o atraso passar do max-delay (+Inf se nao cresce)', ate_limite)
+            familia('erp_sincronismo_previsao_alerta', 'gauge', 'A previsao do atraso esta em ALERTA (estouro dentro do horizonte)', alerta)
+            familia('erp_sincronismo_taxa_avanco', 'gauge', 'Segundos de ultimo envio avancados por segundo de relogio na janela movel', taxa)
+            familia('erp_sincronismo_filial_tempo_ate_limite_seconds', 'gauge', 'Tempo previsto ate o atraso da filial passar do max-delay (+Inf se nao cresce)', filial_ate_limite)
+            familia('erp_sincronismo_verificacoes', 'counter', 'Verificacoes executadas pelo daemon por resultado', [
+                ('_total', {'alvo': u, 'usuario': n, 'status': s}, q) for (u, n, s), q in sorted(self.verificacoes.items())
+            ])
+            familia('erp_sincronismo_autenticacoes', 'counter', 'Logins, relogins e buscas da vista desde o inicio do daemon', [
+                ('_total', {'tipo': tipo}, quantidade) for tipo, quantidade in sorted(contadores.items())
+            ])
+            duracoes = []
+            for fase, histograma in self.duracoes.items():
+                for le, quantidade in histograma.amostras():
+                    duracoes.append(('_bucket', {'fase': fase, 'le': '+Inf' if le == float('inf') else repr(float(le))}, quantidade))
+                duracoes.append(('_sum', {'fase': fase}, round(histograma.soma, 6)))
+                duracoes.append(('_count', {'fase': fase}, histograma.contagem))
+            familia('erp_sincronismo_fase_duracao_seconds', 'histogram', 'Duracao das fases da verificacao', duracoes)
+
+        linhas_saida = []
+        for nome, tipo, ajuda, amostras in familias:
+            # No formato 0.0.4 o TYPE de um contador leva o sufixo _total
+            nome_tipo = f"{nome}_total" if tipo == 'counter' and not openmetrics else nome
+            linhas_saida.append(f"# HELP {nome_tipo} {ajuda}")
+            linhas_saida.append(f"# TYPE {nome_tipo} {tipo}")
+            for sufixo, rotulos, valor in amostras:
+                linhas_saida.append(f"{nome}{sufixo}{_rotulos(**rotulos)} {_numero(valor)}")
+        if openmetrics:
+            linhas_saida.append('# EOF')
+        return '\n'.join(linhas_saida) + '\n'
+
+    @staticmethod
+    def _ate_limite(previsao, decorrido):
+        """Tempo até o limite descontado o tempo desde a verificação (a previsão é linear no relógio)."""
+        if previsao['tempo_ate_limite_s'] is None:
+            return float('inf')
+        return round(max(0.0, previsao['tempo_ate_limite_s'] - decorrido), 1)
+
+    @staticmethod
+    def _filiais(status_data):
+        """Agrupa as linhas da grade por código de filial (rótulos únicos por série)."""
+        filiais = {}
+        for registro in status_data.get('filiais', []):
+            filial = filiais.setdefault(registro['codigo'], {
+                'filial': registro['filial'], 'ultimo_envio': None, 'problema_log': False,
+            })
+            filial['problema_log'] = filial['problema_log'] or bool(registro.get('log'))
+            momento = epoca(registro.get('ultimo_envio'))
+            if momento is not None and (filial['ultimo_envio'] is None or momento > filial['ultimo_envio']):
+                filial['ultimo_envio'] = momento
+        return filiais
+
+
+class ManipuladorMetricas(BaseHTTPRequestHandler):
+    """Atende GET /metrics com o estado guardado em ``server.metricas``."""
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+        corpo = self.server.metricas.renderizar(openmetrics=openmetrics).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', TIPO_OPENMETRICS if openmetrics else TIPO_PROMETHEUS)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        logger.debug(f"Métricas: {self.address_string()} {formato % args}")
+
+
+class ServidorMetricas(ThreadingHTTPServer):
+    """Servidor HTTP do endpoint /metrics, executado em uma thread do daemon."""
+
+    daemon_threads = True
+
+    def __init__(self, metricas, endereco='127.0.0.1', porta=9464):
+        self.metricas = metricas
+        super().__init__((endereco, porta), ManipuladorMetricas)
+
+    def iniciar(self):
+        """Atende as coletas em segundo plano."""
+        threading.Thread(target=self.serve_forever, name='metricas', daemon=True).start()
+        logger.info(f"Métricas Prometheus em http://{self.server_address[0]}:{self.server_address[1]}/metrics")
+        return self
+
+    def encerrar(self):
+        """Para de atender e fecha o socket."""
+        self.shutdown()
+        self.server_close()
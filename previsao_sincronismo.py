@@ -0,0 +1,157 @@
+"""Previsão do atraso do sincronismo a partir do histórico de últimos envios.
+
+A verificação compara o atraso atual com ``--max-delay`` e só alerta depois
+que o limite foi ultrapassado. Com ``--forecast``, cada verificação também
+estima a que taxa o último envio de cada filial (e do alvo) avança em relação
+ao relógio:
+
+- taxa 1: o ERP acompanha o relógio e o atraso fica estável;
+- taxa abaixo de 1: o atraso cresce ``1 - taxa`` segundos por segundo;
+- taxa 0: o sincronismo parou e o atraso cresce com o relógio.
+
+A taxa é a inclinação de uma regressão linear do último envio contra o
+instante da verificação, com pesos que caem pela metade a cada
+``--forecast-window`` segundos (janela móvel exponencial). O estado de cada
+série são seis números atualizados em O(1) por verificação e guardados no
+histórico (tabela ``tendencias``): o custo não depende de quantos meses de
+observações existem. O tempo até o limite é ``(limite - atraso) / (1 - taxa)``
+e, quando cabe no ``--forecast-horizon``, a previsão fica em ALERTA antes de a
+verificação virar STATUS_PROBLEMA.
+"""
+
+from datetime import datetime
+
+# Meia-vida (segundos) dos pesos da janela móvel
+MEIA_VIDA_PADRAO = 3600
+
+# Antecedência (segundos) com que um estouro previsto vira ALERTA
+HORIZONTE_PADRAO = 1800
+
+# Série do alvo inteiro (último envio da vista), ao lado das séries por filial
+SERIE_ALVO = ''
+
+STATUS_PREVISAO_OK = 'OK'
+STATUS_PREVISAO_ALERTA = 'ALERTA'
+STATUS_PREVISAO_EXCEDIDO = 'EXCEDIDO'
+# Janela ainda sem uma meia-vida de observações
+STATUS_PREVISAO_INDISPONIVEL = 'INDISPONIVEL'
+
+
+def epoca(momento_iso):
+    """Segundos desde a época de um instante ISO 8601 (horário local do ERP), ou None.
+
+    Usada também pelo histórico e pelas métricas.
+    """
+    if not momento_iso:
+        return None
+    try:
+        return datetime.fromisoformat(momento_iso).timestamp()
+    except ValueError:
+        return None
+
+
+def envios_por_serie(resultado):
+    """Último envio (época) do alvo e de cada código de filial de um resultado analisado."""
+    status_data = resultado.get('status_data') or {}
+    envios = {}
+    if resultado.get('ultimo_envio'):
+        envios[SERIE_ALVO] = epoca(resultado['ultimo_envio'])
+    for registro in status_data.get('filiais', []):
+        momento = epoca(registro.get('ultimo_envio'))
+        if momento is not None and momento > envios.get(registro['codigo'], float('-inf')):
+            envios[registro['codigo']] = momento
+    return envios
+
+
+class TendenciaEnvio:
+    """Regressão linear do último envio contra o tempo, com esquecimento exponencial.
+
+    Atualização incremental (ponderada, no estilo de Welford): médias e somas
+    de desvios são corrigidas a cada observação e multiplicadas pelo fator de
+    decaimento do intervalo desde a anterior. Os desvios são relativos às
+    médias, o que mantém a precisão com instantes na casa de 10^9.
+    """
+
+    __slots__ = ('inicio', 'momento', 'peso', 'media_t', 'media_e', 'var_t', 'cov')
+
+    def __init__(self, inicio=None, momento=None, peso=0.0, media_t=0.0, media_e=0.0, var_t=0.0, cov=0.0):
+        self.inicio = inicio
+        self.momento = momento
+        self.peso = peso
+        self.media_t = media_t
+        self.media_e = media_e
+        self.var_t = var_t
+        self.cov = cov
+
+    def estado(self):
+        """Tupla com o estado completo, na ordem do construtor."""
+        return tuple(getattr(self, campo) for campo in self.__slots__)
+
+    def observar(self, momento, ultimo_envio, meia_vida=MEIA_VIDA_PADRAO):
+        """Acrescenta a observação; instantes repetidos ou fora de ordem são ignorados."""
+        if self.momento is not None:
+            if momento <= self.momento:
+                return
+            fator = 0.5 ** ((momento - self.momento) / meia_vida)
+            self.peso *= fator
+            self.var_t *= fator
+            self.cov *= fator
+        else:
+            self.inicio = momento
+        self.momento = momento
+        self.peso += 1.0
+        desvio_t = momento - self.media_t
+        self.media_t += desvio_t / self.peso
+        self.media_e += (ultimo_envio - self.media_e) / self.peso
+        self.var_t += desvio_t * (momento - self.media_t)
+        self.cov += desvio_t * (ultimo_envio - self.media_e)
+
+    def taxa(self, meia_vida=MEIA_VIDA_PADRAO):
+        """Segundos de envio por segundo de relógio, ou None antes de uma meia-vida de dados.
+
+        Com menos que uma meia-vida, a janela pode não cobrir nem o intervalo
+        entre dois envios e a inclinação seria a de um único degrau.
+        """
+        if self.momento is None or self.momento - self.inicio < meia_vida or self.var_t <= 0:
+            return None
+        return self.cov / self.var_t
+
+
+def prever(tendencia, atraso, limite, horizonte=HORIZONTE_PADRAO, meia_vida=MEIA_VIDA_PADRAO):
+    """Previsão de uma série: status, taxa de avanço e segundos até o atraso passar do limite.
+
+    ``tempo_ate_limite_s`` é None quando o atraso não cresce (taxa >= 1) ou
+    não há dados suficientes, e 0 quando o limite já foi ultrapassado.
+    """
+    taxa = tendencia.taxa(meia_vida)
+    if atraso > limite:
+        status, tempo = STATUS_PREVISAO_EXCEDIDO, 0.0
+    elif taxa is None:
+        status, tempo = STATUS_PREVISAO_INDISPONIVEL, None
+    elif taxa >= 1:
+        status, tempo = STATUS_PREVISAO_OK, None
+    else:
+        tempo = (limite - atraso) / (1 - taxa)
+        status = STATUS_PREVISAO_ALERTA if tempo <= horizonte else STATUS_PREVISAO_OK
+    return {
+        'status': status,
+        'tempo_ate_limite_s': None if tempo is None else round(tempo, 1),
+        'taxa_avanco': None if taxa is None else round(taxa, 4),
+    }
+
+
+def prever_resultado(tendencias, resultado, limite, horizonte=HORIZONTE_PADRAO, meia_vida=MEIA_VIDA_PADRAO, agora=None):
+    """Previsão do alvo e de cada filial a partir das tendências atualizadas na verificação.
+
+    ``tendencias`` é o dicionário série -> TendenciaEnvio devolvido por
+    ``HistoricoSincronismo.registrar``. Retorna None sem dados analisados.
+    """
+    envios = envios_por_serie(resultado)
+    if SERIE_ALVO not in envios or SERIE_ALVO not in tendencias:
+        return None
+    agora = datetime.now().timestamp() if agora is None else agora
+    previsoes = {serie: prever(tendencias[serie], agora - envio, limite, horizonte, meia_vida)
+                 for serie, envio in envios.items() if serie in tendencias}
+    previsao = previsoes.pop(SERIE_ALVO)
+    previsao.update(limite_s=limite, horizonte_s=horizonte, filiais=previsoes)
+    return previsao
@@ -33,8 +33,12 @@ else
     cd "$PROJECT_DIR"
 fi
 
-# 3. Configurar ambiente Python com uv (uv run fara isso automaticamente)
-echo "Configurando ambiente Python (uv run cuidara disso)..."
+# 3. Construir o ambiente Python pre-compilado usado pelo wrapper
+# (sem ele, o wrapper recorre ao uv run a cada coleta)
+echo "Configurando ambiente Python..."
+if ! bash construir_ambiente.sh; then
+    echo "AVISO: Nao foi possivel construir o ambiente em .venv; o wrapper usara uv run."
+fi
 
 # 4. Configurar senha no .env (simplificado - sem criptografia)
 echo "Configurando senha no arquivo .env..."
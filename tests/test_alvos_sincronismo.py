@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Testes da configuração de vários alvos e da verificação em paralelo.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import Mock, patch
+
+# Adiciona o diretório pai ao path para importar os módulos
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import check_sincronismo
+from alvos_sincronismo import carregar_alvos, identidade_alvo, ConfiguracaoError
+from check_sincronismo import (
+    verificar_alvos, formatar_relatorio, select_empresa, get_sync_status_page, ERPLoginError, STATUS_OK
+)
+
+CONFIGURACAO = """
+[padrao]
+usuario = "MONITOR"
+max_delay = 300
+vista = { filial = "2" }
+
+[[alvo]]
+nome = "matriz"
+url = "http://erp1:8080/"
+
+[[alvo]]
+nome = "empresa-22"
+url = "http://erp2:8080"
+senha_env = "ERP2_SENHA"
+max_delay = 600
+vista = { empresa = "22", svistaaba = "3000" }
+"""
+
+
+def _resultado(codigo=0, saida=STATUS_OK, filiais=None):
+    status_data = None if filiais is None else {'filiais': filiais, 'logs_filial': [], 'total_linhas': len(filiais)}
+    return {'codigo': codigo, 'saida': saida, 'token': None, 'status_data': status_data,
+            'atraso_segundos': None, 'ultimo_envio': None, 'tempos': {}}
+
+
+class TestConfiguracaoAlvos(unittest.TestCase):
+    """Testes da leitura e validação do arquivo TOML."""
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'ERP2_SENHA': 'senha2', 'SINCRONISMO_CACHE_DIR': self.diretorio})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def _arquivo(self, conteudo):
+        caminho = os.path.join(self.diretorio, 'alvos.toml')
+        with open(caminho, 'w', encoding='utf-8') as f:
+            f.write(conteudo)
+        return caminho
+
+    def test_alvos_herdam_padroes(self):
+        """Campos ausentes vêm de [padrao] e do .env; a vista é mesclada."""
+        alvos = carregar_alvos(self._arquivo(CONFIGURACAO), {'senha': 'senha_env', 'max_delay': 120})
+
+        self.assertEqual([a['nome'] for a in alvos], ['matriz', 'empresa-22'])
+        matriz, empresa = alvos
+        self.assertEqual(matriz['url'], 'http://erp1:8080')
+        self.assertEqual((matriz['usuario'], matriz['senha'], matriz['max_delay']), ('MONITOR', 'senha_env', 300))
+        self.assertEqual(matriz['vista'], {'filial': '2'})
+        self.assertEqual((empresa['senha'], empresa['max_delay']), ('senha2', 600))
+        self.assertEqual(empresa['vista'], {'filial': '2', 'empresa': '22', 'svistaaba': '3000'})
+        self.assertNotEqual(identidade_alvo(matriz), identidade_alvo(empresa))
+
+    def test_configuracao_invalida(self):
+        """Nomes repetidos, campos desconhecidos e senha ausente são recusados."""
+        casos = [
+            '[[alvo]]\nnome = "a"\nurl = "http://x"\n[[alvo]]\nnome = "a"\nurl = "http://y"\n',
+            '[[alvo]]\nurl = "http://x"\nporta = 1\n',
+            '[[alvo]]\nurl = "http://x"\nvista = { aba = "1" }\n',
+            '[[alvo]]\nurl = "http://x"\nvista = "1"\n',
+            '[[alvo]]\nurl = "http://x"\nvista = ["1"]\n',
+            '[padrao]\nvista = 1\n[[alvo]]\nurl = "http://x"\n',
+            '[[alvo]]\nurl = "http://x"\nsenha_env = "NAO_EXISTE"\n',
+            '[[alvo]]\nurl = "http://x"\nmax_delay = "abc"\n',
+            'url = "http://x"\n',
+            '[[alvo]\n',
+        ]
+        for conteudo in casos:
+            with self.subTest(conteudo=conteudo):
+                with self.assertRaises(ConfiguracaoError):
+                    carregar_alvos(self._arquivo(conteudo), {'usuario': 'MONITOR', 'senha': 's', 'max_delay': 300})
+
+    def test_modo_configuracao_de_ponta_a_ponta(self):
+        """main() com --config verifica cada alvo com a sua vista e imprime o relatório combinado."""
+        caminho = self._arquivo(CONFIGURACAO)
+        chamadas = []
+
+        def verificacao(session, url, usuario, senha, max_delay, **kwargs):
+            chamadas.append((url, max_delay, kwargs['vista'], kwargs['identidade']))
+            if url == 'http://erp2:8080':
+                return _resultado(1, 'STATUS_PROBLEMA: Log com problema: X')
+            return _resultado()
+
+        argv = ['check_sincronismo.py', '--config', caminho, '--token-cache-ttl', '0', '--parse-cache-size', '0']
+        saida = io.StringIO()
+        with patch.dict(os.environ, {'ERP_PASSWORD': 'senha'}), patch.object(sys, 'argv', argv), \
+                patch.object(check_sincronismo, 'executar_verificacao', side_effect=verificacao), \
+                redirect_stdout(saida), self.assertRaises(SystemExit) as fim:
+            check_sincronismo.main()
+
+        self.assertEqual(fim.exception.code, 1)
+        self.assertEqual(saida.getvalue().strip(), "STATUS_PROBLEMA: [empresa-22] Log com problema: X")
+        self.assertEqual(sorted(chamadas), [
+            ('http://erp1:8080', 300, {'filial': '2'}, 'MONITOR#matriz'),
+            ('http://erp2:8080', 600, {'filial': '2', 'empresa': '22', 'svistaaba': '3000'}, 'MONITOR#empresa-22'),
+        ])
+
+
+class TestVerificacaoAlvos(unittest.TestCase):
+    """Testes do pool de verificação e do relatório combinado."""
+
+    def test_pool_limitado_e_ordem_preservada(self):
+        """No máximo ``trabalhadores`` alvos ao mesmo tempo; resultados na ordem da configuração."""
+        ativos = []
+        maximo = []
+        lock = threading.Lock()
+
+        def verificar(alvo):
+            with lock:
+                ativos.append(alvo['nome'])
+                maximo.append(len(ativos))
+            time.sleep(0.05)
+            with lock:
+                ativos.remove(alvo['nome'])
+            if alvo['nome'] == 'a3':
+                raise RuntimeError("falhou")
+            return _resultado(saida=f"ok {alvo['nome']}")
+
+        alvos = [{'nome': f"a{i}"} for i in range(6)]
+        resultados = verificar_alvos(alvos, verificar, trabalhadores=2)
+
+        self.assertLessEqual(max(maximo), 2)
+        self.assertEqual([alvo['nome'] for alvo, _ in resultados], [f"a{i}" for i in range(6)])
+        self.assertEqual(resultados[0][1]['saida'], 'ok a0')
+        self.assertEqual(resultados[3][1]['codigo'], 1)
+        self.assertIn('falhou', resultados[3][1]['saida'])
+
+    def test_relatorio_combinado(self):
+        """Texto, JSON e descoberta combinam os alvos."""
+        filiais = [{'codigo': '4', 'filial': 'MATRIZ', 'ultimo_envio': None, 'ultimo_recebimento': None, 'log': ''}]
+        resultados = [({'nome': 'a'}, _resultado(filiais=filiais)), ({'nome': 'b'}, _resultado(filiais=filiais))]
+
+        self.assertEqual(formatar_relatorio(resultados), (0, STATUS_OK))
+        codigo, documento = formatar_relatorio(resultados, 'json')
+        documento = json.loads(documento)
+        self.assertEqual((codigo, documento['status']), (0, 'OK'))
+        self.assertEqual([alvo['alvo'] for alvo in documento['alvos']], ['a', 'b'])
+        codigo, descoberta = formatar_relatorio(resultados, 'discovery')
+        self.assertEqual(json.loads(descoberta)['data'][1], {'{#CODLOCAL}': '4', '{#FILIAL}': 'MATRIZ', '{#ALVO}': 'b'})
+
+        # Um alvo sem dados: a descoberta parcial apagaria os itens dele
+        resultados[1] = ({'nome': 'b'}, _resultado(1, 'STATUS_PROBLEMA: Erro de conexao'))
+        self.assertEqual(formatar_relatorio(resultados, 'discovery'), (1, 'STATUS_PROBLEMA: [b] Erro de conexao'))
+
+
+class TestParametrosVista(unittest.TestCase):
+    """Testes dos parâmetros de vista e empresa por alvo."""
+
+    def _resposta(self, texto):
+        resposta = Mock()
+        resposta.text = texto
+        resposta.status_code = 200
+        resposta.raise_for_status.return_value = None
+        return resposta
+
+    def test_vista_sobrescreve_padrao(self):
+        """Os parâmetros informados substituem os da vista padrão no POST."""
+        session = Mock()
+        session.post.return_value = self._resposta("<table id='tblBody'></table>")
+
+        get_sync_status_page(session, 'http://erp', 'tk', vista={'empresa': '22', 'svistaaba': '3000'})
+
+        payload = session.post.call_args.kwargs['data']
+        self.assertEqual((payload['empresa'], payload['vista'], payload['svistaaba']), ('22', '2052', '3000'))
+        self.assertEqual((payload['idTbl'], payload['param2']), ('3000', 'svistaaba|3000'))
+
+    def test_selecao_da_empresa_configurada(self):
+        """Com ``empresa``, a linha correspondente é escolhida na tela de seleção."""
+        html = ("<table id='tblBody'><tr><th>Cod</th></tr><tr><td>17</td></tr><tr><td>22</td></tr></table>")
+        session = Mock()
+        session.post.return_value = self._resposta("preencheSessao('tk22')")
+
+        self.assertEqual(select_empresa(session, 'http://erp', html, empresa='22'), 'tk22')
+        self.assertEqual(session.post.call_args.kwargs['data']['empresa'], '22')
+        with self.assertRaises(ERPLoginError):
+            select_empresa(session, 'http://erp', html, empresa='99')
+
+
+if __name__ == '__main__':
+    unittest.main()
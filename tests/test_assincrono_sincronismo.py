@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Testes do motor HTTP assíncrono contra um ERP falso em aiohttp.web.
+
+Ignorados quando o pacote opcional aiohttp não está instalado.
+"""
+
+import os
+import sys
+import shutil
+import socket
+import asyncio
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+# Adiciona o diretório pai ao path para importar os módulos
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, 'benchmarks'))
+
+import check_sincronismo
+from check_sincronismo import parse_status_page, Prazo, STATUS_OK
+from assincrono_sincronismo import aiohttp, verificar_alvos_async
+from grade_sintetica import gerar_pagina
+
+if aiohttp is not None:
+    from aiohttp import web
+
+TELA_EMPRESAS = ("<div>Selecione a Empresa</div><table id='tblBody'>"
+                 "<tr><th>Cod</th></tr><tr><td>17</td></tr><tr><td>22</td></tr></table>")
+TELA_LOGIN = "<html>Tecnicon.EfetuaLogin.obterTelaHtml</html>"
+
+
+class ERPFalso:
+    """Controller do Tecnicon com login, seleção de empresa e vista."""
+
+    def __init__(self, selecao_empresa=True, atraso_vista=0.0, status_vista=200):
+        self.selecao_empresa = selecao_empresa
+        self.atraso_vista = atraso_vista
+        self.status_vista = status_vista
+        self.pagina = gerar_pagina(5, atraso_segundos=30)
+        self.tokens = set()
+        self.logins = 0
+        self.empresas = []
+        self.vistas = []
+        self.simultaneas = 0
+        self.maximo_simultaneas = 0
+
+    async def controller(self, request):
+        acao = request.query.get('acao')
+        form = await request.post()
+        if acao == 'Tecnicon.EfetuaLogin.obterTelaHtml':
+            self.logins += 1
+            if self.selecao_empresa:
+                resposta = web.Response(text=TELA_EMPRESAS)
+            else:
+                resposta = web.Response(text=self._emitir_token('tk'))
+            resposta.set_cookie('JSESSIONID', f"sessao{self.logins}")
+            return resposta
+        if acao == 'Tecnicon.EmpresaLogin.selecionarEmpresa':
+            self.empresas.append(form['empresa'])
+            return web.Response(text=self._emitir_token(f"emp{form['empresa']}"))
+        if acao == 'TecniconVista.CarregaVista.carregaVista':
+            self.vistas.append((dict(form), request.headers.get('Authorization'), request.cookies.get('JSESSIONID')))
+            self.simultaneas += 1
+            self.maximo_simultaneas = max(self.maximo_simultaneas, self.simultaneas)
+            try:
+                await asyncio.sleep(self.atraso_vista)
+            finally:
+                self.simultaneas -= 1
+            if self.status_vista != 200:
+                return web.Response(status=self.status_vista, text="erro")
+            if request.headers.get('Authorization') not in self.tokens:
+                return web.Response(text=TELA_LOGIN)
+            return web.Response(text=self.pagina, content_type='text/html', charset='utf-8')
+        return web.Response(status=404)
+
+    def _emitir_token(self, prefixo):
+        token = f"{prefixo}-{self.logins}"
+        self.tokens.add(token)
+        return f"<script>preencheSessao('{token}')</script>"
+
+
+def _alvo(url, nome='a', vista=None):
+    return {'nome': nome, 'url': url, 'usuario': 'MONITOR', 'senha': 'senha', 'max_delay': 300,
+            'vista': vista or {}, 'zabbix_host': None}
+
+
+@unittest.skipIf(aiohttp is None, "pacote opcional aiohttp não instalado")
+class TestMotorAssincrono(unittest.IsolatedAsyncioTestCase):
+    """Testes de ponta a ponta do motor aiohttp."""
+
+    async def asyncSetUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'SINCRONISMO_CACHE_DIR': self.diretorio})
+        self.env.start()
+        self.runner = None
+
+    async def asyncTearDown(self):
+        if self.runner:
+            await self.runner.cleanup()
+        self.env.stop()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    async def _subir(self, erp):
+        app = web.Application()
+        app.router.add_post('/Tecnicon/Controller', erp.controller)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        porta = self.runner.addresses[0][1]
+        return f"http://127.0.0.1:{porta}"
+
+    async def test_login_empresa_e_vista(self):
+        """As três fases produzem o mesmo resultado da análise síncrona."""
+        erp = ERPFalso()
+        url = await self._subir(erp)
+
+        [(alvo, resultado)] = await verificar_alvos_async([_alvo(url, vista={'empresa': '22', 'svistaaba': '3000'})])
+
+        self.assertEqual((resultado['codigo'], resultado['saida']), (0, STATUS_OK))
+        self.assertEqual(resultado['token'], 'emp22-1')
+        self.assertEqual(resultado['status_data'], parse_status_page(erp.pagina))
+        self.assertEqual(erp.empresas, ['22'])
+        formulario, autorizacao, cookie = erp.vistas[0]
+        self.assertEqual((formulario['empresa'], formulario['svistaaba'], formulario['vista']), ('22', '3000', '2052'))
+        self.assertEqual((autorizacao, cookie), ('emp22-1', 'sessao1'))
+        self.assertEqual(set(resultado['tempos']), {'login', 'busca', 'analise', 'total'})
+
+    async def test_token_em_cache_e_relogin(self):
+        """O token e os cookies vão para o cache; um token recusado gera um novo login."""
+        erp = ERPFalso(selecao_empresa=False)
+        url = await self._subir(erp)
+        alvos = [_alvo(url)]
+
+        await verificar_alvos_async(alvos, token_cache_ttl=900)
+        [(_, segundo)] = await verificar_alvos_async(alvos, token_cache_ttl=900)
+        self.assertEqual(erp.logins, 1)
+        self.assertEqual(erp.vistas[1][1:], ('tk-1', 'sessao1'))
+        self.assertEqual(segundo['codigo'], 0)
+
+        erp.tokens.clear()
+        relogins = check_sincronismo.contadores_autenticacao.get('relogin', 0)
+        [(_, terceiro)] = await verificar_alvos_async(alvos, token_cache_ttl=900)
+        self.assertEqual((terceiro['codigo'], terceiro['token']), (0, 'tk-2'))
+        self.assertEqual(check_sincronismo.contadores_autenticacao['relogin'], relogins + 1)
+
+    async def test_limite_de_conexoes_por_host(self):
+        """Muitos alvos no mesmo host respeitam o limite de conexões simultâneas."""
+        erp = ERPFalso(selecao_empresa=False, atraso_vista=0.05)
+        url = await self._subir(erp)
+
+        resultados = await verificar_alvos_async([_alvo(url, f"a{i}") for i in range(8)], limite_por_host=2)
+
+        self.assertEqual([alvo['nome'] for alvo, _ in resultados], [f"a{i}" for i in range(8)])
+        self.assertTrue(all(resultado['codigo'] == 0 for _, resultado in resultados))
+        self.assertEqual(len(erp.vistas), 8)
+        self.assertLessEqual(erp.maximo_simultaneas, 2)
+
+    async def test_falhas_usam_as_excecoes_do_motor_sincrono(self):
+        """Servidor inacessível e HTTP 500 viram as mesmas mensagens de STATUS_PROBLEMA."""
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            porta_fechada = s.getsockname()[1]
+        erp = ERPFalso(selecao_empresa=False, status_vista=500)
+        url = await self._subir(erp)
+
+        resultados = await verificar_alvos_async([_alvo(f"http://127.0.0.1:{porta_fechada}", 'fora'), _alvo(url, 'erro')])
+
+        self.assertTrue(resultados[0][1]['saida'].startswith("STATUS_PROBLEMA: Erro de conexao ao tentar logar"))
+        self.assertEqual(resultados[1][1]['saida'], "STATUS_PROBLEMA: Erro de conexao ao buscar a pagina de status: HTTP 500")
+        self.assertIsNone(resultados[1][1]['token'])
+
+    async def test_prazo_compartilhado_entre_alvos(self):
+        """Uma vista lenta esgota o prazo comum e o erro nomeia a fase de busca."""
+        erp = ERPFalso(selecao_empresa=False, atraso_vista=2)
+        url = await self._subir(erp)
+
+        resultados = await verificar_alvos_async([_alvo(url, 'a'), _alvo(url, 'b')], prazo=Prazo(0.5))
+
+        for _, resultado in resultados:
+            self.assertEqual(resultado['prazo_esgotado'], 'busca')
+            self.assertTrue(resultado['saida'].startswith("STATUS_PROBLEMA: Prazo de 0.5s esgotado na fase busca"))
+            self.assertLess(resultado['tempos']['total'], 1.5)
+
+    async def test_estado_do_disjuntor_fora_do_laco(self):
+        """Uma trava do disjuntor presa por outro processo não para o laço de eventos."""
+        erp = ERPFalso(selecao_empresa=False)
+        url = await self._subir(erp)
+        liberada = threading.Event()
+
+        class DisjuntorTravado:
+            registrado = None
+
+            def permitir(self):
+                # Só o laço de eventos libera a trava: bloqueá-lo aqui travaria o teste
+                return None if liberada.wait(5) else "trava nunca liberada"
+
+            def registrar(self, resultado):
+                self.registrado = resultado
+
+        circuito = DisjuntorTravado()
+        asyncio.get_running_loop().call_later(0.1, liberada.set)
+        [(_, resultado)] = await verificar_alvos_async([_alvo(url)], disjuntor=lambda alvo: circuito)
+
+        self.assertEqual(resultado['codigo'], 0)
+        self.assertIs(circuito.registrado, resultado)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Testes do cache persistente de token entre execuções.
+"""
+
+import os
+import sys
+import stat
+import time
+import fcntl
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+import requests
+
+# Adiciona o diretório pai ao path para importar os módulos
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache_sincronismo
+from cache_sincronismo import (
+    carregar_token, salvar_token, invalidar_token, acumular_contadores,
+    obter_resultado_compartilhado, ResultadoCompartilhadoError, AnalisesEmMemoria, AnalisesEmDisco
+)
+import check_sincronismo
+from check_sincronismo import atualizar_cache_token, executar_verificacao, Prazo, StatusFetchError, STATUS_OK
+
+
+class TestCacheToken(unittest.TestCase):
+    """Testes de gravação, leitura e expiração do token em cache."""
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'SINCRONISMO_CACHE_DIR': self.diretorio})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def _sessao_com_cookie(self):
+        session = requests.Session()
+        session.cookies.set('JSESSIONID', 'abc123', domain='erp', path='/Tecnicon')
+        return session
+
+    def test_salvar_e_carregar(self):
+        """Token e cookies salvos são restaurados em uma nova sessão."""
+        salvar_token(self._sessao_com_cookie(), 'http://erp', 'MONITOR', 'tk')
+
+        nova = requests.Session()
+        token = carregar_token(nova, 'http://erp', 'MONITOR', ttl=60)
+
+        self.assertEqual(token, 'tk')
+        self.assertEqual(nova.cookies.get('JSESSIONID', domain='erp', path='/Tecnicon'), 'abc123')
+
+    def test_arquivo_com_permissao_restrita(self):
+        """O arquivo de cache só pode ser lido pelo dono."""
+        salvar_token(self._sessao_com_cookie(), 'http://erp', 'MONITOR', 'tk')
+        arquivos = os.listdir(self.diretorio)
+        self.assertEqual(len(arquivos), 1)
+        modo = stat.S_IMODE(os.stat(os.path.join(self.diretorio, arquivos[0])).st_mode)
+        self.assertEqual(modo, 0o600)
+
+    def test_token_expirado(self):
+        """Token mais antigo que o TTL é ignorado."""
+        salvar_token(self._sessao_com_cookie(), 'http://erp', 'MONITOR', 'tk')
+        with patch.object(cache_sincronismo.time, 'time', return_value=time.time() + 120):
+            self.assertIsNone(carregar_token(requests.Session(), 'http://erp', 'MONITOR', ttl=60))
+
+    def test_ttl_zero_desativa(self):
+        """TTL zero desativa a leitura do cache."""
+        salvar_token(self._sessao_com_cookie(), 'http://erp', 'MONITOR', 'tk')
+        self.assertIsNone(carregar_token(requests.Session(), 'http://erp', 'MONITOR', ttl=0))
+
+    def test_alvos_independentes(self):
+        """Cada par URL/usuário tem seu próprio token."""
+        salvar_token(self._sessao_com_cookie(), 'http://erp', 'MONITOR', 'tk')
+        self.assertIsNone(carregar_token(requests.Session(), 'http://erp', 'OUTRO', ttl=60))
+
+    def test_atualizar_cache_token(self):
+        """Falha invalida o cache; token novo é gravado; token reutilizado não é regravado."""
+        session = self._sessao_com_cookie()
+        atualizar_cache_token(session, 'http://erp', 'MONITOR', None, 'tk', 60)
+        self.assertEqual(carregar_token(requests.Session(), 'http://erp', 'MONITOR', 60), 'tk')
+
+        with patch('check_sincronismo.salvar_token') as salvar:
+            atualizar_cache_token(session, 'http://erp', 'MONITOR', 'tk', 'tk', 60)
+        salvar.assert_not_called()
+
+        atualizar_cache_token(session, 'http://erp', 'MONITOR', 'tk', None, 60)
+        self.assertIsNone(carregar_token(requests.Session(), 'http://erp', 'MONITOR', 60))
+
+    def test_invalidar_sem_arquivo(self):
+        """Invalidar um cache inexistente não gera erro."""
+        invalidar_token('http://erp', 'MONITOR')
+
+    def test_gravacoes_simultaneas_entre_threads(self):
+        """Threads do mesmo processo gravando o mesmo arquivo não disputam o temporário."""
+        caminho = os.path.join(self.diretorio, 'compartilhado.json')
+        erros = []
+
+        def gravar(numero):
+            try:
+                for _ in range(50):
+                    cache_sincronismo.gravar_json(caminho, {'thread': numero, 'dados': 'x' * 2000})
+            except Exception as e:
+                erros.append(e)
+
+        threads = [threading.Thread(target=gravar, args=(numero,)) for numero in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(erros, [])
+        self.assertIn(cache_sincronismo.ler_json(caminho)['thread'], range(8))
+        self.assertEqual(os.listdir(self.diretorio), ['compartilhado.json'])
+
+
+    def test_acumular_contadores(self):
+        """Contadores de execuções diferentes são somados; zeros são ignorados."""
+        self.assertIsNone(acumular_contadores({'relogin': 0}))
+        acumular_contadores({'login': 1, 'relogin': 1})
+        totais = acumular_contadores({'login': 2, 'relogin': 0})
+        self.assertEqual(totais['login'], 3)
+        self.assertEqual(totais['relogin'], 1)
+
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Testes do compartilhamento de resultado entre execuções simultâneas."""
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'SINCRONISMO_CACHE_DIR': self.diretorio})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def test_reutiliza_dentro_do_ttl(self):
+        """Um resultado recente é reutilizado sem nova coleta."""
+        produzir = Mock(return_value={'data_ultimo_envio': '01/01/2025'})
+        primeiro = obter_resultado_compartilhado('alvo', 30, produzir)
+        segundo = obter_resultado_compartilhado('alvo', 30, produzir)
+        self.assertEqual(primeiro, segundo)
+        produzir.assert_called_once_with()
+
+    def test_coleta_novamente_apos_ttl(self):
+        """Resultado mais velho que o TTL provoca nova coleta."""
+        produzir = Mock(return_value={})
+        obter_resultado_compartilhado('alvo', 30, produzir)
+        with patch.object(cache_sincronismo.time, 'time', return_value=time.time() + 60):
+            obter_resultado_compartilhado('alvo', 30, produzir)
+        self.assertEqual(produzir.call_count, 2)
+
+    def test_falha_publicada(self):
+        """A falha de quem coletou é repassada às demais execuções."""
+        produzir = Mock(side_effect=StatusFetchError("ERP fora do ar"))
+        with self.assertRaises(StatusFetchError):
+            obter_resultado_compartilhado('alvo', 30, produzir, (StatusFetchError,))
+        with self.assertRaises(ResultadoCompartilhadoError) as contexto:
+            obter_resultado_compartilhado('alvo', 30, produzir, (StatusFetchError,))
+        self.assertIn("ERP fora do ar", str(contexto.exception))
+        produzir.assert_called_once_with()
+
+    def test_execucoes_simultaneas(self):
+        """Várias execuções ao mesmo tempo resultam em uma única coleta."""
+        chamadas = []
+
+        def produzir():
+            chamadas.append(1)
+            time.sleep(0.2)
+            return {'ok': True}
+
+        resultados = []
+        threads = [
+            threading.Thread(target=lambda: resultados.append(obter_resultado_compartilhado('alvo', 30, produzir)))
+            for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(chamadas), 1)
+        self.assertEqual(resultados, [{'ok': True}] * 5)
+
+    @patch('check_sincronismo.avaliar_status', return_value=(0, STATUS_OK))
+    def test_verificacao_consumidora_preserva_token(self, _avaliar):
+        """Quem reutiliza o resultado não faz requisições e mantém o próprio token."""
+        publicado = {'data_ultimo_envio': '14/11/2025', 'hora_ultimo_envio': '09:21:48',
+                     'problema_envio': '', 'problema_receb': ''}
+        obter_resultado_compartilhado(cache_sincronismo.chave_alvo('http://erp', 'MONITOR'), 30, lambda: publicado)
+        session = Mock()
+
+        resultado = executar_verificacao(session, 'http://erp', 'MONITOR', 'senha', 300,
+                                         token='meu_token', resultado_ttl=30)
+
+        self.assertEqual(resultado['codigo'], 0)
+        self.assertEqual(resultado['token'], 'meu_token')
+        self.assertEqual(resultado['status_data'], publicado)
+        session.post.assert_not_called()
+
+    def test_espera_limitada_pelo_prazo(self):
+        """Com a trava presa por uma coleta travada, quem espera desiste quando o prazo acaba."""
+        chave = cache_sincronismo.chave_alvo('http://erp', 'MONITOR')
+        caminho = os.path.join(self.diretorio, f"resultado_{chave}.json.lock")
+        session = Mock()
+        with open(caminho, 'w') as trava:
+            fcntl.flock(trava, fcntl.LOCK_EX)
+            inicio = time.perf_counter()
+            resultado = executar_verificacao(session, 'http://erp', 'MONITOR', 'senha', 300, token='meu_token',
+                                             resultado_ttl=30, prazo=Prazo(0.3))
+            decorrido = time.perf_counter() - inicio
+
+            # Os contadores também não esperam além do prazo
+            with open(os.path.join(self.diretorio, 'contadores.json.lock'), 'w') as trava_contadores:
+                fcntl.flock(trava_contadores, fcntl.LOCK_EX)
+                with self.assertLogs('zabbix_erp_sincronismo', level='WARNING'):
+                    self.assertIsNone(acumular_contadores({'login': 1}, prazo=Prazo(0.1)))
+
+        self.assertLess(decorrido, 1.0)
+        self.assertEqual(resultado['codigo'], 1)
+        self.assertRegex(resultado['saida'], r"^STATUS_PROBLEMA: Prazo de 0.3s esgotado na fase busca .* outra execucao$")
+        self.assertEqual((resultado['prazo_esgotado'], resultado['token']), ('busca', 'meu_token'))
+        session.post.assert_not_called()
+
+
+class TestLayoutColunas(unittest.TestCase):
+    """Testes do mapeamento de colunas guardado por assinatura do cabeçalho."""
+
+    CABECALHO = ['Cód. Local', 'Filial', 'Data Ult. Reg. Env.', 'Hora Ultimo Reg. Env.', 'Log Filial p/ Sinc.']
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'SINCRONISMO_CACHE_DIR': self.diretorio})
+        self.env.start()
+        self.layouts = patch.dict(check_sincronismo.layouts_colunas, clear=True)
+        self.layouts.start()
+        self.estado = patch.dict(check_sincronismo.estado_layouts, {'ultima': None, 'alterado': False})
+        self.estado.start()
+
+    def tearDown(self):
+        self.estado.stop()
+        self.layouts.stop()
+        self.env.stop()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def test_cabecalho_conhecido_dispensa_deteccao(self):
+        """O mesmo cabeçalho reaproveita o mapeamento sem refazer as heurísticas."""
+        with patch('check_sincronismo._detectar_colunas', wraps=check_sincronismo._detectar_colunas) as detectar:
+            primeiro = check_sincronismo._resolver_colunas(self.CABECALHO)
+            segundo = check_sincronismo._resolver_colunas(self.CABECALHO)
+
+        self.assertEqual(primeiro, segundo)
+        self.assertEqual((primeiro['log'], primeiro['data_envio'], primeiro['hora_envio']), (4, 2, 3))
+        detectar.assert_called_once()
+
+    def test_mudanca_de_layout_gera_aviso(self):
+        """Um cabeçalho diferente do último é redetectado com aviso no log."""
+        check_sincronismo._resolver_colunas(self.CABECALHO)
+        novo = ['Log Filial p/ Sinc.'] + self.CABECALHO[:-1]
+
+        with self.assertLogs('zabbix_erp_sincronismo', level='WARNING') as logs:
+            colunas = check_sincronismo._resolver_colunas(novo)
+
+        self.assertEqual(colunas['log'], 0)
+        self.assertIn('Layout da vista de sincronismo mudou', logs.output[0])
+
+    def test_layouts_persistidos_entre_execucoes(self):
+        """Os layouts salvos são recarregados e o último vira a referência de mudança."""
+        check_sincronismo._resolver_colunas(self.CABECALHO)
+        check_sincronismo.salvar_layouts()
+        check_sincronismo.layouts_colunas.clear()
+        check_sincronismo.estado_layouts['ultima'] = None
+
+        check_sincronismo.carregar_layouts()
+
+        assinatura = check_sincronismo.assinatura_cabecalho(self.CABECALHO)
+        self.assertEqual(check_sincronismo.estado_layouts['ultima'], assinatura)
+        self.assertEqual(check_sincronismo.layouts_colunas[assinatura]['cabecalho'], self.CABECALHO)
+
+    def test_limite_de_layouts(self):
+        """Só os layouts usados mais recentemente são mantidos no arquivo."""
+        layouts = {f'a{i}': {'cabecalho': [], 'colunas': {}} for i in range(cache_sincronismo.LAYOUTS_MAXIMO + 3)}
+        cache_sincronismo.salvar_layouts_colunas(layouts)
+
+        salvos = cache_sincronismo.carregar_layouts_colunas()
+        self.assertEqual(list(salvos), list(layouts)[-cache_sincronismo.LAYOUTS_MAXIMO:])
+
+
+class TestMemoAnalises(unittest.TestCase):
+    """Testes da memorização de análises pelo hash da grade."""
+
+    HTML = (
+        "<div class='div-grid-vistas'>"
+        '<table id="tblHead"><tr><th>Data Ult. Reg. Env.</th><th>Hora Ultimo Reg. Env.</th><th>Log Filial p/ Sinc.</th></tr></table>'
+        '<table id="tblBody"><tbody><tr><td>14/11/2025</td><td>09:21:48</td><td></td></tr>'
+        '<tr><td>14/11/2025</td><td>09:22:00</td><td></td></tr></tbody></table></div>'
+    )
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'SINCRONISMO_CACHE_DIR': self.diretorio})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def test_pagina_identica_nao_e_reanalisada(self):
+        """A segunda análise da mesma grade devolve o resultado guardado."""
+        for memo in (AnalisesEmMemoria(), AnalisesEmDisco()):
+            with self.subTest(memo=type(memo).__name__):
+                with patch('check_sincronismo._analisar_pagina', wraps=check_sincronismo._analisar_pagina) as analisar:
+                    primeiro = check_sincronismo.parse_status_page(self.HTML, memo=memo)
+                    segundo = check_sincronismo.parse_status_page(self.HTML, memo=memo)
+                self.assertEqual(primeiro, segundo)
+                self.assertEqual(segundo['hora_ultimo_envio'], '09:22:00')
+                analisar.assert_called_once()
+
+    def test_chave_ignora_conteudo_fora_da_grade(self):
+        """Mudanças antes da grade não alteram a chave; mudanças na grade sim."""
+        chave = check_sincronismo.chave_analise('<script>var t=1;</script>' + self.HTML)
+        self.assertEqual(chave, check_sincronismo.chave_analise('<script>var t=2;</script>' + self.HTML))
+        self.assertNotEqual(chave, check_sincronismo.chave_analise(self.HTML.replace('09:22:00', '09:23:00')))
+
+    def test_chave_ignora_relogio_do_servidor(self):
+        """As células ocultas Data Atual/Hr Atual não invalidam a memorização."""
+        modelo = self.HTML.replace('<td></td></tr>', "<td></td><td coluna='Hr Atual' id='HRATUAL' style='display:none;'><div>{}</div></td></tr>")
+        self.assertEqual(check_sincronismo.chave_analise(modelo.replace('{}', '15:22:04')),
+                         check_sincronismo.chave_analise(modelo.replace('{}', '15:23:04')))
+
+    def test_resultado_devolvido_e_independente(self):
+        """Alterar o dicionário devolvido não corrompe a entrada em memória."""
+        memo = AnalisesEmMemoria()
+        memo.guardar('k', {'logs_filial': []})
+        memo.obter('k')['logs_filial'].append('x')
+        self.assertEqual(memo.obter('k'), {'logs_filial': []})
+
+    def test_lru_em_memoria(self):
+        """A entrada usada há mais tempo é descartada ao passar do limite."""
+        memo = AnalisesEmMemoria(maximo=2)
+        memo.guardar('a', 1)
+        memo.guardar('b', 2)
+        memo.obter('a')
+        memo.guardar('c', 3)
+        self.assertIsNone(memo.obter('b'))
+        self.assertEqual((memo.obter('a'), memo.obter('c')), (1, 3))
+
+    def test_lru_em_disco(self):
+        """No disco ficam apenas os arquivos usados mais recentemente."""
+        memo = AnalisesEmDisco(maximo=2)
+        memo.guardar('a', 1)
+        memo.guardar('b', 2)
+        # Marca 'b' como mais antigo que 'a'
+        diretorio = os.path.join(self.diretorio, 'analises')
+        os.utime(os.path.join(diretorio, 'b.json'), (time.time() - 60, time.time() - 60))
+        memo.guardar('c', 3)
+        self.assertEqual(sorted(os.listdir(diretorio)), ['a.json', 'c.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,16 +7,38 @@ import unittest
 from unittest.mock import Mock, patch, MagicMock
 import sys
 import os
+import json
+import time
+import requests
+from datetime import datetime, timedelta
 
 # Adiciona o diretório pai ao path para importar o módulo
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import check_sincronismo
 from check_sincronismo import (
     parse_status_page, 
     select_empresa, 
     get_auth_token,
+    get_sync_status_page,
+    get_sync_status_streaming,
+    classificar_resposta,
+    executar_verificacao,
+    formatar_saida,
+    AnaliseEmFluxo,
     ERPLoginError,
-    ParsingError
+    ParsingError,
+    StatusFetchError,
+    SessaoExpiradaError,
+    RESPOSTA_CONTEUDO,
+    RESPOSTA_ERRO,
+    RESPOSTA_SELECAO_EMPRESA,
+    RESPOSTA_SESSAO_EXPIRADA,
+    RESPOSTA_TELA_LOGIN,
+    RESPOSTA_TOKEN,
+    Prazo,
+    MedicaoFases,
+    STATUS_OK,
 )
 
 
@@ -148,5 +170,483 @@ class TestCheckSincronismo(unittest.TestCase):
         self.assertIn("Não foi possível encontrar a tabela de empresas", str(context.exception))
 
 
+
+def _resposta(texto, status_code=200):
+    """Cria uma resposta HTTP simulada."""
+    resposta = Mock()
+    resposta.text = texto
+    resposta.status_code = status_code
+    resposta.raise_for_status.return_value = None
+    return resposta
+
+
+class TestClassificarResposta(unittest.TestCase):
+    """Testes do classificador de respostas do ERP."""
+
+    def test_categorias(self):
+        """Cada tipo de resposta conhecida cai na categoria correta."""
+        casos = [
+            (401, "", RESPOSTA_SESSAO_EXPIRADA),
+            (200, "<div>Selecione a Empresa</div>", RESPOSTA_SELECAO_EMPRESA),
+            (200, "preencheSessao('abc')", RESPOSTA_TOKEN),
+            (200, "<table id='tblBody'></table>", RESPOSTA_CONTEUDO),
+            (200, "<input name='logintimeout' value='true'>", RESPOSTA_TELA_LOGIN),
+            (200, "<h1>HTTP Status 500 - java.lang.NullPointerException</h1>", RESPOSTA_ERRO),
+        ]
+        for status_code, texto, esperado in casos:
+            with self.subTest(esperado=esperado):
+                self.assertEqual(classificar_resposta(status_code, texto), esperado)
+
+    def test_grade_com_texto_de_erro_no_log(self):
+        """Texto de exceção dentro da grade não transforma a vista em página de erro."""
+        texto = "<table id='tblBody'><tr><td>java.lang.IllegalStateException</td></tr></table>"
+        self.assertEqual(classificar_resposta(200, texto), RESPOSTA_CONTEUDO)
+
+    def test_login_com_pagina_de_erro(self):
+        """Página de erro no login vira ERPLoginError."""
+        session = Mock()
+        session.post.return_value = _resposta("HTTP Status 500 - Internal Server Error")
+        with self.assertRaises(ERPLoginError):
+            get_auth_token(session, 'http://erp', 'MONITOR', 'senha')
+
+
+class TestReloginStatusPage(unittest.TestCase):
+    """Testes da renovação transparente do token em get_sync_status_page."""
+
+    def setUp(self):
+        self.contadores = patch.dict(check_sincronismo.contadores_autenticacao, clear=True)
+        self.contadores.start()
+
+    def tearDown(self):
+        self.contadores.stop()
+
+    def test_relogin_unico(self):
+        """Tela de login na resposta dispara um novo login e uma nova busca."""
+        session = Mock()
+        session.post.side_effect = [_resposta("logintimeout"), _resposta("<table id='tblBody'></table>")]
+        relogin = Mock(return_value='novo')
+
+        html = get_sync_status_page(session, 'http://erp', 'velho', relogin=relogin)
+
+        self.assertIn('tblBody', html)
+        relogin.assert_called_once_with()
+        self.assertEqual(session.post.call_args_list[1].kwargs['headers']['Authorization'], 'novo')
+        self.assertEqual(check_sincronismo.contadores_autenticacao['relogin'], 1)
+        self.assertEqual(check_sincronismo.contadores_autenticacao['relogin_tela_login'], 1)
+
+    def test_segunda_recusa_propaga_erro(self):
+        """Se o token novo também for recusado, o erro chega ao chamador."""
+        session = Mock()
+        session.post.return_value = _resposta("", status_code=403)
+
+        with self.assertRaises(SessaoExpiradaError):
+            get_sync_status_page(session, 'http://erp', 'velho', relogin=Mock(return_value='novo'))
+        self.assertEqual(session.post.call_count, 2)
+
+    def test_sem_relogin_nao_repete(self):
+        """Sem função de relogin, a recusa é reportada imediatamente."""
+        session = Mock()
+        session.post.return_value = _resposta("EfetuaLogin")
+
+        with self.assertRaises(SessaoExpiradaError):
+            get_sync_status_page(session, 'http://erp', 'velho')
+        self.assertEqual(session.post.call_count, 1)
+
+
+
+CABECALHO_PADRAO = ['Cód. Local', 'Filial', 'Data Ult. Reg. Env.', 'Hora Ultimo Reg. Env.', 'Log Filial p/ Sinc.']
+
+
+def _html_grade(linhas, headers=CABECALHO_PADRAO):
+    """Monta uma vista de sincronismo com cabeçalho e as linhas informadas."""
+    cabecalho = ''.join(f'<th title="{h}"><div>{h}</div></th>' for h in headers)
+    corpo = ''.join(
+        '<tr>' + ''.join(f'<td><div>{valor}</div></td>' for valor in linha) + '</tr>'
+        for linha in linhas
+    )
+    return (
+        "<div id='tbltblConCon2902' role='grid' class='div-grid-vistas'>"
+        f'<table id="tblHead"><thead><tr>{cabecalho}</tr></thead></table>'
+        f'<table id="tblBody"><tbody>{corpo}</tbody></table></div>'
+    )
+
+
+class TestSaidaJson(unittest.TestCase):
+    """Testes do documento JSON para itens dependentes do Zabbix."""
+
+    def test_documento_completo(self):
+        """Uma única coleta gera atraso, último envio, logs, linhas e tempos."""
+        envio = datetime.now() - timedelta(seconds=120)
+        data_str, hora_str = envio.strftime('%d/%m/%Y'), envio.strftime('%H:%M:%S')
+        html = _html_grade([
+            ['1', 'FILIAL A', data_str, hora_str, 'Erro na filial A'],
+            ['2', 'FILIAL B', data_str, hora_str, ''],
+        ])
+        session = Mock()
+        session.post.return_value = _resposta(html)
+
+        resultado = executar_verificacao(session, 'http://erp', 'MONITOR', 'senha', 300, token='tk')
+        codigo, saida = formatar_saida(resultado, 'json')
+        documento = json.loads(saida)
+
+        self.assertEqual(codigo, 0)
+        self.assertEqual(documento['status'], 'PROBLEMA')
+        self.assertEqual(documento['logs_filial'], ['Erro na filial A'])
+        self.assertEqual(documento['total_linhas'], 2)
+        self.assertEqual(documento['ultimo_envio'], envio.replace(microsecond=0).isoformat())
+        self.assertAlmostEqual(documento['atraso_segundos'], 120, delta=5)
+        self.assertTrue({'busca', 'analise', 'total'} <= set(documento['tempos']))
+        session.post.assert_called_once()
+
+    def test_documento_em_falha(self):
+        """Falhas de conexão também produzem um documento válido."""
+        resultado = {'codigo': 1, 'saida': 'STATUS_PROBLEMA: Erro de conexao', 'tempos': {'total': 0.5}}
+        codigo, saida = formatar_saida(resultado, 'json')
+        documento = json.loads(saida)
+
+        self.assertEqual(codigo, 0)
+        self.assertEqual(documento['status'], 'PROBLEMA')
+        self.assertIsNone(documento['atraso_segundos'])
+        self.assertEqual(documento['logs_filial'], [])
+        self.assertIsNone(documento['prazo_esgotado'])
+
+    def test_formato_texto_preserva_saida(self):
+        """O formato padrão continua sendo a linha STATUS_*."""
+        self.assertEqual(formatar_saida({'codigo': 1, 'saida': 'STATUS_PROBLEMA: x'}), (1, 'STATUS_PROBLEMA: x'))
+
+
+
+class TestRegistrosPorFilial(unittest.TestCase):
+    """Testes dos registros por linha e da descoberta (LLD) de filiais."""
+
+    HEADERS = ['Cód. Local', 'Filial', 'Data Ult. Reg. Receb.', 'Hora Ult. Reg. Receb.',
+               'Data Ult. Reg. Env.', 'Hora Ultimo Reg. Env.', 'Log Filial p/ Sinc.']
+
+    def setUp(self):
+        self.html = _html_grade([
+            ['4', 'BANCO TECNICON', '14/11/2025', '09:20:00', '14/11/2025', '09:21:48', ''],
+            ['7', 'FILIAL SUL', '14/11/2025', '08:00:00', '14/11/2025', '08:30:00', 'XML inválido'],
+        ], self.HEADERS)
+
+    def test_registros_por_linha(self):
+        """Cada linha da grade vira um registro com código, envio, recebimento e log."""
+        filiais = parse_status_page(self.html)['filiais']
+
+        self.assertEqual(filiais, [
+            {'codigo': '4', 'filial': 'BANCO TECNICON', 'ultimo_envio': '2025-11-14T09:21:48',
+             'ultimo_recebimento': '2025-11-14T09:20:00', 'log': ''},
+            {'codigo': '7', 'filial': 'FILIAL SUL', 'ultimo_envio': '2025-11-14T08:30:00',
+             'ultimo_recebimento': '2025-11-14T08:00:00', 'log': 'XML inválido'},
+        ])
+
+    def test_descoberta_lld(self):
+        """--discovery gera uma macro {#CODLOCAL}/{#FILIAL} por filial."""
+        resultado = {'codigo': 1, 'saida': 'STATUS_PROBLEMA: x', 'status_data': parse_status_page(self.html)}
+        codigo, saida = formatar_saida(resultado, 'discovery')
+
+        self.assertEqual(codigo, 0)
+        self.assertEqual(json.loads(saida), {'data': [
+            {'{#CODLOCAL}': '4', '{#FILIAL}': 'BANCO TECNICON'},
+            {'{#CODLOCAL}': '7', '{#FILIAL}': 'FILIAL SUL'},
+        ]})
+
+    def test_descoberta_sem_dados_reporta_falha(self):
+        """Falha na coleta não produz uma descoberta vazia."""
+        codigo, saida = formatar_saida({'codigo': 1, 'saida': 'STATUS_PROBLEMA: ERP fora'}, 'discovery')
+        self.assertEqual((codigo, saida), (1, 'STATUS_PROBLEMA: ERP fora'))
+
+    def test_atraso_por_filial_no_json(self):
+        """O documento JSON traz o atraso de cada filial para itens dependentes."""
+        resultado = {'codigo': 0, 'saida': 'STATUS_OK', 'status_data': parse_status_page(self.html)}
+        agora = datetime(2025, 11, 14, 9, 31, 48)
+        with patch('check_sincronismo.datetime') as relogio:
+            relogio.now.return_value = agora
+            _, saida = formatar_saida(resultado, 'json')
+
+        atrasos = {f['codigo']: f['atraso_segundos'] for f in json.loads(saida)['filiais']}
+        self.assertEqual(atrasos, {'4': 600.0, '7': 3708.0})
+
+
+def _resposta_fluxo(texto, tamanho=50, status_code=200, erro=None):
+    """Cria uma resposta HTTP simulada lida em pedaços (stream=True)."""
+    pedacos = [texto[i:i + tamanho] for i in range(0, len(texto), tamanho)]
+
+    def iter_content(chunk_size=1, decode_unicode=False):
+        for pedaco in pedacos:
+            yield pedaco
+        if erro:
+            raise erro
+
+    resposta = Mock()
+    resposta.status_code = status_code
+    resposta.encoding = 'utf-8'
+    resposta.iter_content.side_effect = iter_content
+    resposta.raise_for_status.return_value = None
+    return resposta
+
+
+class TestAnaliseEmFluxo(unittest.TestCase):
+    """Testes da análise da vista em fluxo (stream=True)."""
+
+    def setUp(self):
+        self.html = _html_grade([
+            ['1', 'FILIAL A', '14/11/2025', '09:20:00', ''],
+            ['2', 'FILIAL B', '14/11/2025', '09:21:48', 'XML inválido'],
+            ['3', 'FILIAL C', '14/11/2025', '09:22:10', ''],
+        ])
+
+    def test_mesmo_resultado_que_parse_status_page(self):
+        """Qualquer tamanho de pedaço produz os mesmos dados da análise completa."""
+        esperado = parse_status_page(self.html)
+        for tamanho in (1, 7, 64, len(self.html)):
+            with self.subTest(tamanho=tamanho):
+                analise = AnaliseEmFluxo()
+                for i in range(0, len(self.html), tamanho):
+                    analise.alimentar(self.html[i:i + tamanho])
+                self.assertEqual(analise.concluir(), esperado)
+
+    def test_busca_em_fluxo(self):
+        """A vista é pedida com stream=True e devolvida já analisada."""
+        session = Mock()
+        resposta = _resposta_fluxo(self.html)
+        session.post.return_value = resposta
+
+        dados = get_sync_status_streaming(session, 'http://erp', 'tk')
+
+        self.assertTrue(session.post.call_args.kwargs['stream'])
+        self.assertEqual(dados['total_linhas'], 3)
+        self.assertEqual(dados['hora_ultimo_envio'], '09:22:10')
+        self.assertEqual(dados['logs_filial'], ['XML inválido'])
+        resposta.close.assert_called_once_with()
+
+    def test_tela_login_em_fluxo_refaz_login(self):
+        """A tela de login é reconhecida pelo início do corpo e dispara o relogin."""
+        session = Mock()
+        session.post.side_effect = [_resposta_fluxo("<html>Tecnicon.EfetuaLogin.obterTelaHtml</html>"),
+                                    _resposta_fluxo(self.html)]
+        relogin = Mock(return_value='novo')
+
+        dados = get_sync_status_streaming(session, 'http://erp', 'velho', relogin=relogin)
+
+        relogin.assert_called_once_with()
+        self.assertEqual(dados['total_linhas'], 3)
+
+    def test_conexao_interrompida(self):
+        """Falha de rede no meio do corpo vira StatusFetchError."""
+        session = Mock()
+        session.post.return_value = _resposta_fluxo(
+            self.html, erro=requests.exceptions.ChunkedEncodingError("conexao encerrada"))
+
+        with self.assertRaises(StatusFetchError):
+            get_sync_status_streaming(session, 'http://erp', 'tk')
+
+    def test_pagina_sem_grade(self):
+        """Uma resposta sem grade e sem marcas de login gera ParsingError."""
+        session = Mock()
+        session.post.return_value = _resposta_fluxo("<html><body>vazio</body></html>")
+
+        with self.assertRaises(ParsingError):
+            get_sync_status_streaming(session, 'http://erp', 'tk')
+
+
+class TestPrazo(unittest.TestCase):
+    """Testes do prazo total da verificação (--deadline)."""
+
+    def _resposta(self, texto):
+        resposta = Mock()
+        resposta.text = texto
+        resposta.status_code = 200
+        resposta.raise_for_status.return_value = None
+        return resposta
+
+    def test_timeout_limitado_ao_restante(self):
+        """Cada requisição recebe no máximo o tempo que resta do prazo."""
+        session = Mock()
+        session.post.side_effect = [self._resposta("preencheSessao('tk')"),
+                                    self._resposta("<table id='tblBody'></table>")]
+
+        with patch('check_sincronismo.parse_status_page'), \
+                patch('check_sincronismo.avaliar_status', return_value=(0, STATUS_OK)):
+            resultado = executar_verificacao(session, 'http://erp', 'MONITOR', 'senha', 300, prazo=Prazo(5))
+
+        self.assertEqual(resultado['codigo'], 0)
+        timeouts = [chamada.kwargs['timeout'] for chamada in session.post.call_args_list]
+        self.assertTrue(all(0 < timeout <= 5 for timeout in timeouts), timeouts)
+
+    def test_timeout_de_rede_nomeia_a_fase(self):
+        """Um timeout que esgota o prazo vira STATUS_PROBLEMA com a fase e as já concluídas."""
+        prazo = Prazo(1)
+
+        def post(url, **kwargs):
+            if 'carregaVista' in url:
+                prazo.fim = prazo.inicio  # o timeout consumiu o restante do prazo
+                raise requests.exceptions.ReadTimeout("read timed out")
+            return self._resposta("preencheSessao('tk')")
+
+        session = Mock()
+        session.post.side_effect = post
+
+        resultado = executar_verificacao(session, 'http://erp', 'MONITOR', 'senha', 300, prazo=prazo)
+
+        self.assertEqual(resultado['codigo'], 1)
+        self.assertEqual(resultado['prazo_esgotado'], 'busca')
+        self.assertRegex(resultado['saida'], r"^STATUS_PROBLEMA: Prazo de 1s esgotado na fase busca apos .*\(concluido: login ")
+
+    def test_prazo_esgotado_nao_faz_requisicoes(self):
+        """Sem tempo restante, o login nem é tentado."""
+        session = Mock()
+
+        resultado = executar_verificacao(session, 'http://erp', 'MONITOR', 'senha', 300,
+                                         prazo=Prazo(2, inicio=time.perf_counter() - 3))
+
+        self.assertTrue(resultado['saida'].startswith("STATUS_PROBLEMA: Prazo de 2s esgotado na fase login"))
+        session.post.assert_not_called()
+
+    def test_prazo_conferido_entre_pedacos(self):
+        """No modo em fluxo, o prazo é conferido a cada pedaço recebido."""
+        prazo = Prazo(10)
+        html = _html_grade([['1', 'FILIAL A', '14/11/2025', '09:20:00', '']])
+        resposta = _resposta_fluxo(html, tamanho=20)
+        pedacos = resposta.iter_content.side_effect
+
+        def iter_content(**kwargs):
+            for i, pedaco in enumerate(pedacos(**kwargs)):
+                if i == 2:
+                    prazo.fim = prazo.inicio
+                yield pedaco
+
+        resposta.iter_content.side_effect = iter_content
+        session = Mock()
+        session.post.return_value = resposta
+
+        resultado = executar_verificacao(session, 'http://erp', 'MONITOR', 'senha', 300, token='tk',
+                                         fluxo=True, prazo=prazo)
+
+        self.assertEqual(resultado['prazo_esgotado'], 'busca')
+        resposta.close.assert_called_once_with()
+        # O prazo vale só para a verificação: chamadas seguintes não são afetadas
+        self.assertIsNone(check_sincronismo.prazo_atual.get())
+
+
+class TestResumoLog(unittest.TestCase):
+    """Testes do log da análise: resumo por execução e detalhe por linha só em DEBUG."""
+
+    def setUp(self):
+        self.html = _html_grade([[str(i), f'FILIAL {i}', '14/11/2025', '09:20:00', f'Erro {i}' if i <= 8 else '']
+                                 for i in range(1, 21)])
+
+    def test_resumo_com_amostras(self):
+        """Em INFO, uma linha resume contagens e as primeiras mensagens de log."""
+        with self.assertLogs('zabbix_erp_sincronismo', level='INFO') as logs:
+            dados = parse_status_page(self.html)
+
+        self.assertEqual(len(dados['logs_filial']), 8)
+        resumos = [linha for linha in logs.output if 'Analisadas 20 linhas: 8 com log' in linha]
+        self.assertEqual(len(resumos), 1)
+        self.assertIn("'Erro 5' e mais 3", resumos[0])
+        self.assertFalse([linha for linha in logs.output if 'Linha ' in linha])
+
+    def test_detalhe_por_linha_em_debug(self):
+        """Em DEBUG (--trace), cada linha da grade aparece no log."""
+        with self.assertLogs('zabbix_erp_sincronismo', level='DEBUG') as logs:
+            parse_status_page(self.html)
+
+        self.assertEqual(len([linha for linha in logs.output if 'data/hora de envio' in linha]), 20)
+        self.assertIn("DEBUG:zabbix_erp_sincronismo:Linha 8: Log com conteúdo encontrado: 'Erro 8'", logs.output)
+
+
+class TestMedicaoFases(unittest.TestCase):
+    """Testes da medição por fase (--phase-timing)."""
+
+    def _resposta(self, texto):
+        resposta = Mock()
+        resposta.text = texto
+        resposta.content = texto.encode('utf-8')
+        resposta.status_code = 200
+        resposta.raise_for_status.return_value = None
+        return resposta
+
+    def test_fase_aninhada_pausa_a_externa(self):
+        """O tempo de uma fase aninhada não é contado também na externa."""
+        medicao = MedicaoFases()
+        with medicao.medir('login'):
+            time.sleep(0.02)
+            with medicao.medir('empresa'):
+                time.sleep(0.05)
+                medicao.contabilizar(bytes_recebidos=10)
+            medicao.contabilizar(bytes_recebidos=3)
+
+        fases = medicao.fases
+        self.assertGreaterEqual(fases['empresa']['parede_s'], 0.05)
+        self.assertLess(fases['login']['parede_s'], 0.05)
+        self.assertEqual((fases['login']['bytes'], fases['empresa']['bytes']), (3, 10))
+        self.assertIn('empresa', medicao.descrever())
+
+    def test_verificacao_com_medicao(self):
+        """Bytes de cada resposta e linhas analisadas aparecem por fase no resultado e no JSON."""
+        login = ("<div class='titulo'>Selecione a Empresa</div><table id='tblBody' class='tEmpresas'>"
+                 "<tr><th>Código</th><th>Empresa</th></tr><tr><td>1</td><td>EMPRESA 1</td></tr></table>")
+        empresa = "preencheSessao('tk')"
+        agora = datetime.now()
+        grade = _html_grade([[codigo, f'FILIAL {codigo}', agora.strftime('%d/%m/%Y'), agora.strftime('%H:%M:%S'), '']
+                             for codigo in ('1', '2')])
+        session = Mock()
+        session.post.side_effect = [self._resposta(login), self._resposta(empresa), self._resposta(grade)]
+
+        resultado = executar_verificacao(session, 'http://erp', 'MONITOR', 'senha', 300, medir_fases=True)
+
+        self.assertEqual(resultado['codigo'], 0, resultado['saida'])
+        fases = resultado['fases']
+        self.assertEqual(set(fases), {'login', 'empresa', 'busca', 'analise'})
+        self.assertEqual(fases['login']['bytes'], len(login.encode('utf-8')))
+        self.assertEqual(fases['empresa']['bytes'], len(empresa))
+        self.assertEqual(fases['busca']['bytes'], len(grade.encode('utf-8')))
+        self.assertEqual(fases['analise']['linhas'], 2)
+        # 'tempos' é a parede da mesma medição, mais o total
+        self.assertEqual(set(resultado['tempos']), set(fases) | {'total'})
+        for fase, dados in fases.items():
+            self.assertAlmostEqual(resultado['tempos'][fase], dados['parede_s'], places=4)
+        documento = json.loads(formatar_saida(resultado, 'json')[1])
+        self.assertEqual(documento['fases']['analise']['linhas'], 2)
+
+    def test_desativada_por_padrao(self):
+        """Sem ``medir_fases`` o resultado não traz 'fases' e as respostas não são medidas."""
+        session = Mock()
+        session.post.side_effect = [Mock(text="preencheSessao('tk')", status_code=200),
+                                    Mock(text="<table id='tblBody'></table>", status_code=200)]
+
+        with patch('check_sincronismo.parse_status_page'), \
+                patch('check_sincronismo.avaliar_status', return_value=(0, STATUS_OK)):
+            resultado = executar_verificacao(session, 'http://erp', 'MONITOR', 'senha', 300)
+
+        self.assertEqual(resultado['codigo'], 0)
+        self.assertNotIn('fases', resultado)
+        self.assertEqual(set(resultado['tempos']), {'login', 'busca', 'analise', 'total'})
+        self.assertIsNone(check_sincronismo.medicao_atual.get())
+
+
+class TestInicializacao(unittest.TestCase):
+    """Testes da partida a frio: dependências pesadas só são importadas sob demanda."""
+
+    def test_importacao_nao_carrega_dependencias_pesadas(self):
+        """Importar o módulo não importa requests, bs4, lxml nem dotenv."""
+        import subprocess
+        codigo = ("import sys, json, check_sincronismo; "
+                  "print(json.dumps([m for m in ('requests', 'bs4', 'lxml', 'dotenv') if m in sys.modules]))")
+        saida = subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True, check=True,
+                               cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(json.loads(saida.stdout), [])
+
+    def test_relatorio_inicializacao(self):
+        """O relatório lista a importação do módulo, as adiadas, as fases e o total."""
+        with patch.dict(check_sincronismo.importacoes_adiadas, {'requests': 0.1}, clear=True):
+            relatorio = check_sincronismo.relatorio_inicializacao({'busca': 0.25})
+
+        self.assertIn('importacao do modulo', relatorio)
+        self.assertIn('100.0 | importacao sob demanda: requests', relatorio)
+        self.assertIn('250.0 | fase busca', relatorio)
+        self.assertTrue(relatorio.splitlines()[-1].endswith('total desde a importacao'))
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
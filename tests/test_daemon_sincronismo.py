@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Testes do daemon residente e do cliente via socket UNIX.
+"""
+
+import io
+import os
+import sys
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+# Adiciona o diretório pai ao path para importar os módulos
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import daemon_sincronismo
+from daemon_sincronismo import ServidorVerificacao
+import cliente_sincronismo
+from cliente_sincronismo import (
+    consultar_daemon, timeout_cliente, DaemonIndisponivelError, EXIT_DAEMON_INDISPONIVEL, MARGEM_PRAZO, TIMEOUT_PADRAO
+)
+from check_sincronismo import executar_verificacao, STATUS_OK
+
+
+class TestDaemonSincronismo(unittest.TestCase):
+    """Testes de ponta a ponta entre cliente e daemon."""
+
+    def setUp(self):
+        """Sobe o daemon em um socket temporário."""
+        self.diretorio = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'SINCRONISMO_CACHE_DIR': os.path.join(self.diretorio, 'cache')})
+        self.env.start()
+        self.caminho_socket = os.path.join(self.diretorio, 'run', 'teste.sock')
+        self.servidor = ServidorVerificacao(self.caminho_socket, 'senha')
+        self.thread = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+        self.env.stop()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def test_reaproveita_token_entre_verificacoes(self):
+        """O token devolvido por uma verificação é reutilizado na seguinte."""
+        argv = ['--url', 'http://erp', '--username', 'MONITOR', '--max-delay', '300']
+        with patch.object(daemon_sincronismo, 'executar_verificacao') as verificacao:
+            verificacao.return_value = {'codigo': 0, 'saida': STATUS_OK, 'token': 'tk1'}
+            primeira = consultar_daemon(argv, self.caminho_socket)
+            segunda = consultar_daemon(argv, self.caminho_socket)
+
+        self.assertEqual(primeira, {'codigo': 0, 'saida': STATUS_OK})
+        self.assertEqual(segunda, {'codigo': 0, 'saida': STATUS_OK})
+        self.assertIsNone(verificacao.call_args_list[0].kwargs['token'])
+        self.assertEqual(verificacao.call_args_list[1].kwargs['token'], 'tk1')
+        # A mesma sessão HTTP é usada nas duas chamadas
+        self.assertIs(verificacao.call_args_list[0].args[0], verificacao.call_args_list[1].args[0])
+
+    def test_parametros_invalidos(self):
+        """Argumentos que o parser rejeita geram STATUS_PROBLEMA sem derrubar o daemon."""
+        resposta = consultar_daemon(['--max-delay', 'abc'], self.caminho_socket)
+        self.assertEqual(resposta['codigo'], 1)
+        self.assertIn('Parametros invalidos', resposta['saida'])
+
+    def test_falha_inesperada_responde_status_problema(self):
+        """Uma exceção na verificação vira STATUS_PROBLEMA e é registrada no log."""
+        argv = ['--url', 'http://erp', '--username', 'MONITOR', '--max-delay', '300']
+        with patch.object(self.servidor, 'verificar_alvo', side_effect=RuntimeError('banco travado')), \
+                self.assertLogs('zabbix_erp_sincronismo', level='ERROR') as logs:
+            resposta = consultar_daemon(argv, self.caminho_socket)
+
+        self.assertEqual(resposta['codigo'], 1)
+        self.assertIn('Falha inesperada no daemon: banco travado', resposta['saida'])
+        self.assertIn('RuntimeError', logs.output[0])
+
+    def test_verificacao_alimenta_metricas(self):
+        """O resultado de cada verificação fica disponível para o /metrics."""
+        argv = ['--url', 'http://erp', '--username', 'MONITOR', '--max-delay', '300']
+        with patch.object(daemon_sincronismo, 'executar_verificacao') as verificacao:
+            verificacao.return_value = {'codigo': 1, 'saida': 'STATUS_PROBLEMA: x', 'token': None}
+            consultar_daemon(argv, self.caminho_socket)
+
+        texto = self.servidor.metricas.renderizar()
+        self.assertIn('erp_sincronismo_status_ok{alvo="http://erp",usuario="MONITOR"} 0', texto)
+        self.assertEqual(verificacao.call_count, 1)
+
+    def test_configuracao_com_aiohttp_avisa(self):
+        """Com --config, --http-engine aiohttp é ignorado pelo daemon com aviso no log."""
+        caminho = os.path.join(self.diretorio, 'alvos.toml')
+        with open(caminho, 'w') as f:
+            f.write('[[alvo]]\nnome = "a"\nurl = "http://erp"\nusuario = "MONITOR"\nsenha = "x"\nmax_delay = 300\n')
+        argv = ['--config', caminho, '--http-engine', 'aiohttp']
+        with patch.object(daemon_sincronismo, 'executar_verificacao') as verificacao, \
+                self.assertLogs('zabbix_erp_sincronismo', level='WARNING') as logs:
+            verificacao.return_value = {'codigo': 0, 'saida': STATUS_OK, 'token': 'tk1'}
+            resposta = consultar_daemon(argv, self.caminho_socket)
+
+        self.assertEqual(resposta['codigo'], 0)
+        self.assertEqual(verificacao.call_count, 1)
+        self.assertIn('--http-engine aiohttp não vale no daemon', logs.output[0])
+
+    def test_socket_ativo_nao_e_sobrescrito(self):
+        """Um segundo daemon no mesmo caminho é recusado."""
+        with self.assertRaises(RuntimeError):
+            ServidorVerificacao(self.caminho_socket, 'senha')
+
+    def test_cliente_sem_daemon(self):
+        """O cliente sinaliza daemon indisponível quando não há socket."""
+        with self.assertRaises(DaemonIndisponivelError):
+            consultar_daemon([], os.path.join(self.diretorio, 'inexistente.sock'))
+
+    def test_timeout_do_cliente_segue_o_prazo(self):
+        """A espera do cliente fica logo acima do --deadline e abaixo do Timeout do Zabbix."""
+        self.assertEqual(timeout_cliente(['--deadline', '10'], {}), 10 + MARGEM_PRAZO)
+        self.assertEqual(timeout_cliente(['--deadline=8'], {'CHECK_DEADLINE': '20'}), 8 + MARGEM_PRAZO)
+        self.assertEqual(timeout_cliente([], {'CHECK_DEADLINE': '20'}), 20 + MARGEM_PRAZO)
+        self.assertEqual(timeout_cliente(['--deadline', 'abc'], {}), TIMEOUT_PADRAO)
+        self.assertEqual(timeout_cliente(['--deadline', '10'], {'SINCRONISMO_CLIENTE_TIMEOUT': '3'}), 3)
+        self.assertLess(TIMEOUT_PADRAO, 30)
+
+    def test_daemon_travado_cai_para_a_execucao_avulsa(self):
+        """Sem resposta dentro da espera, o cliente sai com 75 para o wrapper executar o check avulso."""
+        caminho = os.path.join(self.diretorio, 'travado.sock')
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as travado:
+            # Aceita a conexão no backlog, mas nunca responde
+            travado.bind(caminho)
+            travado.listen(1)
+            with patch.dict(os.environ, {'SINCRONISMO_SOCKET': caminho, 'SINCRONISMO_CLIENTE_TIMEOUT': '0.2'}), \
+                    patch.object(sys, 'argv', ['cliente_sincronismo.py', '--max-delay', '300']), \
+                    patch('sys.stdout', new_callable=io.StringIO) as saida, \
+                    self.assertRaises(SystemExit) as saida_processo:
+                cliente_sincronismo.main()
+
+        self.assertEqual(saida_processo.exception.code, EXIT_DAEMON_INDISPONIVEL)
+        self.assertEqual(saida.getvalue(), '')
+
+
+class TestExecutarVerificacao(unittest.TestCase):
+    """Testes do reaproveitamento de token em executar_verificacao."""
+
+    def _resposta(self, texto, status_code=200):
+        resposta = Mock()
+        resposta.text = texto
+        resposta.status_code = status_code
+        resposta.raise_for_status.return_value = None
+        return resposta
+
+    @patch('check_sincronismo.parse_status_page')
+    @patch('check_sincronismo.avaliar_status', return_value=(0, STATUS_OK))
+    def test_token_recusado_refaz_login(self, _avaliar, _parse):
+        """Quando o ERP devolve a tela de login, o token é renovado e a busca repetida."""
+        session = Mock()
+        session.post.side_effect = [
+            self._resposta("<html>Tecnicon.EfetuaLogin.obterTelaHtml</html>"),
+            self._resposta("preencheSessao('novo_token')"),
+            self._resposta("<table id='tblBody'></table>"),
+        ]
+
+        resultado = executar_verificacao(session, 'http://erp', 'MONITOR', 'senha', 300, token='velho')
+
+        self.assertEqual(resultado['codigo'], 0)
+        self.assertEqual(resultado['token'], 'novo_token')
+        self.assertEqual(session.post.call_count, 3)
+
+    @patch('check_sincronismo.parse_status_page')
+    @patch('check_sincronismo.avaliar_status', return_value=(0, STATUS_OK))
+    def test_token_valido_evita_login(self, _avaliar, _parse):
+        """Com token aceito, apenas a busca da vista é feita."""
+        session = Mock()
+        session.post.return_value = self._resposta("<table id='tblBody'></table>")
+
+        resultado = executar_verificacao(session, 'http://erp', 'MONITOR', 'senha', 300, token='valido')
+
+        self.assertEqual(resultado['token'], 'valido')
+        self.assertEqual(session.post.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Testes do disjuntor (circuit breaker) por alvo.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import unittest
+from unittest.mock import Mock, patch
+
+# Adiciona o diretório pai ao path para importar os módulos
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from disjuntor_sincronismo import Disjuntor, ESTADO_FECHADO, ESTADO_ABERTO, ESTADO_MEIO_ABERTO
+from check_sincronismo import executar_com_disjuntor, STATUS_OK
+
+FALHA = {'codigo': 1, 'saida': 'STATUS_PROBLEMA: Erro de conexao ao tentar logar: recusada', 'erp_indisponivel': True}
+SUCESSO = {'codigo': 0, 'saida': STATUS_OK, 'erp_indisponivel': False}
+
+
+class TestDisjuntor(unittest.TestCase):
+    """Testes das transições fechado → aberto → meio aberto → fechado."""
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'SINCRONISMO_CACHE_DIR': self.diretorio})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def _disjuntor(self):
+        # Uma instância por "execução", como processos distintos do Zabbix
+        return Disjuntor('http://erp', 'MONITOR', limiar=3, resfriamento=60)
+
+    def test_abre_apos_limiar_de_falhas_seguidas(self):
+        """Falhas seguidas abrem o circuito; um sucesso no meio zera a contagem."""
+        for resultado in (FALHA, FALHA, SUCESSO, FALHA, FALHA):
+            self._disjuntor().registrar(resultado, agora=1000)
+        self.assertEqual(self._disjuntor().estado()['estado'], ESTADO_FECHADO)
+
+        self._disjuntor().registrar(FALHA, agora=1000)
+
+        self.assertEqual(self._disjuntor().estado()['estado'], ESTADO_ABERTO)
+        mensagem = self._disjuntor().permitir(agora=1030)
+        self.assertIn('circuito aberto apos 3 falha(s)', mensagem)
+        self.assertIn('ultima: Erro de conexao ao tentar logar', mensagem)
+        self.assertIn('nova tentativa em 30s', mensagem)
+
+    def test_uma_sonda_por_resfriamento(self):
+        """Passado o resfriamento, só uma execução consulta o ERP; a falha reabre o circuito."""
+        for _ in range(3):
+            self._disjuntor().registrar(FALHA, agora=1000)
+
+        sonda = self._disjuntor()
+        self.assertIsNone(sonda.permitir(agora=1061))
+        self.assertEqual(sonda.estado()['estado'], ESTADO_MEIO_ABERTO)
+        self.assertIsNotNone(self._disjuntor().permitir(agora=1062))
+
+        sonda.registrar(FALHA, agora=1065)
+        self.assertEqual(self._disjuntor().estado()['estado'], ESTADO_ABERTO)
+        self.assertIsNotNone(self._disjuntor().permitir(agora=1100))
+
+        sonda = self._disjuntor()
+        self.assertIsNone(sonda.permitir(agora=1126))
+        sonda.registrar(SUCESSO, agora=1127)
+        self.assertEqual(self._disjuntor().estado(), {'estado': ESTADO_FECHADO, 'falhas': 0})
+
+    def test_sonda_sem_resultado_libera_outra(self):
+        """Uma sonda que não registra resultado não trava o circuito para sempre."""
+        for _ in range(3):
+            self._disjuntor().registrar(FALHA, agora=1000)
+        self.assertIsNone(self._disjuntor().permitir(agora=1060))
+        # Resultado neutro (falha publicada por outra execução): estado inalterado
+        self._disjuntor().registrar({'codigo': 1, 'saida': 'STATUS_PROBLEMA: x'}, agora=1061)
+
+        self.assertIsNotNone(self._disjuntor().permitir(agora=1100))
+        self.assertIsNone(self._disjuntor().permitir(agora=1121))
+
+    def test_circuito_aberto_nao_executa_a_verificacao(self):
+        """Com o circuito aberto, a verificação não é chamada e a saída é imediata."""
+        for _ in range(3):
+            self._disjuntor().registrar(FALHA)
+        verificar = Mock(return_value=SUCESSO)
+
+        resultado = executar_com_disjuntor(self._disjuntor(), verificar)
+
+        verificar.assert_not_called()
+        self.assertEqual((resultado['codigo'], resultado['circuito']), (1, 'aberto'))
+        self.assertTrue(resultado['saida'].startswith('STATUS_PROBLEMA: ERP indisponivel'))
+
+    def test_estado_ilegivel_equivale_a_fechado(self):
+        """Arquivo de estado corrompido ou desconhecido não bloqueia a verificação."""
+        disjuntor = self._disjuntor()
+        with open(disjuntor.caminho, 'w') as f:
+            f.write('{"estado": "xyz"}')
+        self.assertIsNone(disjuntor.permitir())
+
+    def test_linha_de_comando_com_circuito_aberto(self):
+        """O script responde sem consultar a rede nem importar o requests."""
+        disjuntor = self._disjuntor()
+        for _ in range(3):
+            disjuntor.registrar(FALHA)
+        codigo = ("import sys, runpy; sys.argv = ['check_sincronismo.py', '--url', 'http://erp', "
+                  "'--username', 'MONITOR', '--max-delay', '300']; "
+                  "exec('try:\\n runpy.run_path(\"check_sincronismo.py\", run_name=\"__main__\")\\n"
+                  "except SystemExit as e:\\n print(e.code, \"requests\" in sys.modules)')")
+        env = dict(os.environ, ERP_PASSWORD='senha')
+        saida = subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True, cwd=RAIZ, env=env)
+
+        linhas = saida.stdout.strip().splitlines()
+        self.assertTrue(linhas[0].startswith('STATUS_PROBLEMA: ERP indisponivel, circuito aberto'), saida)
+        self.assertEqual(linhas[1], '1 False')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Testes do envio ao Zabbix pelo protocolo do trapper, com um trapper falso local.
+"""
+
+import os
+import sys
+import json
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import socketserver
+import unittest
+from unittest.mock import patch
+
+# Adiciona o diretório pai ao path para importar os módulos
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from envio_sincronismo import (
+    montar_pacote, ler_pacote, enviar_com_spool, separar_servidor, interpretar_info, PORTA_ZABBIX_PADRAO,
+    TENTATIVAS_MAXIMAS_SPOOL
+)
+from check_sincronismo import valores_zabbix
+
+
+class ManipuladorTrapper(socketserver.BaseRequestHandler):
+    """Lê um pacote ZBXD e responde como o Zabbix server."""
+
+    def handle(self):
+        pedido = ler_pacote(self.request)
+        self.server.pacotes.append(pedido)
+        total = len(pedido['data'])
+        if self.server.recusar and self.server.recusar(pedido):
+            self.request.sendall(montar_pacote({'response': 'failed', 'info': 'invalid request'}))
+            return
+        self.request.sendall(montar_pacote(self.server.resposta or {
+            'response': 'success',
+            'info': f"processed: {total}; failed: 0; total: {total}; seconds spent: 0.000100",
+        }))
+
+
+class TrapperFalso(socketserver.ThreadingTCPServer):
+    """Trapper do Zabbix em 127.0.0.1 que guarda os pacotes recebidos."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, resposta=None, recusar=None):
+        self.pacotes = []
+        self.resposta = resposta
+        # recusar(pedido) -> True responde 'failed' a esse pacote
+        self.recusar = recusar
+        super().__init__(('127.0.0.1', 0), ManipuladorTrapper)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def fechar(self):
+        self.shutdown()
+        self.server_close()
+
+
+def _porta_fechada():
+    """Porta local sem ninguém escutando."""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class TestEnvioZabbix(unittest.TestCase):
+    """Testes do pacote ZBXD, do lote único por execução e do spool em disco."""
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'SINCRONISMO_CACHE_DIR': self.diretorio})
+        self.env.start()
+        self.spool = os.path.join(self.diretorio, 'spool')
+
+    def tearDown(self):
+        self.env.stop()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def _valores(self, valor='STATUS_OK'):
+        return [{'host': 'erp', 'key': 'erp.sincronismo.status', 'value': valor, 'clock': 1700000000}]
+
+    def _lotes(self):
+        return sorted(n for n in os.listdir(self.spool) if n.startswith('lote_'))
+
+    def test_formato_do_pacote(self):
+        """Cabeçalho ZBXD, flag 0x01 e tamanho little-endian do corpo JSON."""
+        pacote = montar_pacote({'request': 'sender data', 'data': []})
+        corpo = json.dumps({'request': 'sender data', 'data': []}).encode('utf-8')
+
+        self.assertEqual(pacote[:5], b'ZBXD\x01')
+        self.assertEqual(struct.unpack('<II', pacote[5:13]), (len(corpo), 0))
+        self.assertEqual(pacote[13:], corpo)
+
+    def test_execucao_vai_em_um_unico_pacote(self):
+        """Status, documento JSON e descoberta seguem juntos para o trapper."""
+        resultado = {
+            'codigo': 0, 'saida': 'STATUS_OK', 'tempos': {},
+            'status_data': {'filiais': [{'codigo': '4', 'filial': 'MATRIZ', 'ultimo_envio': None,
+                                         'ultimo_recebimento': None, 'log': ''}],
+                            'logs_filial': [], 'total_linhas': 1},
+        }
+        trapper = TrapperFalso()
+        try:
+            totais = enviar_com_spool('127.0.0.1', trapper.server_address[1],
+                                      valores_zabbix(resultado, 'erp-host', clock=1700000000))
+        finally:
+            trapper.fechar()
+
+        self.assertEqual(len(trapper.pacotes), 1)
+        pacote = trapper.pacotes[0]
+        self.assertEqual(pacote['request'], 'sender data')
+        self.assertEqual([v['key'] for v in pacote['data']],
+                         ['erp.sincronismo.status', 'erp.sincronismo.json', 'erp.sincronismo.discovery'])
+        self.assertTrue(all(v['host'] == 'erp-host' and v['clock'] == 1700000000 for v in pacote['data']))
+        self.assertEqual(json.loads(pacote['data'][2]['value']), {'data': [{'{#CODLOCAL}': '4', '{#FILIAL}': 'MATRIZ'}]})
+        self.assertEqual(totais['processed'], 3)
+
+    def test_servidor_inacessivel_guarda_no_spool(self):
+        """Sem servidor, o lote vai para o spool e segue, em pacote próprio, depois do próximo envio."""
+        self.assertIsNone(enviar_com_spool('127.0.0.1', _porta_fechada(), self._valores('STATUS_PROBLEMA: x')))
+        self.assertEqual(len(self._lotes()), 1)
+
+        trapper = TrapperFalso()
+        try:
+            totais = enviar_com_spool('127.0.0.1', trapper.server_address[1], self._valores())
+        finally:
+            trapper.fechar()
+
+        self.assertEqual([[v['value'] for v in pacote['data']] for pacote in trapper.pacotes],
+                         [['STATUS_OK'], ['STATUS_PROBLEMA: x']])
+        self.assertEqual(totais['processed'], 1)
+        self.assertEqual(self._lotes(), [])
+
+    def test_spool_limitado(self):
+        """Acima do limite, os lotes mais antigos são descartados."""
+        porta = _porta_fechada()
+        for i in range(3):
+            enviar_com_spool('127.0.0.1', porta, self._valores(f'v{i}'), maximo=2)
+
+        lotes = self._lotes()
+        self.assertEqual(len(lotes), 2)
+        with open(os.path.join(self.spool, lotes[0]), encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['valores'][0]['value'], 'v1')
+
+    def test_resposta_de_falha_guarda_no_spool(self):
+        """Uma resposta diferente de 'success' não descarta os valores."""
+        trapper = TrapperFalso(resposta={'response': 'failed', 'info': 'invalid request'})
+        try:
+            self.assertIsNone(enviar_com_spool('127.0.0.1', trapper.server_address[1], self._valores()))
+        finally:
+            trapper.fechar()
+        self.assertEqual(len(self._lotes()), 1)
+
+    def test_lote_sempre_recusado_nao_prende_os_seguintes(self):
+        """Um lote do spool que o servidor sempre recusa é descartado e não atrasa os valores atuais."""
+        porta = _porta_fechada()
+        enviar_com_spool('127.0.0.1', porta, self._valores('ruim'))
+
+        trapper = TrapperFalso(recusar=lambda pedido: any(v['value'] == 'ruim' for v in pedido['data']))
+        try:
+            with self.assertLogs('zabbix_erp_sincronismo', level='WARNING') as logs:
+                for i in range(TENTATIVAS_MAXIMAS_SPOOL):
+                    totais = enviar_com_spool('127.0.0.1', trapper.server_address[1], self._valores(f'v{i}'))
+                    self.assertEqual(totais['processed'], 1)
+        finally:
+            trapper.fechar()
+
+        entregues = [pacote['data'][0]['value'] for pacote in trapper.pacotes if pacote['data'][0]['value'] != 'ruim']
+        self.assertEqual(entregues, [f'v{i}' for i in range(TENTATIVAS_MAXIMAS_SPOOL)])
+        self.assertEqual(self._lotes(), [])
+        self.assertIn(f'após {TENTATIVAS_MAXIMAS_SPOOL} recusas', logs.output[-1])
+
+    def test_lote_antigo_do_spool(self):
+        """Lotes gravados como lista simples (versão anterior) continuam sendo reenviados."""
+        os.makedirs(self.spool)
+        with open(os.path.join(self.spool, 'lote_00000000000000000001_1.json'), 'w', encoding='utf-8') as f:
+            json.dump(self._valores('antigo'), f)
+
+        trapper = TrapperFalso()
+        try:
+            enviar_com_spool('127.0.0.1', trapper.server_address[1], self._valores())
+        finally:
+            trapper.fechar()
+        self.assertEqual(trapper.pacotes[1]['data'][0]['value'], 'antigo')
+        self.assertEqual(self._lotes(), [])
+
+    def test_separar_servidor(self):
+        """Aceita host, host:porta e IPv6 entre colchetes."""
+        self.assertEqual(separar_servidor('zabbix'), ('zabbix', PORTA_ZABBIX_PADRAO))
+        self.assertEqual(separar_servidor('zabbix:10052'), ('zabbix', 10052))
+        self.assertEqual(separar_servidor('[::1]:10051'), ('::1', 10051))
+
+    def test_interpretar_info(self):
+        """Os totais do campo info viram números."""
+        self.assertEqual(interpretar_info("processed: 2; failed: 1; total: 3; seconds spent: 0.000055"),
+                         {'processed': 2, 'failed': 1, 'total': 3, 'seconds_spent': 0.000055})
+
+
+if __name__ == '__main__':
+    unittest.main()
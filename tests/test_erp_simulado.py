@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Testes de ponta a ponta da verificação contra o ERP simulado (benchmarks/erp_simulado.py).
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import requests
+
+# Adiciona o diretório pai ao path para importar os módulos
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, 'benchmarks'))
+
+from check_sincronismo import executar_verificacao, STATUS_OK
+from erp_simulado import ERPSimulado, ServidorERPSimulado, ERRO_HTTP500, ERRO_QUEDA
+
+
+class TestERPSimulado(unittest.TestCase):
+    """Login, seleção de empresa, vista, expiração de token e falhas injetadas."""
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'SINCRONISMO_CACHE_DIR': self.diretorio})
+        self.env.start()
+        self.servidor = None
+
+    def tearDown(self):
+        if self.servidor:
+            self.servidor.encerrar()
+        self.env.stop()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def _subir(self, **opcoes):
+        self.erp = ERPSimulado(**opcoes)
+        self.servidor = ServidorERPSimulado(self.erp).iniciar()
+        return self.servidor.url
+
+    def _verificar(self, url, token=None, **opcoes):
+        with requests.Session() as session:
+            return executar_verificacao(session, url, 'MONITOR', 'senha', 300, token=token, **opcoes)
+
+    def test_login_com_selecao_de_empresa(self):
+        """A verificação completa passa pela tela de empresas e analisa a grade."""
+        url = self._subir(linhas=50, empresas=['17', '22'], usuario='MONITOR', senha='senha')
+
+        resultado = self._verificar(url, vista={'empresa': '22'})
+
+        self.assertEqual(resultado['saida'], STATUS_OK)
+        self.assertTrue(resultado['token'].startswith('22-'))
+        self.assertEqual(resultado['status_data']['total_linhas'], 50)
+        self.assertEqual(self.erp.estatisticas()['empresa'], 1)
+
+    def test_token_expirado_refaz_login(self):
+        """Depois de ``token_ttl`` a vista devolve a tela de login e o cliente refaz o login."""
+        url = self._subir(linhas=5, token_ttl=0.2)
+        primeiro = self._verificar(url)
+
+        self.assertEqual(self._verificar(url, token=primeiro['token'])['token'], primeiro['token'])
+        time.sleep(0.3)
+        terceiro = self._verificar(url, token=primeiro['token'])
+
+        self.assertEqual(terceiro['saida'], STATUS_OK)
+        self.assertNotEqual(terceiro['token'], primeiro['token'])
+        estatisticas = self.erp.estatisticas()
+        self.assertEqual((estatisticas['login'], estatisticas['tokens_expirados']), (2, 1))
+
+    def test_falhas_injetadas(self):
+        """HTTP 500 na vista e conexão encerrada no login viram STATUS_PROBLEMA."""
+        url = self._subir(linhas=5, erros={ERRO_HTTP500: 1}, fases_com_erro=['vista'])
+        resultado = self._verificar(url)
+        self.assertIn('500', resultado['saida'])
+        self.assertTrue(resultado['erp_indisponivel'])
+        self.servidor.encerrar()
+
+        url = self._subir(erros={ERRO_QUEDA: 1})
+        resultado = self._verificar(url)
+        self.assertTrue(resultado['saida'].startswith('STATUS_PROBLEMA: Erro de conexao ao tentar logar'))
+
+    def test_latencia_configurada(self):
+        """A latência configurada para a vista atrasa a resposta."""
+        url = self._subir(linhas=5, latencia_vista=0.3)
+        inicio = time.perf_counter()
+        self.assertEqual(self._verificar(url)['saida'], STATUS_OK)
+        self.assertGreaterEqual(time.perf_counter() - inicio, 0.3)
+
+    def test_modo_de_erro_desconhecido(self):
+        """Modos de erro inválidos são recusados na criação."""
+        with self.assertRaises(ValueError):
+            ERPSimulado(erros={'x': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Testes do histórico local das verificações (SQLite).
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from datetime import datetime
+
+# Adiciona o diretório pai ao path para importar os módulos
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from historico_sincronismo import HistoricoSincronismo, INTERVALO_MANUTENCAO
+from check_sincronismo import registrar_historico, STATUS_OK
+
+# 15/11/2025 12:00 (horário local)
+AGORA = datetime(2025, 11, 15, 12, 0, 0).timestamp()
+ALVO = 'MONITOR@http://erp'
+
+
+def _resultado(envios, logs=None, codigo=0, atraso=60.0, busca=0.5):
+    """Resultado de executar_verificacao com uma filial por item de ``envios`` (código: ISO)."""
+    logs = logs or {}
+    filiais = [{'codigo': codigo_filial, 'filial': f'FILIAL {codigo_filial}', 'ultimo_envio': envio,
+                'ultimo_recebimento': None, 'log': logs.get(codigo_filial, '')}
+               for codigo_filial, envio in envios.items()]
+    return {
+        'codigo': codigo, 'saida': STATUS_OK if codigo == 0 else 'STATUS_PROBLEMA: x',
+        'atraso_segundos': atraso, 'ultimo_envio': max(envios.values()),
+        'tempos': {'login': 0.1, 'busca': busca, 'analise': 0.02, 'total': busca + 0.12},
+        'status_data': {'total_linhas': len(filiais), 'logs_filial': [log for log in logs.values() if log],
+                        'filiais': filiais},
+    }
+
+
+class TestHistoricoSincronismo(unittest.TestCase):
+    """Gravação, consultas, envios das filiais e resumo horário."""
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.caminho = os.path.join(self.diretorio, 'historico.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def test_observacao_completa(self):
+        """Cada verificação vira uma observação com atraso, logs e tempos por fase."""
+        resultado = _resultado({'1': '2025-11-15T11:59:00'}, logs={'1': 'XML inválido'}, codigo=1)
+        resultado['fases'] = {'busca': {'parede_s': 0.5, 'cpu_s': 0.01, 'bytes': 1000, 'linhas': 0}}
+        with HistoricoSincronismo(self.caminho) as historico:
+            historico.registrar(ALVO, resultado, agora=AGORA)
+            observacoes = historico.observacoes(ALVO)
+            alvos = historico.alvos()
+
+        self.assertEqual(len(observacoes), 1)
+        observacao = observacoes[0]
+        self.assertEqual((observacao['codigo'], observacao['atraso_segundos'], observacao['total_linhas']), (1, 60.0, 1))
+        self.assertEqual(observacao['ultimo_envio'], datetime(2025, 11, 15, 11, 59).timestamp())
+        self.assertEqual(observacao['logs_filial'], ['XML inválido'])
+        self.assertEqual(observacao['tempos']['busca'], 0.5)
+        self.assertEqual(observacao['tempos']['fases']['busca'], {'cpu_s': 0.01, 'bytes': 1000, 'linhas': 0})
+        self.assertEqual(alvos, [{'alvo': ALVO, 'ultima': AGORA}])
+
+    def test_envios_das_filiais_so_quando_mudam(self):
+        """O último envio e o log de cada filial só são gravados quando mudam."""
+        with HistoricoSincronismo(self.caminho) as historico:
+            historico.registrar(ALVO, _resultado({'1': '2025-11-15T11:00:00', '2': '2025-11-15T11:00:00'}), agora=AGORA)
+            historico.registrar(ALVO, _resultado({'1': '2025-11-15T11:00:00', '2': '2025-11-15T11:05:00'}), agora=AGORA + 60)
+            historico.registrar(ALVO, _resultado({'1': '2025-11-15T11:00:00', '2': '2025-11-15T11:05:00'},
+                                                 logs={'1': 'Erro'}), agora=AGORA + 120)
+
+            envios_1 = historico.envios_filial(ALVO, '1')
+            envios_2 = historico.envios_filial(ALVO, '2')
+
+        self.assertEqual([(envio['momento'], envio['log']) for envio in envios_1], [(AGORA, None), (AGORA + 120, 'Erro')])
+        self.assertEqual([envio['momento'] for envio in envios_2], [AGORA, AGORA + 60])
+        self.assertEqual(envios_2[-1]['ultimo_envio'], datetime(2025, 11, 15, 11, 5).timestamp())
+
+    def test_resumo_horario_e_retencao(self):
+        """Observações fora da retenção bruta viram resumo horário; resumos antigos são removidos."""
+        with HistoricoSincronismo(self.caminho, dias_brutos=1, dias_resumo=30) as historico:
+            antigo = AGORA - 3 * 86400
+            hora = int(antigo) // 3600 * 3600
+            historico.registrar(ALVO, _resultado({'1': '2025-11-12T11:00:00'}, atraso=30, busca=0.2), agora=hora + 60)
+            historico.registrar(ALVO, _resultado({'1': '2025-11-12T11:00:00'}, codigo=1, atraso=90, busca=0.4),
+                                agora=hora + 120)
+            historico.registrar(ALVO, _resultado({'1': '2025-10-01T11:00:00'}), agora=AGORA - 60 * 86400)
+            historico.registrar(ALVO, _resultado({'1': '2025-11-15T11:00:00'}), agora=AGORA)
+
+            resumo = historico.resumo(ALVO)
+            observacoes = historico.observacoes(ALVO)
+            envios = historico.envios_filial(ALVO, '1')
+
+        self.assertEqual(len(resumo), 1)
+        self.assertEqual(resumo[0]['hora'], hora)
+        self.assertEqual((resumo[0]['amostras'], resumo[0]['problemas']), (2, 1))
+        self.assertEqual((resumo[0]['atraso_medio'], resumo[0]['atraso_maximo']), (60.0, 90.0))
+        self.assertAlmostEqual(resumo[0]['busca_media'], 0.3)
+        self.assertEqual([observacao['momento'] for observacao in observacoes], [AGORA])
+        self.assertNotIn(AGORA - 60 * 86400, [envio['momento'] for envio in envios])
+
+    def test_manutencao_no_maximo_uma_vez_por_intervalo(self):
+        """Entre duas manutenções, as gravações não resumem nem removem nada."""
+        with HistoricoSincronismo(self.caminho, dias_brutos=1) as historico:
+            historico.registrar(ALVO, _resultado({'1': '2025-11-15T11:00:00'}), agora=AGORA)
+            historico.registrar(ALVO, _resultado({'1': '2025-11-15T11:00:00'}), agora=AGORA + 86400 + 3600)
+            self.assertEqual(len(historico.observacoes(ALVO)), 1)
+            historico.registrar(ALVO, _resultado({'1': '2025-11-15T11:00:00'}),
+                                agora=AGORA + 86400 + 3600 + INTERVALO_MANUTENCAO / 2)
+            self.assertEqual(len(historico.observacoes(ALVO)), 2)
+
+    def test_registrar_historico_sem_interromper_a_verificacao(self):
+        """Sem --history nada é gravado; um banco inacessível só gera aviso."""
+        args = SimpleNamespace(history=False, forecast=False, history_db=self.caminho, history_raw_days=7, history_days=365)
+        registrar_historico(args, [('http://erp', 'MONITOR', 900, _resultado({'1': '2025-11-15T11:00:00'}))])
+        self.assertFalse(os.path.exists(self.caminho))
+
+        args.history = True
+        args.history_db = os.path.join(self.diretorio, 'inexistente', 'historico.sqlite3')
+        with self.assertLogs('zabbix_erp_sincronismo', level='WARNING') as logs:
+            registrar_historico(args, [('http://erp', 'MONITOR', 900, _resultado({'1': '2025-11-15T11:00:00'}))])
+        self.assertIn('Não foi possível gravar o histórico', logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
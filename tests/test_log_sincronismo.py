@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Testes do log diário em fila com manutenção entre processos.
+"""
+
+import os
+import sys
+import gzip
+import time
+import fcntl
+import shutil
+import logging
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+# Adiciona o diretório pai ao path para importar os módulos
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_sincronismo import (
+    ArquivoDiario, arquivos_pendentes, manter_logs, manter_se_pendente, iniciar_manutencao, iniciar_log_em_fila,
+    ultima_manutencao,
+    ARQUIVO_TRAVA, ARQUIVO_LEGADO, CARENCIA_COMPRESSAO
+)
+
+# Meio-dia de 15/11/2025 (horário local), para os nomes dos arquivos serem previsíveis
+AGORA = time.mktime((2025, 11, 15, 12, 0, 0, 0, 0, -1))
+
+
+def _registro(mensagem, criado):
+    registro = logging.LogRecord('zabbix_erp_sincronismo', logging.INFO, __file__, 1, mensagem, None, None)
+    registro.created = criado
+    return registro
+
+
+class TestLogSincronismo(unittest.TestCase):
+    """Arquivo por dia, compressão e retenção."""
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def _criar(self, nome, idade, conteudo=b'linha\n'):
+        caminho = os.path.join(self.diretorio, nome)
+        with open(caminho, 'wb') as f:
+            f.write(conteudo)
+        os.utime(caminho, (AGORA - idade, AGORA - idade))
+        return caminho
+
+    def test_um_arquivo_por_dia(self):
+        """Cada registro vai para o arquivo do seu dia."""
+        arquivo = ArquivoDiario(self.diretorio)
+        arquivo.setFormatter(logging.Formatter('%(message)s'))
+
+        arquivo.emit(_registro('antes', AGORA - 86400))
+        arquivo.emit(_registro('depois 1', AGORA))
+        arquivo.emit(_registro('depois 2', AGORA))
+        arquivo.close()
+
+        with open(os.path.join(self.diretorio, 'g70k_.2025-11-14')) as f:
+            self.assertEqual(f.read(), 'antes\n')
+        with open(os.path.join(self.diretorio, 'g70k_.2025-11-15')) as f:
+            self.assertEqual(f.read(), 'depois 1\ndepois 2\n')
+
+    def test_comprime_dias_encerrados_e_remove_antigos(self):
+        """Dias anteriores sem gravação recente viram .gz; os fora da retenção são removidos."""
+        encerrado = self._criar('g70k_.2025-11-13', idade=86400, conteudo=b'conteudo antigo\n')
+        recente = self._criar('g70k_.2025-11-14', idade=CARENCIA_COMPRESSAO // 2)
+        hoje = self._criar('g70k_.2025-11-15', idade=3600)
+        antigo = self._criar('g70k_.2025-10-01.gz', idade=86400 * 45)
+        outro = self._criar('outro.log', idade=86400 * 45)
+
+        self.assertEqual(arquivos_pendentes(self.diretorio, agora=AGORA), ([encerrado], [antigo]))
+        self.assertTrue(manter_logs(self.diretorio, agora=AGORA))
+
+        with gzip.open(f"{encerrado}.gz") as f:
+            self.assertEqual(f.read(), b'conteudo antigo\n')
+        self.assertEqual(os.path.getmtime(f"{encerrado}.gz"), AGORA - 86400)
+        self.assertFalse(os.path.exists(encerrado) or os.path.exists(antigo))
+        self.assertTrue(all(os.path.exists(caminho) for caminho in (recente, hoje, outro)))
+        self.assertEqual(arquivos_pendentes(self.diretorio, agora=AGORA), ([], []))
+
+    def test_manutencao_em_andamento_em_outro_processo(self):
+        """Com a trava ocupada, a manutenção não espera nem mexe nos arquivos."""
+        encerrado = self._criar('g70k_.2025-11-13', idade=86400)
+        with open(os.path.join(self.diretorio, ARQUIVO_TRAVA), 'w') as trava:
+            fcntl.flock(trava, fcntl.LOCK_EX)
+            self.assertFalse(manter_logs(self.diretorio, agora=AGORA))
+        self.assertTrue(os.path.exists(encerrado))
+
+    def test_uma_tentativa_por_dia(self):
+        """A manutenção não é repetida no mesmo dia, nem após falha, que fica no log."""
+        self._criar('g70k_.2025-11-13', idade=86400)
+        with patch('log_sincronismo.comprimir_arquivo', side_effect=OSError('disco cheio')):
+            with self.assertLogs('zabbix_erp_sincronismo', level='ERROR') as logs:
+                self.assertFalse(manter_se_pendente(self.diretorio, agora=AGORA))
+        self.assertIn('Falha na manutenção dos logs', logs.output[0])
+        self.assertEqual(ultima_manutencao(self.diretorio), '2025-11-15')
+
+        self.assertFalse(manter_se_pendente(self.diretorio, agora=AGORA))
+        self.assertTrue(manter_se_pendente(self.diretorio, agora=AGORA + 86400))
+        self.assertEqual(arquivos_pendentes(self.diretorio, agora=AGORA + 86400), ([], []))
+        self.assertFalse(manter_se_pendente(self.diretorio, agora=AGORA + 2 * 86400))
+
+    def test_compressao_interrompida(self):
+        """O .gz.tmp de uma compressão interrompida é removido e o dia comprimido de novo."""
+        encerrado = self._criar('g70k_.2025-11-13', idade=86400, conteudo=b'conteudo\n')
+        orfao = self._criar('g70k_.2025-11-13.gz.tmp', idade=86400, conteudo=b'\x1f\x8b')
+
+        self.assertEqual(arquivos_pendentes(self.diretorio, agora=AGORA), ([encerrado], [orfao]))
+        self.assertTrue(manter_logs(self.diretorio, agora=AGORA))
+        self.assertEqual(sorted(os.listdir(self.diretorio)), [ARQUIVO_TRAVA, 'g70k_.2025-11-13.gz'])
+
+    def test_thread_do_daemon(self):
+        """A thread de manutenção do processo residente é daemon e para pelo evento."""
+        ontem = time.strftime('g70k_.%Y-%m-%d', time.localtime(time.time() - 86400))
+        caminho = self._criar(ontem, idade=0)
+        os.utime(caminho, (time.time() - 86400, time.time() - 86400))
+        parar = iniciar_manutencao(self.diretorio, intervalo=60)
+        thread = next(thread for thread in threading.enumerate() if thread.name == 'manutencao-logs')
+        self.assertTrue(thread.daemon)
+        parar.set()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(os.path.exists(f"{caminho}.gz"))
+
+    def test_migra_arquivo_legado(self):
+        """O g70k_ da versão anterior vai para o arquivo do dia da última gravação."""
+        self._criar(ARQUIVO_LEGADO, idade=2 * 86400, conteudo=b'legado 13\n')
+        self.assertTrue(manter_logs(self.diretorio, agora=AGORA))
+        with gzip.open(os.path.join(self.diretorio, 'g70k_.2025-11-13.gz')) as f:
+            self.assertEqual(f.read(), b'legado 13\n')
+
+        # Dia já comprimido: o conteúdo entra como mais um membro do .gz
+        self._criar(ARQUIVO_LEGADO, idade=2 * 86400, conteudo=b'legado 13 (2)\n')
+        self.assertTrue(manter_logs(self.diretorio, agora=AGORA))
+        with gzip.open(os.path.join(self.diretorio, 'g70k_.2025-11-13.gz')) as f:
+            self.assertEqual(f.read(), b'legado 13\nlegado 13 (2)\n')
+        self.assertFalse(os.path.exists(os.path.join(self.diretorio, ARQUIVO_LEGADO)))
+
+        # Ainda em uso pela versão anterior: fica para depois
+        self._criar(ARQUIVO_LEGADO, idade=60)
+        self.assertTrue(manter_logs(self.diretorio, agora=AGORA))
+        self.assertTrue(os.path.exists(os.path.join(self.diretorio, ARQUIVO_LEGADO)))
+
+    def test_fila_drenada_ao_parar(self):
+        """Os registros enfileirados são gravados pela thread até a parada do ouvinte."""
+        logger = logging.getLogger('teste_log_sincronismo')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        ouvinte = iniciar_log_em_fila(logger, self.diretorio)
+        try:
+            for i in range(200):
+                logger.info("registro %d", i)
+        finally:
+            ouvinte.stop()
+            for handler in logger.handlers + list(ouvinte.handlers):
+                handler.close()
+            logger.handlers = []
+
+        nome = time.strftime('g70k_.%Y-%m-%d')
+        with open(os.path.join(self.diretorio, nome), encoding='utf-8') as f:
+            linhas = f.read().splitlines()
+        self.assertEqual(len(linhas), 200)
+        self.assertTrue(linhas[-1].endswith(' - teste_log_sincronismo - INFO - registro 199'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Testes do exportador de métricas Prometheus/OpenMetrics do daemon.
+"""
+
+import os
+import sys
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+# Adiciona o diretório pai ao path para importar os módulos
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metricas_sincronismo import MetricasSincronismo, ServidorMetricas, TIPO_OPENMETRICS
+
+AGORA = datetime(2024, 11, 13, 12, 0, 0).timestamp()
+
+
+def _resultado(codigo=0, saida='STATUS_OK', status_data=True):
+    """Resultado de executar_verificacao com duas filiais, uma com log."""
+    dados = None
+    if status_data:
+        dados = {
+            'total_linhas': 3,
+            'filiais': [
+                {'codigo': '4', 'filial': 'MATRIZ', 'ultimo_envio': '2024-11-13T11:58:00', 'log': ''},
+                {'codigo': '7', 'filial': 'FILIAL "SUL"', 'ultimo_envio': '2024-11-13T11:50:00', 'log': 'Erro'},
+                {'codigo': '4', 'filial': 'MATRIZ', 'ultimo_envio': '2024-11-13T11:59:00', 'log': ''},
+            ],
+        }
+    return {'codigo': codigo, 'saida': saida, 'status_data': dados, 'ultimo_envio': '2024-11-13T11:59:00',
+            'tempos': {'login': 0.3, 'busca': 0.07, 'analise': 0.02, 'total': 0.4}}
+
+
+class TestMetricasSincronismo(unittest.TestCase):
+    """Testes da renderização das métricas a partir dos resultados guardados."""
+
+    def setUp(self):
+        self.contadores = {'login': 1, 'busca_status': 2, 'relogin': 1}
+        self.metricas = MetricasSincronismo(self.contadores)
+
+    def test_gauges_por_filial(self):
+        """Atraso, último envio e problema de log por filial, recalculados na coleta."""
+        self.metricas.registrar('http://erp', 'MONITOR', _resultado(), agora=AGORA)
+        texto = self.metricas.renderizar(agora=AGORA)
+
+        rotulo = 'alvo="http://erp",usuario="MONITOR"'
+        self.assertIn(f'erp_sincronismo_atraso_seconds{{{rotulo}}} 60', texto)
+        self.assertIn(f'erp_sincronismo_filial_atraso_seconds{{{rotulo},codigo="4",filial="MATRIZ"}} 60', texto)
+        self.assertIn(f'erp_sincronismo_filial_atraso_seconds{{{rotulo},codigo="7",filial="FILIAL \\"SUL\\""}} 600', texto)
+        self.assertIn(f'erp_sincronismo_filial_problema_log{{{rotulo},codigo="4",filial="MATRIZ"}} 0', texto)
+        self.assertIn(f'erp_sincronismo_filial_problema_log{{{rotulo},codigo="7",filial="FILIAL \\"SUL\\""}} 1', texto)
+        self.assertIn(f'erp_sincronismo_linhas_grade{{{rotulo}}} 3', texto)
+        self.assertIn(f'erp_sincronismo_up{{{rotulo}}} 1', texto)
+        # Uma série por filial, mesmo com linhas repetidas na grade
+        self.assertEqual(texto.count('erp_sincronismo_filial_problema_log{'), 2)
+
+        # Sem nova verificação, o atraso continua crescendo entre coletas
+        self.assertIn(f'erp_sincronismo_atraso_seconds{{{rotulo}}} 120', self.metricas.renderizar(agora=AGORA + 60))
+
+    def test_histogramas_e_contadores(self):
+        """Durações por fase em buckets cumulativos e contadores de autenticação."""
+        self.metricas.registrar('http://erp', 'MONITOR', _resultado(), agora=AGORA)
+        self.metricas.registrar('http://erp', 'MONITOR', _resultado(1, 'STATUS_PROBLEMA: x'), agora=AGORA)
+        self.contadores['relogin'] += 1
+        texto = self.metricas.renderizar(agora=AGORA)
+
+        self.assertIn('# TYPE erp_sincronismo_fase_duracao_seconds histogram', texto)
+        self.assertIn('erp_sincronismo_fase_duracao_seconds_bucket{fase="login",le="0.25"} 0', texto)
+        self.assertIn('erp_sincronismo_fase_duracao_seconds_bucket{fase="login",le="0.5"} 2', texto)
+        self.assertIn('erp_sincronismo_fase_duracao_seconds_bucket{fase="login",le="+Inf"} 2', texto)
+        self.assertIn('erp_sincronismo_fase_duracao_seconds_count{fase="login"} 2', texto)
+        self.assertIn('erp_sincronismo_fase_duracao_seconds_sum{fase="login"} 0.6', texto)
+        self.assertIn('# TYPE erp_sincronismo_autenticacoes_total counter', texto)
+        self.assertIn('erp_sincronismo_autenticacoes_total{tipo="relogin"} 2', texto)
+        self.assertIn('erp_sincronismo_verificacoes_total{alvo="http://erp",usuario="MONITOR",status="problema"} 1', texto)
+        self.assertNotIn('# EOF', texto)
+
+    def test_contadores_copiados_sob_a_trava_dos_escritores(self):
+        """A coleta espera quem está atualizando os contadores e lê uma cópia consistente."""
+        trava = threading.Lock()
+        metricas = MetricasSincronismo(self.contadores, lock_contadores=trava)
+        textos = []
+        with trava:
+            coleta = threading.Thread(target=lambda: textos.append(metricas.renderizar(agora=AGORA)))
+            coleta.start()
+            coleta.join(0.2)
+            self.assertTrue(coleta.is_alive())
+            self.contadores['login'] += 1
+        coleta.join(5)
+
+        self.assertIn('erp_sincronismo_autenticacoes_total{tipo="login"} 2', textos[0])
+
+    def test_falha_mantem_ultima_grade(self):
+        """Uma falha zera o up, mas as filiais da última grade continuam expostas."""
+        self.metricas.registrar('http://erp', 'MONITOR', _resultado(), agora=AGORA)
+        self.metricas.registrar('http://erp', 'MONITOR', _resultado(1, 'STATUS_PROBLEMA: ERP fora', False), agora=AGORA + 30)
+        texto = self.metricas.renderizar(agora=AGORA + 30)
+
+        self.assertIn('erp_sincronismo_up{alvo="http://erp",usuario="MONITOR"} 0', texto)
+        self.assertIn('erp_sincronismo_status_ok{alvo="http://erp",usuario="MONITOR"} 0', texto)
+        self.assertIn(f'erp_sincronismo_ultima_analise_timestamp_seconds{{alvo="http://erp",usuario="MONITOR"}} {int(AGORA)}', texto)
+        self.assertIn('erp_sincronismo_filial_atraso_seconds{alvo="http://erp",usuario="MONITOR",codigo="4",filial="MATRIZ"} 90', texto)
+
+    def test_previsao_do_atraso(self):
+        """O tempo até o limite desconta o tempo desde a verificação; sem crescimento, +Inf."""
+        resultado = _resultado()
+        resultado['previsao'] = {
+            'status': 'ALERTA', 'tempo_ate_limite_s': 600.0, 'taxa_avanco': 0.5, 'limite_s': 900, 'horizonte_s': 1800,
+            'filiais': {'4': {'status': 'OK', 'tempo_ate_limite_s': None, 'taxa_avanco': 1.0},
+                        '7': {'status': 'INDISPONIVEL', 'tempo_ate_limite_s': None, 'taxa_avanco': None}},
+        }
+        self.metricas.registrar('http://erp', 'MONITOR', resultado, agora=AGORA)
+        texto = self.metricas.renderizar(agora=AGORA + 100)
+
+        rotulo = 'alvo="http://erp",usuario="MONITOR"'
+        self.assertIn(f'erp_sincronismo_tempo_ate_limite_seconds{{{rotulo}}} 500', texto)
+        self.assertIn(f'erp_sincronismo_previsao_alerta{{{rotulo}}} 1', texto)
+        self.assertIn(f'erp_sincronismo_taxa_avanco{{{rotulo}}} 0.5', texto)
+        self.assertIn(f'erp_sincronismo_filial_tempo_ate_limite_seconds{{{rotulo},codigo="4"}} +Inf', texto)
+        self.assertNotIn('codigo="7"}', texto)
+
+        # Uma verificação sem dados não repete a previsão anterior
+        self.metricas.registrar('http://erp', 'MONITOR', _resultado(1, 'STATUS_PROBLEMA: ERP fora', False), agora=AGORA + 200)
+        self.assertNotIn('erp_sincronismo_previsao_alerta{', self.metricas.renderizar(agora=AGORA + 200))
+
+    def test_openmetrics(self):
+        """No OpenMetrics o TYPE do contador não leva _total e a exposição termina em # EOF."""
+        self.metricas.registrar('http://erp', 'MONITOR', _resultado(), agora=AGORA)
+        texto = self.metricas.renderizar(openmetrics=True, agora=AGORA)
+
+        self.assertIn('# TYPE erp_sincronismo_autenticacoes counter', texto)
+        self.assertIn('erp_sincronismo_autenticacoes_total{tipo="login"} 1', texto)
+        self.assertTrue(texto.endswith('# EOF\n'))
+
+    def test_endpoint_http(self):
+        """GET /metrics responde com o estado guardado; outros caminhos dão 404."""
+        self.metricas.registrar('http://erp', 'MONITOR', _resultado())
+        servidor = ServidorMetricas(self.metricas, '127.0.0.1', 0).iniciar()
+        base = f"http://127.0.0.1:{servidor.server_address[1]}"
+        try:
+            with urllib.request.urlopen(f"{base}/metrics", timeout=5) as resposta:
+                self.assertTrue(resposta.headers['Content-Type'].startswith('text/plain; version=0.0.4'))
+                self.assertIn('erp_sincronismo_up{alvo="http://erp",usuario="MONITOR"} 1', resposta.read().decode('utf-8'))
+
+            pedido = urllib.request.Request(f"{base}/metrics", headers={'Accept': 'application/openmetrics-text'})
+            with urllib.request.urlopen(pedido, timeout=5) as resposta:
+                self.assertEqual(resposta.headers['Content-Type'], TIPO_OPENMETRICS)
+
+            with self.assertRaises(urllib.error.HTTPError) as erro:
+                urllib.request.urlopen(f"{base}/outro", timeout=5)
+            self.assertEqual(erro.exception.code, 404)
+        finally:
+            servidor.encerrar()
+
+
+if __name__ == '__main__':
+    unittest.main()
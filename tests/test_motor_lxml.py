@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Testes de equivalência entre os motores de análise lxml e BeautifulSoup.
+"""
+
+import os
+import sys
+import unittest
+
+# Adiciona o diretório pai e benchmarks/ ao path para importar os módulos
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, 'benchmarks'))
+
+from check_sincronismo import parse_status_page, ParsingError, MOTOR_LXML, MOTOR_BS4
+from grade_sintetica import gerar_pagina
+
+
+class TestMotorLxml(unittest.TestCase):
+    """O motor lxml deve produzir exatamente o mesmo resultado do BeautifulSoup."""
+
+    def assertMotoresIguais(self, html):
+        self.assertEqual(parse_status_page(html, MOTOR_LXML), parse_status_page(html, MOTOR_BS4))
+
+    def test_grade_real_sem_log(self):
+        """Grade com as 16 colunas reais e logs vazios."""
+        self.assertMotoresIguais(gerar_pagina(30))
+
+    def test_grade_real_com_logs(self):
+        """Grade com logs em várias linhas."""
+        html = gerar_pagina(30, linhas_com_log=[0, 7, 29])
+        self.assertMotoresIguais(html)
+        self.assertEqual(len(parse_status_page(html, MOTOR_LXML)['logs_filial']), 3)
+
+    def test_texto_com_elementos_aninhados(self):
+        """Texto dividido em elementos e espaços é concatenado como get_text(strip=True)."""
+        html = '''<table><tr><th>Cód. Local</th><th>Data Ult. Reg. Env.</th><th>Hora Ultimo Reg. Env.</th><th>Log Filial p/ Sinc.</th></tr></table>
+        <table>
+            <tr><td>1</td><td>14/11/2025</td><td>09:21:48</td><td><div> Erro </div><span>&nbsp;XML <b>inválido</b></span><!-- comentario --></td></tr>
+            <tr><td>2</td><td>14/11/2025</td><td>09:22:00</td><td>  </td></tr>
+        </table>'''
+        self.assertMotoresIguais(html)
+        self.assertEqual(parse_status_page(html, MOTOR_LXML)['logs_filial'], ['ErroXMLinválido'])
+
+    def test_sem_tabela(self):
+        """Ambos os motores falham com ParsingError quando não há grade."""
+        for motor in (MOTOR_LXML, MOTOR_BS4):
+            with self.subTest(motor=motor):
+                with self.assertRaises(ParsingError):
+                    parse_status_page("<html><body><p>Sem grade</p></body></html>", motor)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Testes da previsão do atraso pela taxa de avanço do último envio.
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from datetime import datetime
+
+# Adiciona o diretório pai ao path para importar os módulos
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from previsao_sincronismo import (
+    TendenciaEnvio, prever, STATUS_PREVISAO_OK, STATUS_PREVISAO_ALERTA, STATUS_PREVISAO_EXCEDIDO,
+    STATUS_PREVISAO_INDISPONIVEL
+)
+from historico_sincronismo import HistoricoSincronismo
+from check_sincronismo import registrar_historico, formatar_saida, STATUS_OK
+
+AGORA = datetime(2025, 11, 15, 12, 0, 0).timestamp()
+MEIA_VIDA = 3600
+
+
+def _alimentar(tendencia, inicio, fim, envio, passo=60):
+    """Observa uma verificação a cada ``passo`` segundos; ``envio(t)`` é o último envio no instante t."""
+    momento = inicio
+    while momento <= fim:
+        tendencia.observar(momento, envio(momento), MEIA_VIDA)
+        momento += passo
+    return tendencia
+
+
+def _em_dia(momento):
+    """ERP que envia a cada 5 minutos."""
+    return momento // 300 * 300
+
+
+def _iso(momento):
+    return datetime.fromtimestamp(momento).isoformat()
+
+
+class TestTendenciaEnvio(unittest.TestCase):
+    """Taxa de avanço incremental e previsão do estouro."""
+
+    def test_sincronismo_em_dia_nao_preve_estouro(self):
+        """Envios regulares avançam com o relógio: taxa perto de 1 e nenhum estouro previsto."""
+        tendencia = _alimentar(TendenciaEnvio(), AGORA - 6 * 3600, AGORA, _em_dia)
+
+        self.assertAlmostEqual(tendencia.taxa(MEIA_VIDA), 1.0, delta=0.02)
+        previsao = prever(tendencia, atraso=120, limite=900, meia_vida=MEIA_VIDA)
+        self.assertEqual(previsao['status'], STATUS_PREVISAO_OK)
+        self.assertTrue(previsao['tempo_ate_limite_s'] is None or previsao['tempo_ate_limite_s'] > 20000)
+
+    def test_sincronismo_lento_vira_alerta_antes_do_limite(self):
+        """Envios que avançam à metade do relógio: alerta quando o estouro cabe no horizonte."""
+        tendencia = _alimentar(TendenciaEnvio(), AGORA - 6 * 3600, AGORA, lambda t: AGORA - 6 * 3600 + (t - AGORA + 6 * 3600) / 2)
+        taxa = tendencia.taxa(MEIA_VIDA)
+        self.assertAlmostEqual(taxa, 0.5, places=6)
+
+        previsao = prever(tendencia, atraso=600, limite=900, horizonte=1800, meia_vida=MEIA_VIDA)
+        self.assertEqual(previsao['status'], STATUS_PREVISAO_ALERTA)
+        self.assertAlmostEqual(previsao['tempo_ate_limite_s'], 600.0, places=1)
+        self.assertEqual(prever(tendencia, atraso=300, limite=900, horizonte=1000, meia_vida=MEIA_VIDA)['status'],
+                         STATUS_PREVISAO_OK)
+        self.assertEqual(prever(tendencia, atraso=901, limite=900, meia_vida=MEIA_VIDA)['status'], STATUS_PREVISAO_EXCEDIDO)
+
+    def test_parada_derruba_a_taxa(self):
+        """Depois que o ERP para de enviar, a janela móvel esquece o período em dia."""
+        tendencia = _alimentar(TendenciaEnvio(), AGORA - 30 * 86400, AGORA - 3 * 3600, _em_dia, passo=300)
+        _alimentar(tendencia, AGORA - 3 * 3600 + 60, AGORA, lambda t: _em_dia(AGORA - 3 * 3600))
+
+        self.assertLess(tendencia.taxa(MEIA_VIDA), 0.3)
+
+    def test_igual_a_regressao_ponderada_completa(self):
+        """O estado incremental dá a mesma inclinação da regressão com todos os pesos."""
+        momentos = [AGORA + i * 60 + (i % 7) * 5 for i in range(200)]
+        envios = [_em_dia(momento) - (i % 11) * 13 for i, momento in enumerate(momentos)]
+        tendencia = TendenciaEnvio()
+        for momento, envio in zip(momentos, envios):
+            tendencia.observar(momento, envio, MEIA_VIDA)
+
+        pesos = [0.5 ** ((momentos[-1] - momento) / MEIA_VIDA) for momento in momentos]
+        media_t = sum(p * t for p, t in zip(pesos, momentos)) / sum(pesos)
+        media_e = sum(p * e for p, e in zip(pesos, envios)) / sum(pesos)
+        inclinacao = (sum(p * (t - media_t) * (e - media_e) for p, t, e in zip(pesos, momentos, envios))
+                      / sum(p * (t - media_t) ** 2 for p, t in zip(pesos, momentos)))
+        self.assertAlmostEqual(tendencia.taxa(MEIA_VIDA), inclinacao, places=9)
+
+    def test_sem_dados_suficientes(self):
+        """Antes de uma meia-vida de observações não há taxa; instantes repetidos são ignorados."""
+        tendencia = _alimentar(TendenciaEnvio(), AGORA, AGORA + MEIA_VIDA - 60, _em_dia)
+        self.assertIsNone(tendencia.taxa(MEIA_VIDA))
+        self.assertEqual(prever(tendencia, 60, 900, meia_vida=MEIA_VIDA)['status'], STATUS_PREVISAO_INDISPONIVEL)
+
+        estado = tendencia.estado()
+        tendencia.observar(AGORA, 0, MEIA_VIDA)
+        self.assertEqual(tendencia.estado(), estado)
+
+
+class TestPrevisaoNoHistorico(unittest.TestCase):
+    """Tendências guardadas no histórico e previsão no resultado da verificação."""
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.caminho = os.path.join(self.diretorio, 'historico.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def _resultado(self, momento, envio_filial_2):
+        envio = _iso(_em_dia(momento))
+        filiais = [{'codigo': '1', 'filial': 'MATRIZ', 'ultimo_envio': envio, 'ultimo_recebimento': None, 'log': ''},
+                   {'codigo': '2', 'filial': 'SUL', 'ultimo_envio': _iso(envio_filial_2), 'ultimo_recebimento': None, 'log': ''}]
+        return {'codigo': 0, 'saida': STATUS_OK, 'atraso_segundos': momento - _em_dia(momento), 'ultimo_envio': envio,
+                'tempos': {'total': 0.5}, 'status_data': {'total_linhas': 2, 'logs_filial': [], 'filiais': filiais}}
+
+    def test_estado_persistido_entre_execucoes(self):
+        """Cada execução abre o banco, atualiza a tendência e a próxima continua dela."""
+        inicio = AGORA - 2 * 3600
+        for passo in range(0, 2 * 3600 + 1, 60):
+            momento = inicio + passo
+            with HistoricoSincronismo(self.caminho) as historico:
+                tendencias = historico.registrar('MONITOR@http://erp', self._resultado(momento, inicio - 60),
+                                                 agora=momento, meia_vida=MEIA_VIDA)
+
+        self.assertEqual(set(tendencias), {'', '1', '2'})
+        self.assertAlmostEqual(tendencias['1'].taxa(MEIA_VIDA), 1.0, delta=0.05)
+        self.assertEqual(tendencias['2'].taxa(MEIA_VIDA), 0.0)
+
+        # Outra janela recomeça do zero
+        with HistoricoSincronismo(self.caminho) as historico:
+            tendencias = historico.registrar('MONITOR@http://erp', self._resultado(AGORA + 60, inicio - 60),
+                                             agora=AGORA + 60, meia_vida=2 * MEIA_VIDA)
+        self.assertIsNone(tendencias[''].taxa(2 * MEIA_VIDA))
+
+    def test_previsao_na_saida_json(self):
+        """Com --forecast a previsão do alvo e das filiais vai para o documento JSON."""
+        args = SimpleNamespace(history=False, forecast=True, history_db=self.caminho, history_raw_days=7,
+                               history_days=365, forecast_window=MEIA_VIDA, forecast_horizon=1800)
+        agora = datetime.now().timestamp()
+        parada = agora - 2 * 3600 - 600
+        with HistoricoSincronismo(self.caminho) as historico:
+            for passo in range(-2 * 3600, -60, 60):
+                historico.registrar('MONITOR@http://erp', self._resultado(agora + passo, parada),
+                                    agora=agora + passo, meia_vida=MEIA_VIDA)
+
+        resultado = self._resultado(agora, parada)
+        with self.assertLogs('zabbix_erp_sincronismo', level='WARNING') as logs:
+            registrar_historico(args, [('http://erp', 'MONITOR', 9000, resultado)])
+        previsao = json.loads(formatar_saida(resultado, 'json')[1])['previsao']
+
+        self.assertEqual(previsao['status'], STATUS_PREVISAO_OK)
+        self.assertEqual((previsao['limite_s'], previsao['horizonte_s']), (9000, 1800))
+        filial = previsao['filiais']['2']
+        self.assertEqual(filial['status'], STATUS_PREVISAO_ALERTA)
+        self.assertAlmostEqual(filial['tempo_ate_limite_s'], 9000 - (agora - parada), delta=120)
+        self.assertIn('filiais 2', logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -45,7 +45,7 @@ NEW_REF="$(git rev-parse --short HEAD || echo 'desconhecido')"
 # 5. Garantir permissões adequadas (wrapper, .env, logs, debug)
 echo "Ajustando permissões..."
 # Scripts
-for f in check_erp_sincronismo.sh setup.sh update.sh configure_password.sh; do
+for f in check_erp_sincronismo.sh setup.sh update.sh configure_password.sh construir_ambiente.sh; do
   if [ -f "$f" ]; then
     chmod 755 "$f"
   fi
@@ -66,6 +66,12 @@ chown -R zabbix:zabbix "$PROJECT_DIR/logs" "$PROJECT_DIR/debug"
 chmod 700 "$PROJECT_DIR/logs" "$PROJECT_DIR/debug"
 chmod 755 "$PROJECT_DIR/tmp"
 
+# 5.1 Reconstruir o ambiente pré-compilado (uv.lock pode ter mudado)
+echo "Reconstruindo ambiente Python pré-compilado..."
+if ! bash construir_ambiente.sh; then
+    echo "AVISO: Não foi possível reconstruir o .venv; o wrapper usará uv run até a próxima atualização."
+fi
+
 # 6. Verificar se o .env ainda existe
 if [ ! -f .env ]; then
     echo "AVISO: Arquivo .env não encontrado após atualização."
@@ -97,6 +103,15 @@ else
   echo "❌ ERRO: Execução como zabbix falhou. Verifique permissões de 'logs/' e '.env'."
 fi
 
+# 8.1 Testar o ambiente pré-construído usado pelo wrapper
+if [ -f ".venv/.ambiente-pronto" ]; then
+  if sudo -u zabbix HOME=/var/lib/zabbix .venv/bin/python check_sincronismo.py --help >/dev/null 2>&1; then
+    echo "✅ Ambiente pré-construído executando corretamente como zabbix!"
+  else
+    echo "❌ ERRO: O .venv pré-construído falhou como zabbix; o wrapper não usará o caminho rápido corretamente."
+  fi
+fi
+
 # 9. Limpar backups antigos (mantém apenas os 5 mais recentes)
 echo "Limpando backups antigos..."
 find /tmp -maxdepth 1 -name "zabbix_erp_backup_*" -type d | sort -r | tail -n +6 | xargs rm -rf 2>/dev/null || true